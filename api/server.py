@@ -0,0 +1,499 @@
+# api/server.py
+"""
+Local HTTP/JSON API over the controllers, so several buyers can work on
+the same purchase database at once.
+
+    python -m api.server [--db FILE] [--host 127.0.0.1] [--port 8765] [--workers 4]
+
+Connections are handled on one asyncio event loop; controller calls run
+on a small, bounded pool of database worker threads, and requests beyond
+the pool's queue get 503 instead of piling up. Every response carries a
+Server-Timing header (queue wait, database time, JSON encoding, total).
+
+GET responses carry an ETag built from the data versions of the scopes
+they depend on (see DatabaseManager.cache_version, which also counts
+commits by other programs), so a client repeating
+a request with If-None-Match gets 304 Not Modified without the server
+touching the database when nothing it depends on changed.
+The same tag keys a small cache of encoded responses shared by all
+clients, and identical requests arriving while one is being answered
+wait for that answer instead of running again.
+
+Endpoints:
+    GET  /api/health
+    GET  /api/stats
+    GET  /api/purchases?status=&approval_status=&search=&search_field=&sort=&desc=&offset=&limit=
+    GET  /api/purchases/<id>
+    POST /api/purchases/<id>/approve    {"approver": "..."}
+    POST /api/purchases/<id>/reject     {"approver": "...", "notes": "..."}
+    POST /api/purchases/<id>/receive    {"items": [0, 2], "received": true}
+    POST /api/line-items/receive        {"items": ["<line item id>", ...], "received": true}
+    GET  /api/vendors
+    GET  /api/vendors/<id>
+    GET  /api/budgets
+    GET  /api/budgets/usage?year=
+    GET  /api/reports/monthly-spending?year=
+    GET  /api/reports/vendor-spending?year=
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http import HTTPStatus
+from urllib.parse import urlsplit, parse_qsl
+
+from config.settings import (API_HOST, API_PORT, API_DB_WORKERS, API_MAX_QUEUED, API_PAGE_SIZE,
+                             API_MAX_PAGE_SIZE, API_MAX_BODY_BYTES, API_KEEPALIVE_SECONDS,
+                             API_RESPONSE_CACHE_SIZE)
+from utils.report_cache import ReportCache
+
+MAX_HEADERS = 100
+
+
+class ApiError(Exception):
+    """An error answered with an HTTP status and a JSON {"error": message} body"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Request:
+    """A parsed HTTP request"""
+
+    def __init__(self, method, target, version, headers, body=b""):
+        self.method = method
+        url = urlsplit(target)
+        self.path = url.path.rstrip("/") or "/"
+        self.query = dict(parse_qsl(url.query))
+        self.version = version
+        self.headers = headers
+        self.body = body
+
+    @property
+    def keep_alive(self):
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+    def json(self):
+        """The request body as a JSON object ({} when empty)"""
+        if not self.body:
+            return {}
+        try:
+            data = json.loads(self.body)
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Request body is not valid JSON")
+        if not isinstance(data, dict):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Request body must be a JSON object")
+        return data
+
+    def int_param(self, name, default, minimum=0, maximum=None):
+        value = self.query.get(name)
+        if value in (None, ""):
+            return default
+        try:
+            value = int(value)
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"{name} must be a whole number")
+        if value < minimum or (maximum is not None and value > maximum):
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"{name} must be between {minimum} and {maximum}")
+        return value
+
+    def year_param(self):
+        return self.int_param("year", datetime.now().year, 1900, 9999)
+
+
+class Response:
+    def __init__(self, status=HTTPStatus.OK, body=b"", headers=None):
+        self.status = status
+        self.body = body
+        self.headers = headers or {}
+
+    def encode(self, keep_alive):
+        status = HTTPStatus(self.status)
+        headers = dict(self.headers)
+        if self.body or status != HTTPStatus.NOT_MODIFIED:
+            headers.setdefault("Content-Type", "application/json; charset=utf-8")
+            headers["Content-Length"] = str(len(self.body))
+        headers["Connection"] = "keep-alive" if keep_alive else "close"
+        head = f"HTTP/1.1 {status.value} {status.phrase}\r\n" + "".join(
+            f"{name}: {value}\r\n" for name, value in headers.items()) + "\r\n"
+        return head.encode("latin-1") + self.body
+
+
+def to_json(data):
+    return json.dumps(data, default=str, separators=(",", ":")).encode("utf-8")
+
+
+def error_response(status, message, headers=None):
+    return Response(status, to_json({"error": message}), headers)
+
+
+class Route:
+    """
+    One endpoint: handler(request, *path_groups) runs on a database worker
+    and returns JSON-serializable data. scopes(request, *path_groups) names
+    the data version scopes the response depends on, which makes it
+    cacheable with ETags; None means the response is never cached.
+    """
+
+    def __init__(self, method, pattern, handler, scopes=None, status=HTTPStatus.OK):
+        self.method = method
+        self.pattern = re.compile(f"^{pattern}$")
+        self.handler = handler
+        self.scopes = scopes
+        self.status = status
+
+
+class ApiServer:
+    def __init__(self, db_manager, controllers, workers=API_DB_WORKERS, max_queued=API_MAX_QUEUED):
+        self.db_manager = db_manager
+        self.controllers = controllers
+        self.workers = workers
+        self.max_in_flight = workers + max_queued
+        self.in_flight = 0
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api-db")
+        self.routes = self._build_routes()
+        # Encoded responses by ETag, and the tasks computing them
+        self.responses = OrderedDict()
+        self.computing = {}
+        self.list_counts = ReportCache(API_RESPONSE_CACHE_SIZE)
+        self.server = None
+
+    def _build_routes(self):
+        purchases = lambda request, *groups: ("purchases",)
+        year = lambda request, *groups: (f"year:{request.year_param()}",)
+        return [
+            Route("GET", r"/api/stats", self.get_stats),
+            Route("GET", r"/api/purchases", self.list_purchases, purchases),
+            Route("GET", r"/api/purchases/([^/]+)", self.get_purchase, purchases),
+            Route("POST", r"/api/purchases/([^/]+)/approve", self.approve_purchase),
+            Route("POST", r"/api/purchases/([^/]+)/reject", self.reject_purchase),
+            Route("POST", r"/api/purchases/([^/]+)/receive", self.receive_items),
+            Route("POST", r"/api/line-items/receive", self.receive_line_items),
+            Route("GET", r"/api/vendors", self.list_vendors, lambda request, *groups: ("vendors",)),
+            Route("GET", r"/api/vendors/([^/]+)", self.get_vendor, lambda request, *groups: ("vendors",)),
+            Route("GET", r"/api/budgets", self.list_budgets, lambda request, *groups: ("budgets",)),
+            Route("GET", r"/api/budgets/usage", self.budget_usage, year),
+            Route("GET", r"/api/reports/monthly-spending", self.monthly_spending, year),
+            Route("GET", r"/api/reports/vendor-spending", self.vendor_spending,
+                  lambda request, *groups: (f"year:{request.year_param()}", "vendors")),
+        ]
+
+    # --- Handlers (run on database worker threads) ---
+
+    def get_stats(self, request):
+        return self.db_manager.get_db_stats()
+
+    def list_purchases(self, request):
+        criteria = {
+            "status": request.query.get("status"),
+            "approval_status": request.query.get("approval_status"),
+            "search": request.query.get("search"),
+            "search_field": request.query.get("search_field", "All Fields"),
+        }
+        offset = request.int_param("offset", 0)
+        limit = request.int_param("limit", API_PAGE_SIZE, 1, API_MAX_PAGE_SIZE)
+        controller = self.controllers["purchase"]
+        version = self.db_manager.cache_version("purchases")
+        rows = controller.get_purchase_listing(sort_column=request.query.get("sort"),
+                                               sort_reverse=request.query.get("desc", "") in ("1", "true"),
+                                               offset=offset, limit=limit, **criteria)
+        # Every page and sort order of a list has the same count; count it once per data version
+        total = self.list_counts.get_or_compute(ReportCache.make_key("purchase_count", **criteria), version,
+                                                lambda: controller.count_purchase_listing(**criteria))
+        return {
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "items": [row._asdict() for row in rows],
+        }
+
+    def get_purchase(self, request, purchase_id):
+        purchase = self.controllers["purchase"].get_purchase_by_id(purchase_id)
+        if purchase is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, "Purchase not found")
+        data = purchase.to_dict()
+        data.update(total=purchase.get_total(), receiving_status=purchase.get_status())
+        return data
+
+    @staticmethod
+    def _approver(request):
+        data = request.json()
+        approver = str(data.get("approver") or "").strip()
+        if not approver:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "approver is required")
+        return approver, data
+
+    @staticmethod
+    def _result(success, message):
+        # A failed approval is nearly always a conflict: another buyer got there first
+        if not success:
+            status = HTTPStatus.NOT_FOUND if message == "Purchase not found" else HTTPStatus.CONFLICT
+            raise ApiError(status, message)
+        return {"success": True, "message": message}
+
+    def approve_purchase(self, request, purchase_id):
+        approver, data = self._approver(request)
+        return self._result(*self.controllers["purchase"].approve_purchase(purchase_id, approver))
+
+    def reject_purchase(self, request, purchase_id):
+        approver, data = self._approver(request)
+        notes = str(data.get("notes") or "")
+        return self._result(*self.controllers["purchase"].reject_purchase(purchase_id, approver, notes))
+
+    def receive_items(self, request, purchase_id):
+        data = request.json()
+        items = data.get("items")
+        if not isinstance(items, list) or not all(isinstance(index, int) for index in items):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "items must be a list of line item positions")
+        received = bool(data.get("received", True))
+        success, message = self.controllers["purchase"].receive_items(purchase_id, items, received)
+        if not success:
+            status = HTTPStatus.NOT_FOUND if message == "Purchase not found" else HTTPStatus.INTERNAL_SERVER_ERROR
+            raise ApiError(status, message)
+        return {"success": True, "message": message}
+
+    def receive_line_items(self, request):
+        data = request.json()
+        items = data.get("items")
+        if not isinstance(items, list) or not all(isinstance(item_id, str) for item_id in items):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "items must be a list of line item ids")
+        received = bool(data.get("received", True))
+        success, message, rollups = self.controllers["purchase"].receive_line_items(items, received)
+        if not success:
+            status = HTTPStatus.NOT_FOUND if message == "Line items not found" else HTTPStatus.INTERNAL_SERVER_ERROR
+            raise ApiError(status, message)
+        return {"success": True, "message": message, "purchases": rollups}
+
+    def list_vendors(self, request):
+        return [vendor.to_dict() for vendor in self.controllers["vendor"].get_all_vendors()]
+
+    def get_vendor(self, request, vendor_id):
+        vendor = self.controllers["vendor"].get_vendor_by_id(vendor_id)
+        if vendor is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, "Vendor not found")
+        return vendor.to_dict()
+
+    def list_budgets(self, request):
+        return [budget.to_dict() for budget in self.controllers["budget"].get_all_budgets()]
+
+    def budget_usage(self, request):
+        return self.controllers["budget"].calculate_budget_usage(request.year_param())
+
+    def monthly_spending(self, request):
+        return self.controllers["report"].generate_monthly_spending(request.year_param())
+
+    def vendor_spending(self, request):
+        return self.controllers["report"].generate_vendor_spending(request.year_param())
+
+    # --- HTTP plumbing (event loop) ---
+
+    def _etag(self, request, scopes):
+        # Taken before the data is read: a commit racing the read makes the
+        # next request miss, never serves stale data under a fresh tag
+        version = (self.db_manager.cache_version(*scopes), request.path, sorted(request.query.items()))
+        return 'W/"' + hashlib.sha1(repr(version).encode("utf-8")).hexdigest()[:20] + '"'
+
+    @staticmethod
+    def _not_modified(request, etag):
+        header = request.headers.get("if-none-match")
+        if not header:
+            return False
+        return header.strip() == "*" or etag in [tag.strip() for tag in header.split(",")]
+
+    def _run_handler(self, route, request, groups, queued_at):
+        """Worker thread: call the handler and encode its result; returns (body, timings)"""
+        started = time.perf_counter()
+        data = route.handler(request, *groups)
+        handled = time.perf_counter()
+        body = to_json(data)
+        return body, {"queue": started - queued_at, "db": handled - started,
+                      "encode": time.perf_counter() - handled}
+
+    async def dispatch(self, request):
+        started = time.perf_counter()
+        timings = {}
+        headers = {}
+        try:
+            route, groups = self._match(request)
+            if route.scopes is None:
+                body, timings = await self._run(route, request, groups, headers)
+            else:
+                etag = self._etag(request, route.scopes(request, *groups))
+                headers.update({"ETag": etag, "Cache-Control": "no-cache"})
+                if self._not_modified(request, etag):
+                    return self._finish(Response(HTTPStatus.NOT_MODIFIED, headers=headers), timings, started)
+                body, timings = await self._cached(etag, route, request, groups, headers)
+            response = Response(route.status, body, headers)
+        except ApiError as e:
+            response = error_response(e.status, e.message, headers)
+        except Exception as e:
+            print(f"API error on {request.method} {request.path}: {str(e)}")
+            response = error_response(HTTPStatus.INTERNAL_SERVER_ERROR, f"Request failed: {str(e)}")
+        return self._finish(response, timings, started)
+
+    async def _run(self, route, request, groups, headers):
+        """Run a handler on a database worker, unless too many requests are already waiting"""
+        if self.in_flight >= self.max_in_flight:
+            headers["Retry-After"] = "1"
+            raise ApiError(HTTPStatus.SERVICE_UNAVAILABLE, "Server busy, try again shortly")
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, self._run_handler, route, request, groups, time.perf_counter())
+        finally:
+            self.in_flight -= 1
+
+    async def _cached(self, etag, route, request, groups, headers):
+        """The response for etag: from the cache, from an identical request in progress, or computed"""
+        body = self.responses.get(etag)
+        if body is not None:
+            self.responses.move_to_end(etag)
+            return body, {"cache": 0.0}
+
+        task = self.computing.get(etag)
+        if task is not None:
+            waited = time.perf_counter()
+            body, timings = await asyncio.shield(task)
+            return body, {"shared": time.perf_counter() - waited}
+
+        task = asyncio.ensure_future(self._run(route, request, groups, headers))
+        self.computing[etag] = task
+        task.add_done_callback(lambda done: self._store(etag, done))
+        return await asyncio.shield(task)
+
+    def _store(self, etag, task):
+        self.computing.pop(etag, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        self.responses[etag] = task.result()[0]
+        while len(self.responses) > API_RESPONSE_CACHE_SIZE:
+            self.responses.popitem(last=False)
+
+    @staticmethod
+    def _finish(response, timings, started):
+        timings["total"] = time.perf_counter() - started
+        response.headers["Server-Timing"] = ", ".join(
+            f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings.items())
+        return response
+
+    def _match(self, request):
+        if request.path == "/api/health":
+            # Answered inline; must keep working when the database workers are busy
+            route = Route("GET", r"/api/health", lambda request: {"status": "ok"})
+            return route, ()
+        allowed = False
+        for route in self.routes:
+            match = route.pattern.match(request.path)
+            if match:
+                if route.method == request.method:
+                    return route, match.groups()
+                allowed = True
+        if allowed:
+            raise ApiError(HTTPStatus.METHOD_NOT_ALLOWED, f"{request.method} is not supported here")
+        raise ApiError(HTTPStatus.NOT_FOUND, f"No endpoint at {request.path}")
+
+    async def _read_request(self, reader):
+        """Read one request; None when the client closed the connection or went idle"""
+        try:
+            line = await asyncio.wait_for(reader.readline(), API_KEEPALIVE_SECONDS)
+        except asyncio.TimeoutError:
+            return None
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) >= MAX_HEADERS:
+                raise ApiError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Too many headers")
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+        if length > API_MAX_BODY_BYTES:
+            raise ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return Request(method.upper(), target, version, headers, body)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except ApiError as e:
+                    # The stream can't be trusted after a bad request; answer and hang up
+                    writer.write(error_response(e.status, e.message).encode(keep_alive=False))
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                response = await self.dispatch(request)
+                writer.write(response.encode(request.keep_alive))
+                await writer.drain()
+                if not request.keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host=API_HOST, port=API_PORT):
+        self.server = await asyncio.start_server(self.handle_connection, host, port, backlog=256)
+        return self.server
+
+    async def serve_forever(self, host=API_HOST, port=API_PORT):
+        await self.start(host, port)
+        addresses = ", ".join(f"{sock.getsockname()[0]}:{sock.getsockname()[1]}" for sock in self.server.sockets)
+        print(f"Purchase API listening on {addresses} with {self.workers} database workers")
+        async with self.server:
+            await self.server.serve_forever()
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+        self.executor.shutdown(wait=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the purchase database as a local JSON API")
+    parser.add_argument("--db", help="SQLite database file (default: the application database)")
+    parser.add_argument("--host", default=API_HOST, help=f"address to listen on (default {API_HOST})")
+    parser.add_argument("--port", type=int, default=API_PORT, help=f"port (default {API_PORT})")
+    parser.add_argument("--workers", type=int, default=API_DB_WORKERS,
+                        help=f"database worker threads (default {API_DB_WORKERS})")
+    parser.add_argument("--max-queued", type=int, default=API_MAX_QUEUED,
+                        help=f"requests waiting for a worker before answering 503 (default {API_MAX_QUEUED})")
+    args = parser.parse_args()
+
+    from cli import create_database, create_controllers
+    db_manager = create_database(args)
+    server = ApiServer(db_manager, create_controllers(db_manager), args.workers, args.max_queued)
+    try:
+        asyncio.run(server.serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
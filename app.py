@@ -1,56 +1,120 @@
+import time
+_STARTUP_ORIGIN = time.perf_counter()
+
+import argparse
 from tkinter import ttk
 import tkinter as tk
 from tkinter import messagebox
-from database.db_manager import DatabaseManager
-from database.models import Base
-from controllers.purchase_controller import PurchaseController
-from controllers.vendor_controller import VendorController
-from controllers.budget_controller import BudgetController
-from controllers.report_controller import ReportController
-from views.main_dashboard import MainDashboard
+from utils.startup_profile import StartupProfiler
+from utils.background import run_in_background
 import os
 
 
 
 class PurchaseApp:
-    def __init__(self, root):
+    def __init__(self, root, profiler=None):
         self.root = root
+        self.profiler = profiler or StartupProfiler(enabled=False)
         self.root.title("Purchase Management System")
         self.root.geometry("900x700")
         self.root.minsize(900, 700)
-        
+
+        # Database and controllers are created off the Tk thread after the first paint
+        self.db_manager = None
+        self.controllers = None
+        self.dashboard = None
+
+        # Create main frame
+        self.main_frame = tk.Frame(self.root)
+        self.main_frame.pack(fill=tk.BOTH, expand=True)
+
+        # Setup menu
+        self.setup_menu()
+
+        # Placeholder shown while the database and dashboard load
+        self.current_view = None
+        self.loading_label = tk.Label(self.main_frame, text="Loading Purchase Management System...",
+                                      font=("Arial", 14))
+        self.loading_label.pack(expand=True)
+
+        self._first_paint_done = False
+        self.root.bind("<Map>", self._on_first_map, add="+")
+
+    def _on_first_map(self, event):
+        """Start loading the backend once the window has been mapped"""
+        if self._first_paint_done:
+            return
+        self._first_paint_done = True
+        self.root.after_idle(self._after_first_paint)
+
+    def _after_first_paint(self):
+        self.profiler.mark("first paint")
+        run_in_background(self.root, self._create_backend, self._finish_startup,
+                          error_callback=self._startup_failed)
+
+    def _create_backend(self):
+        """Import the database layer and build the controllers (runs on a worker thread)"""
+        from database.db_manager import DatabaseManager
+        from controllers.purchase_controller import PurchaseController
+        from controllers.vendor_controller import VendorController
+        from controllers.budget_controller import BudgetController
+        from controllers.report_controller import ReportController
+        self.profiler.mark("database modules imported")
+
         # Initialize database manager
-        self.db_manager = DatabaseManager()
+        db_manager = DatabaseManager()
+        self.profiler.mark("database initialized")
 
         # Initialize controllers
-        self.controllers = {
-            "purchase": PurchaseController(self.db_manager),
-            "vendor": VendorController(self.db_manager),
-            "budget": BudgetController(self.db_manager),
-            "report": ReportController(self.db_manager)
+        controllers = {
+            "purchase": PurchaseController(db_manager),
+            "vendor": VendorController(db_manager),
+            "budget": BudgetController(db_manager),
+            "report": ReportController(db_manager)
         }
 
         # Set up controller cross-references
-        self.controllers["budget"].set_purchase_controller(self.controllers["purchase"])
-        self.controllers["report"].set_controllers(
-            self.controllers["purchase"],
-            self.controllers["budget"],
-            self.controllers["vendor"]
+        controllers["budget"].set_purchase_controller(controllers["purchase"])
+        controllers["report"].set_controllers(
+            controllers["purchase"],
+            controllers["budget"],
+            controllers["vendor"]
         )
+        return db_manager, controllers
 
-        # Create main frame
-        self.main_frame = tk.Frame(self.root)
-        self.main_frame.pack(fill=tk.BOTH, expand=True)
+    def _finish_startup(self, backend):
+        self.db_manager, self.controllers = backend
 
-        # Setup menu
-        self.setup_menu()
+        from views.main_dashboard import MainDashboard
+        self.loading_label.destroy()
 
         # Initialize views
-        self.current_view = None
-        self.dashboard = MainDashboard(self.main_frame, self.controllers, self.show_view)
+        self.dashboard = MainDashboard(self.main_frame, self.controllers, self.show_view,
+                                       on_data_loaded=self._dashboard_loaded)
 
         # Default view
         self.show_view(self.dashboard)
+        self.profiler.mark("dashboard built")
+
+        # Tell the user about problems found while upgrading an older database
+        if self.db_manager.schema_report:
+            messagebox.showwarning("Database Needs Attention", "\n".join(self.db_manager.schema_report))
+
+    def _dashboard_loaded(self):
+        self.profiler.finish("dashboard data loaded")
+
+    def _startup_failed(self, error):
+        self.profiler.finish("startup failed")
+        self.loading_label.config(text=f"Failed to start: {error}")
+        messagebox.showerror("Startup Error", f"Could not initialize the database: {error}")
+
+    def _backend_ready(self):
+        """Return True once the database is available, telling the user otherwise"""
+        if self.db_manager is None:
+            messagebox.showinfo("Please Wait", "The database is still loading.")
+            return False
+        return True
+
     def setup_styles(self):
         # Create custom styles
         style = ttk.Style()
@@ -96,11 +160,18 @@ class PurchaseApp:
         """Switch to the specified view"""
         if self.current_view:
             self.current_view.hide()
+            # Views are recreated on every navigation, so release the old one
+            # (and any chart figures it holds) unless it is the app's dashboard
+            if (self.current_view is not view and self.current_view is not self.dashboard
+                    and hasattr(self.current_view, "destroy")):
+                self.current_view.destroy()
         self.current_view = view
         self.current_view.show()
 
     def backup_database(self):
         """Create a backup of the database"""
+        if not self._backend_ready():
+            return
         success, message = self.db_manager.backup_database()
         if success:
             messagebox.showinfo("Backup Successful", message)
@@ -109,6 +180,8 @@ class PurchaseApp:
 
     def show_db_management(self):
         """Show database management dialog"""
+        if not self._backend_ready():
+            return
         from database.sample_data import generate_sample_data
 
         dialog = tk.Toplevel(self.root)
@@ -133,6 +206,7 @@ class PurchaseApp:
 
                     # Generate new data
                     generate_sample_data()
+                    self.db_manager.invalidate_all()
                     messagebox.showinfo("Success", "Sample data regenerated successfully.")
 
                     # Refresh the dashboard
@@ -159,11 +233,13 @@ class PurchaseApp:
 
     def show_db_stats(self):
         """Show database statistics"""
+        if not self._backend_ready():
+            return
         stats = self.db_manager.get_db_stats()
 
         dialog = tk.Toplevel(self.root)
         dialog.title("Database Statistics")
-        dialog.geometry("500x400")
+        dialog.geometry("500x520")
         dialog.transient(self.root)
         dialog.grab_set()
 
@@ -206,12 +282,27 @@ class PurchaseApp:
             tk.Label(purchase_frame, text=str(value), font=("Arial", 10, "bold")).grid(
                 row=i, column=1, sticky="w", padx=5, pady=5)
 
+        # Report cache section
+        cache_frame = tk.LabelFrame(content_frame, text="Report Cache", padx=10, pady=10)
+        cache_frame.pack(fill=tk.X, pady=10)
+
+        for i, (key, cache_stats) in enumerate([
+            ("Budget Reports", self.controllers["budget"].get_cache_stats()),
+            ("Spending Reports", self.controllers["report"].get_cache_stats())
+        ]):
+            tk.Label(cache_frame, text=f"{key}:").grid(row=i, column=0, sticky="w", padx=5, pady=5)
+            tk.Label(cache_frame, text=(f"{cache_stats['hits']} hits, {cache_stats['misses']} misses "
+                                        f"({cache_stats['hit_rate']:.0f}%), {cache_stats['entries']} cached"),
+                     font=("Arial", 10, "bold")).grid(row=i, column=1, sticky="w", padx=5, pady=5)
+
         # Close button
         tk.Button(content_frame, text="Close", width=20,
                   command=dialog.destroy).pack(pady=20)
 
     def restore_database(self):
         """Restore database from a backup"""
+        if not self._backend_ready():
+            return
         from tkinter import filedialog
 
         # Backup directory
@@ -241,9 +332,21 @@ class PurchaseApp:
 
 
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Purchase Management System")
+    parser.add_argument("--startup-profile", nargs="?", const="startup_profile.log", metavar="FILE",
+                        help="record an import-time and first-paint timeline (default: startup_profile.log)")
+    args = parser.parse_args(argv)
+
+    profiler = StartupProfiler(enabled=args.startup_profile is not None, origin=_STARTUP_ORIGIN,
+                               output_path=args.startup_profile or "startup_profile.log")
+    profiler.start_import_tracking()
+    profiler.mark("app module loaded")
+
     root = tk.Tk()
-    app = PurchaseApp(root)
+    profiler.mark("Tk root created")
+    app = PurchaseApp(root, profiler)
+    profiler.mark("window shell built")
     root.mainloop()
 
 
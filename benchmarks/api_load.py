@@ -0,0 +1,223 @@
+# benchmarks/api_load.py
+"""
+Simulate many buyers using the local API server at once.
+
+Starts an API server on a free port (or uses --url), then runs concurrent
+keep-alive clients for a fixed time. Each client browses purchase list
+pages, opens purchases, looks at vendors, budget usage and reports, and
+now and then approves a purchase or receives items. Clients remember
+ETags and send If-None-Match, as a real client would; --no-etags turns
+that off for comparison.
+
+Writes change the database: run it against a copy.
+
+Usage (from the repository root):
+    python -m benchmarks.api_load --db /tmp/copy_of_purchase_system.db --clients 50 --duration 20
+"""
+import argparse
+import asyncio
+import json
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from urllib.parse import urlsplit, urlencode
+
+LIST_FILTERS = [
+    {},
+    {"status": "Pending"},
+    {"approval_status": "Pending"},
+    {"sort": "Date", "desc": "1"},
+    {"sort": "Vendor"},
+    {"search": "tech"},
+]
+
+
+class Client:
+    """One keep-alive HTTP/1.1 connection"""
+
+    def __init__(self, host, port, use_etags=True):
+        self.host = host
+        self.port = port
+        self.use_etags = use_etags
+        self.etags = {}
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, data=None):
+        """Returns (status, headers, parsed body or None)"""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(data).encode("utf-8") if data is not None else b""
+        headers = {"Host": f"{self.host}:{self.port}", "Content-Length": str(len(body))}
+        if body:
+            headers["Content-Type"] = "application/json"
+        if method == "GET" and self.use_etags and path in self.etags:
+            headers["If-None-Match"] = self.etags[path]
+        head = f"{method} {path} HTTP/1.1\r\n" + "".join(f"{k}: {v}\r\n" for k, v in headers.items()) + "\r\n"
+        self.writer.write(head.encode("latin-1") + body)
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+        length = int(response_headers.get("content-length", 0))
+        payload = await self.reader.readexactly(length) if length else b""
+        if response_headers.get("connection") == "close":
+            self.writer.close()
+            self.writer = None
+
+        if method == "GET" and "etag" in response_headers:
+            self.etags[path] = response_headers["etag"]
+        return status, response_headers, json.loads(payload) if payload else None
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+class LoadStats:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(int)
+        self.server_timing = defaultdict(float)
+        self.timed = 0
+
+    def record(self, endpoint, seconds, status, headers):
+        self.latencies[endpoint].append(seconds)
+        self.statuses[status] += 1
+        timing = headers.get("server-timing")
+        if timing:
+            self.timed += 1
+            for metric in timing.split(","):
+                name, _, duration = metric.strip().partition(";dur=")
+                self.server_timing[name] += float(duration or 0)
+
+
+async def run_client(client, stats, stop_at, write_ratio, seed):
+    rng = random.Random(seed)
+    seen_purchases = []
+    pending_purchases = []
+    year = datetime.now().year
+
+    async def call(endpoint, method, path, data=None):
+        started = time.perf_counter()
+        status, headers, body = await client.request(method, path, data)
+        stats.record(endpoint, time.perf_counter() - started, status, headers)
+        return status, body
+
+    while time.perf_counter() < stop_at:
+        action = rng.random()
+        if action < write_ratio and pending_purchases:
+            purchase_id = pending_purchases.pop(rng.randrange(len(pending_purchases)))
+            if rng.random() < 0.5:
+                await call("approve", "POST", f"/api/purchases/{purchase_id}/approve", {"approver": f"buyer{seed}"})
+            else:
+                await call("receive", "POST", f"/api/purchases/{purchase_id}/receive", {"items": [0]})
+        elif action < 0.55:
+            params = dict(rng.choice(LIST_FILTERS), offset=rng.randrange(5) * 50, limit=50)
+            status, body = await call("list purchases", "GET", "/api/purchases?" + urlencode(params))
+            if status == 200:
+                seen_purchases = [item["id"] for item in body["items"]] or seen_purchases
+                pending_purchases = [item["id"] for item in body["items"]
+                                     if item["approval_status"] == "Pending"] or pending_purchases
+        elif action < 0.75 and seen_purchases:
+            await call("purchase", "GET", f"/api/purchases/{rng.choice(seen_purchases)}")
+        elif action < 0.82:
+            await call("vendors", "GET", "/api/vendors")
+        elif action < 0.89:
+            await call("budget usage", "GET", f"/api/budgets/usage?year={year - rng.randrange(2)}")
+        elif action < 0.95:
+            await call("vendor spending", "GET", f"/api/reports/vendor-spending?year={year - rng.randrange(2)}")
+        else:
+            await call("monthly spending", "GET", f"/api/reports/monthly-spending?year={year - rng.randrange(2)}")
+    client.close()
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_for_server(host, port, timeout=30):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            client = Client(host, port)
+            status, _, _ = await client.request("GET", "/api/health")
+            client.close()
+            if status == 200:
+                return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError("API server did not start")
+
+
+async def run(args, host, port):
+    await wait_for_server(host, port)
+    stats = LoadStats()
+    clients = [Client(host, port, use_etags=not args.no_etags) for _ in range(args.clients)]
+    started = time.perf_counter()
+    stop_at = started + args.duration
+    await asyncio.gather(*(run_client(client, stats, stop_at, args.write_ratio, seed)
+                           for seed, client in enumerate(clients)))
+    return stats, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent clients against the local API server")
+    parser.add_argument("--db", default="purchase_system.db", help="database for the server started here")
+    parser.add_argument("--url", help="use a running server (e.g. http://127.0.0.1:8765) instead")
+    parser.add_argument("--clients", type=int, default=50, help="concurrent clients (default 50)")
+    parser.add_argument("--duration", type=float, default=20, help="seconds to run (default 20)")
+    parser.add_argument("--write-ratio", type=float, default=0.02, help="share of requests that write")
+    parser.add_argument("--workers", type=int, default=None, help="database workers of the server started here")
+    parser.add_argument("--no-etags", action="store_true", help="never send If-None-Match")
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        host, port = "127.0.0.1", free_port()
+        command = [sys.executable, "-m", "api.server", "--db", args.db, "--host", host, "--port", str(port)]
+        if args.workers:
+            command += ["--workers", str(args.workers)]
+        server = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    try:
+        stats, elapsed = asyncio.run(run(args, host, port))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    total = sum(len(values) for values in stats.latencies.values())
+    print(f"{args.clients} clients, {elapsed:.1f} s, {total:,} requests, {total / elapsed:,.0f} requests/s"
+          f"{' (no ETags)' if args.no_etags else ''}")
+    print("status codes: " + ", ".join(f"{status}: {count:,}" for status, count in sorted(stats.statuses.items())))
+    if stats.timed:
+        print("server time per request (ms): " + ", ".join(
+            f"{name} {seconds / stats.timed:.2f}" for name, seconds in stats.server_timing.items()))
+    print(f"\n{'endpoint':<18} {'requests':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for endpoint, values in sorted(stats.latencies.items()):
+        print(f"{endpoint:<18} {len(values):>9,} {percentile(values, 0.5) * 1000:>8.1f} "
+              f"{percentile(values, 0.95) * 1000:>8.1f} {percentile(values, 0.99) * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
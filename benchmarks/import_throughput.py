@@ -0,0 +1,128 @@
+# benchmarks/import_throughput.py
+"""
+Measure CSV import throughput against the number of parse workers.
+
+Generates a synthetic purchase CSV of the requested size (reused if it
+already exists), then imports it into a fresh temporary database once per
+worker count and prints rows/s and MB/s. With --parse-only the database
+writer is skipped, which shows how the parallel parse stage scales on its
+own.
+
+Usage (from the repository root):
+    python -m benchmarks.import_throughput --size-mb 2048 --workers 1,2,4,8
+"""
+import argparse
+import csv
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+from utils.importers import PurchaseImporter, normalize_headers, detect_date_formats, read_records
+
+HEADER = ["Order Number", "Vendor", "Date", "Invoice Number", "Description",
+          "Quantity", "Unit Price", "Budget Code", "Amount"]
+DATE_STYLES = ["%Y-%m-%d", "%m/%d/%Y"]
+
+
+def generate_csv(path, size_mb, seed=42):
+    """Write a synthetic purchase CSV of about size_mb megabytes"""
+    rng = random.Random(seed)
+    target = size_mb * 1024 * 1024
+    start_date = date(2020, 1, 1)
+    date_style = rng.choice(DATE_STYLES)
+    rows = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        while True:
+            for _ in range(10000):
+                day = start_date + timedelta(days=rng.randrange(5 * 365))
+                writer.writerow([
+                    f"BENCH-{rows:09d}",
+                    f"Vendor {rng.randrange(2000)}",
+                    day.strftime(date_style),
+                    f"INV-{rows}",
+                    rng.choice(["Paper", "Laptop", "Desk chair", 'Monitor 27"', "Toner, black"]),
+                    rng.randint(1, 20),
+                    f"{rng.uniform(1, 2000):.2f}",
+                    rng.choice(["OFC-SUP", "IT-EQUIP", "FURN", ""]),
+                    f"{rng.uniform(1, 5000):.2f}",
+                ])
+                rows += 1
+            if f.tell() >= target:
+                break
+    return rows
+
+
+def parse_only(file_path, workers):
+    """Run only the parse/validate stage and return the number of rows"""
+    with open(file_path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        headers = normalize_headers(next(reader))
+        date_index = headers.index("date")
+        date_formats = detect_date_formats([row[date_index] for _, row in zip(range(1000), reader)])
+
+    today = date.today().isoformat()
+    if workers > 1:
+        rows = PurchaseImporter._parse_parallel(file_path, headers, date_formats, today, workers)
+    else:
+        rows = PurchaseImporter._parse_serial(read_records(file_path), headers, date_formats, today)
+    return sum(1 for _, _, parsed, _ in rows if parsed is not None)
+
+
+def full_import(file_path, workers, work_dir):
+    """Import into a fresh database and return the number of imported purchases"""
+    from database.db_manager import DatabaseManager
+
+    db_path = os.path.join(work_dir, f"bench_{workers}.db")
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    db_manager = DatabaseManager(f"sqlite:///{db_path}")
+    try:
+        importer = PurchaseImporter(db_manager, error_report_path=os.path.join(work_dir, "bench_errors.csv"))
+        success, message = importer.import_file(file_path, workers=workers)
+        if not success:
+            raise RuntimeError(message)
+        return importer.stats["imported"]
+    finally:
+        db_manager.engine.dispose()
+        os.remove(db_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CSV import throughput vs worker count")
+    parser.add_argument("--size-mb", type=int, default=2048, help="size of the synthetic CSV (default 2048)")
+    parser.add_argument("--workers", default="1,2,4,8", help="comma separated worker counts (1 = serial)")
+    parser.add_argument("--dir", default=tempfile.gettempdir(), help="directory for the CSV and databases")
+    parser.add_argument("--parse-only", action="store_true", help="skip the database writer")
+    args = parser.parse_args()
+
+    file_path = os.path.join(args.dir, f"purchases_{args.size_mb}mb.csv")
+    if not os.path.exists(file_path):
+        print(f"Generating {file_path} ...")
+        started = time.perf_counter()
+        rows = generate_csv(file_path, args.size_mb)
+        print(f"  {rows:,} rows in {time.perf_counter() - started:.1f} s")
+    size_mb = os.path.getsize(file_path) / (1024 * 1024)
+
+    mode = "parse only" if args.parse_only else "full import"
+    print(f"\n{mode}, {size_mb:,.0f} MB, {os.cpu_count()} CPUs")
+    print(f"{'workers':>8} {'seconds':>10} {'rows/s':>12} {'MB/s':>8} {'speedup':>8}")
+
+    baseline = None
+    for workers in [int(w) for w in args.workers.split(",")]:
+        started = time.perf_counter()
+        if args.parse_only:
+            rows = parse_only(file_path, workers)
+        else:
+            rows = full_import(file_path, workers, args.dir)
+        elapsed = time.perf_counter() - started
+        baseline = baseline or elapsed
+        print(f"{workers:>8} {elapsed:>10.1f} {rows / elapsed:>12,.0f} {size_mb / elapsed:>8.1f} "
+              f"{baseline / elapsed:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# benchmarks/pdf_report.py
+"""
+Measure PDF vendor report rendering time for a large number of vendors.
+
+Renders a synthetic vendor spending report as one reportlab Table (the
+original layout) and in paged mode (one LongTable per page, with and
+without page subtotals), and once more in paged mode through a separate
+process the way the report views run it.
+
+Usage (from the repository root):
+    python -m benchmarks.pdf_report --vendors 10000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from utils.pdf_exporter import PDFExporter, export_in_process
+
+
+def vendor_data(count, seed=42):
+    """Synthetic rows shaped like ReportController.generate_vendor_spending()"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        total_spent = rng.uniform(10, 250000)
+        purchase_count = rng.randint(1, 400)
+        rows.append({
+            "name": f"Vendor {i:05d} {rng.choice(['Supplies', 'Solutions', 'Holdings', 'Trading Co.'])}",
+            "total_spent": total_spent,
+            "purchase_count": purchase_count,
+            "avg_order": total_spent / purchase_count,
+        })
+    return rows
+
+
+def count_pages(file_path):
+    with open(file_path, "rb") as f:
+        return f.read().count(b"/Type /Page\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF vendor report rendering time")
+    parser.add_argument("--vendors", type=int, default=10000, help="number of vendors (default 10000)")
+    parser.add_argument("--dir", default=tempfile.gettempdir(), help="directory for the PDF files")
+    args = parser.parse_args()
+
+    data = vendor_data(args.vendors)
+    modes = [
+        ("single table", dict(paged=False)),
+        ("paged", dict(paged=True, subtotals=False)),
+        ("paged + subtotals", dict(paged=True, subtotals=True)),
+    ]
+
+    print(f"{args.vendors:,} vendors")
+    print(f"{'mode':<28} {'seconds':>9} {'pages':>7}")
+    for label, options in modes:
+        file_path = os.path.join(args.dir, "bench_vendor_report.pdf")
+        started = time.perf_counter()
+        success, message = PDFExporter.export_vendor_report(data, 2025, file_path, **options)
+        elapsed = time.perf_counter() - started
+        if not success:
+            raise RuntimeError(message)
+        print(f"{label:<28} {elapsed:>9.2f} {count_pages(file_path):>7,}")
+        os.remove(file_path)
+
+    file_path = os.path.join(args.dir, "bench_vendor_report.pdf")
+    reports = []
+    started = time.perf_counter()
+    success, message = export_in_process("export_vendor_report", data, 2025, file_path=file_path,
+                                         progress_callback=lambda fraction, text: reports.append(fraction))
+    elapsed = time.perf_counter() - started
+    if not success:
+        raise RuntimeError(message)
+    print(f"{'paged, separate process':<28} {elapsed:>9.2f} {count_pages(file_path):>7,}"
+          f"   ({len(reports):,} progress reports)")
+    os.remove(file_path)
+
+
+if __name__ == "__main__":
+    main()
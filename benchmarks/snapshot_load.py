@@ -0,0 +1,128 @@
+# benchmarks/snapshot_load.py
+"""
+Compare loading purchase data for analysis from CSV exports and from a
+columnar snapshot.
+
+Exports the purchase summary, line items and budget allocations of a
+database to CSV, and the same data as a snapshot (.npz, plus Parquet when
+pyarrow is installed), then times loading each back into typed columns.
+The CSV path parses money strings like "$1,234.00" and ISO dates the way
+an analyst would have to; pandas.read_csv is timed as well when pandas is
+installed.
+
+Usage (from the repository root):
+    python -m benchmarks.snapshot_load --db purchase_system.db
+"""
+import argparse
+import csv
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from controllers.purchase_controller import PurchaseController
+from database.db_manager import DatabaseManager
+from utils.snapshot import load_snapshot
+
+MONEY_COLUMNS = {"Total Amount", "Unit Price", "Line Total", "Amount"}
+INTEGER_COLUMNS = {"Quantity"}
+DATE_COLUMNS = {"Date"}
+
+
+def load_csv(file_path):
+    """Load a CSV export into typed numpy columns"""
+    with open(file_path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        headers = next(reader)
+        columns = list(zip(*reader)) or [()] * len(headers)
+
+    result = {}
+    for header, values in zip(headers, columns):
+        if header in MONEY_COLUMNS:
+            result[header] = np.array([float(value.replace("$", "").replace(",", "") or 0) for value in values])
+        elif header in INTEGER_COLUMNS:
+            result[header] = np.array(values, dtype=np.int64)
+        elif header in DATE_COLUMNS:
+            result[header] = np.array([value or "NaT" for value in values], dtype="datetime64[D]")
+        else:
+            result[header] = np.array(values, dtype=object)
+    return result
+
+
+def timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def size_mb(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)) / (1024 * 1024)
+    return os.path.getsize(path) / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CSV vs columnar snapshot load time")
+    parser.add_argument("--db", default="purchase_system.db", help="SQLite database to export")
+    parser.add_argument("--dir", default=tempfile.gettempdir(), help="directory for the exported files")
+    args = parser.parse_args()
+
+    db_manager = DatabaseManager(f"sqlite:///{args.db}")
+    controller = PurchaseController(db_manager)
+    csv_files = {
+        "purchases": os.path.join(args.dir, "bench_purchases.csv"),
+        "line items": os.path.join(args.dir, "bench_line_items.csv"),
+        "allocations": os.path.join(args.dir, "bench_allocations.csv"),
+    }
+    snapshots = {"npz": os.path.join(args.dir, "bench_snapshot.npz")}
+    try:
+        import pyarrow # noqa: F401
+        snapshots["parquet"] = os.path.join(args.dir, "bench_snapshot.parquet")
+    except ImportError:
+        print("pyarrow is not installed; skipping Parquet")
+
+    print(f"{'export':<22} {'seconds':>9} {'MB':>9}")
+    export_seconds = 0.0
+    for name, path in csv_files.items():
+        if name == "purchases":
+            (success, message), seconds = timed(controller.export_purchases_csv, path)
+        else:
+            detail = "line_items" if name == "line items" else "allocations"
+            (success, message), seconds = timed(controller.export_purchase_details, path, detail, "full")
+        if not success:
+            raise RuntimeError(message)
+        export_seconds += seconds
+    print(f"{'csv':<22} {export_seconds:>9.1f} {sum(size_mb(p) for p in csv_files.values()):>9.1f}")
+    for file_format, path in snapshots.items():
+        (success, message), seconds = timed(controller.export_snapshot, path, file_format)
+        if not success:
+            raise RuntimeError(message)
+        print(f"{file_format:<22} {seconds:>9.1f} {size_mb(path):>9.1f}")
+
+    print(f"\n{'load':<22} {'seconds':>9} {'rows':>12} {'speedup':>8}")
+    csv_seconds = 0.0
+    rows = 0
+    for path in csv_files.values():
+        columns, seconds = timed(load_csv, path)
+        csv_seconds += seconds
+        rows += len(next(iter(columns.values()), ()))
+    print(f"{'csv (csv module)':<22} {csv_seconds:>9.2f} {rows:>12,}")
+
+    try:
+        import pandas as pd
+        seconds = sum(timed(pd.read_csv, path)[1] for path in csv_files.values())
+        print(f"{'csv (pandas)':<22} {seconds:>9.2f} {rows:>12,}")
+    except ImportError:
+        print("pandas is not installed; skipping pandas.read_csv")
+
+    for file_format, path in snapshots.items():
+        for label, decode in ((file_format, True), (f"{file_format} (codes)", False)):
+            tables, seconds = timed(load_snapshot, path, decode_categories=decode)
+            rows = sum(len(next(iter(columns.values()), ())) for name, columns in tables.items()
+                       if name in ("purchases", "line_items", "allocations"))
+            print(f"{label:<22} {seconds:>9.2f} {rows:>12,} {csv_seconds / seconds:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# benchmarks/vendor_rename.py
+"""
+Measure renaming a vendor with many purchases.
+
+Builds a temporary database with one vendor owning --purchases purchases
+(plus purchases of other vendors, so the rename has to find its rows),
+then times VendorController.update_vendor(), which copies the new name to
+the purchases with one UPDATE, against the old way of loading every
+purchase and setting vendor_name object by object.
+
+Usage (from the repository root):
+    python -m benchmarks.vendor_rename --purchases 100000
+"""
+import argparse
+import os
+import tempfile
+import time
+import uuid
+from datetime import date, timedelta
+
+from sqlalchemy import insert, select, func
+
+
+def build_database(db_path, purchases, other_purchases):
+    """Create the database and return (db_manager, vendor_id)"""
+    from database.db_manager import DatabaseManager
+    from database.models import Vendor, Purchase
+
+    db_manager = DatabaseManager(f"sqlite:///{db_path}")
+    vendor_ids = [str(uuid.uuid4()) for _ in range(11)]
+    start_date = date(2020, 1, 1)
+    with db_manager.engine.begin() as connection:
+        connection.execute(insert(Vendor), [
+            {"id": vendor_id, "name": f"Vendor {i}", "contact": "", "phone": "", "email": "", "address": ""}
+            for i, vendor_id in enumerate(vendor_ids)
+        ])
+        rows = []
+        for i in range(purchases + other_purchases):
+            vendor = 0 if i < purchases else 1 + i % 10
+            rows.append({
+                "id": str(uuid.uuid4()),
+                "order_number": f"BENCH-{i:07d}",
+                "invoice_number": "",
+                "date": (start_date + timedelta(days=i % 1800)).isoformat(),
+                "vendor_id": vendor_ids[vendor],
+                "vendor_name": f"Vendor {vendor}",
+                "status": "Approved",
+                "approver": "",
+                "approval_date": None,
+                "notes": "",
+            })
+            if len(rows) == 10000:
+                connection.execute(insert(Purchase), rows)
+                rows = []
+        if rows:
+            connection.execute(insert(Purchase), rows)
+    return db_manager, vendor_ids[0]
+
+
+def rename_per_object(db_manager, vendor_id, name):
+    """The old update_vendor(): load every purchase and set its vendor_name"""
+    from database.models import Vendor, Purchase
+
+    session = db_manager.Session()
+    try:
+        vendor = session.get(Vendor, vendor_id)
+        vendor.name = name
+        for purchase in session.query(Purchase).filter(Purchase.vendor_id == vendor_id).all():
+            purchase.vendor_name = name
+        session.commit()
+    finally:
+        session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vendor rename: one UPDATE vs per-object ORM updates")
+    parser.add_argument("--purchases", type=int, default=100000, help="purchases of the renamed vendor")
+    parser.add_argument("--other-purchases", type=int, default=100000, help="purchases of other vendors")
+    parser.add_argument("--dir", default=tempfile.gettempdir(), help="directory for the database")
+    args = parser.parse_args()
+
+    from database.models import Purchase
+    from controllers.vendor_controller import VendorController
+
+    db_path = os.path.join(args.dir, "bench_vendor_rename.db")
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    print(f"Building database with {args.purchases:,} + {args.other_purchases:,} purchases ...")
+    db_manager, vendor_id = build_database(db_path, args.purchases, args.other_purchases)
+    controller = VendorController(db_manager)
+
+    def renamed_rows(name):
+        with db_manager.engine.connect() as connection:
+            return connection.scalar(select(func.count()).select_from(Purchase).where(Purchase.vendor_name == name))
+
+    try:
+        print(f"\n{'method':<22} {'seconds':>8} {'renamed':>10}")
+        started = time.perf_counter()
+        rename_per_object(db_manager, vendor_id, "Renamed (per object)")
+        elapsed = time.perf_counter() - started
+        print(f"{'per-object ORM':<22} {elapsed:>8.2f} {renamed_rows('Renamed (per object)'):>10,}")
+
+        started = time.perf_counter()
+        success, message = controller.update_vendor({"id": vendor_id, "name": "Renamed (one UPDATE)"})
+        elapsed = time.perf_counter() - started
+        if not success:
+            raise RuntimeError(message)
+        print(f"{'update_vendor()':<22} {elapsed:>8.2f} {renamed_rows('Renamed (one UPDATE)'):>10,}")
+    finally:
+        db_manager.engine.dispose()
+        os.remove(db_path)
+
+
+if __name__ == "__main__":
+    main()
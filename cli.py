@@ -0,0 +1,375 @@
+# cli.py
+"""
+Command-line interface to the Purchase Management System, for scripting
+imports, exports, reports, backups and maintenance on machines without a
+display.
+
+Only the database layer and controllers are loaded (never tkinter or
+matplotlib), and each command imports just what it needs. Data goes to
+standard output or a file and is streamed in batches; progress and
+messages go to standard error.
+
+Usage (from the repository root):
+    python -m cli stats
+    python -m cli import purchases.csv --workers 4
+    python -m cli import-budgets budget_amounts.csv
+    python -m cli export line-items - --status Pending > pending_items.csv
+    python -m cli report vendor --year 2025 --format json
+    python -m cli report all --out year_end_reports.zip
+    python -m cli backup
+    python -m cli maintenance vacuum
+    python -m cli maintenance dedupe
+"""
+import argparse
+import json
+import sys
+from datetime import datetime
+
+EXPORT_KINDS = ("purchases", "line-items", "allocations", "vendors", "snapshot")
+REPORT_KINDS = ("budget", "vendor", "monthly", "all")
+MAINTENANCE_TASKS = ("analyze", "optimize", "vacuum", "integrity_check", "dedupe")
+
+
+def create_database(args):
+    """DatabaseManager for the --db file (default: the application database)"""
+    from database.db_manager import DatabaseManager
+    db_manager = DatabaseManager(f"sqlite:///{args.db}") if args.db else DatabaseManager()
+    # Problems found while upgrading an older database (e.g. duplicates blocking a unique index)
+    for line in db_manager.schema_report:
+        message(line)
+    return db_manager
+
+
+def create_controllers(db_manager):
+    """The four controllers, wired together the way the application does it"""
+    from controllers.purchase_controller import PurchaseController
+    from controllers.vendor_controller import VendorController
+    from controllers.budget_controller import BudgetController
+    from controllers.report_controller import ReportController
+
+    controllers = {
+        "purchase": PurchaseController(db_manager),
+        "vendor": VendorController(db_manager),
+        "budget": BudgetController(db_manager),
+        "report": ReportController(db_manager)
+    }
+    controllers["budget"].set_purchase_controller(controllers["purchase"])
+    controllers["report"].set_controllers(controllers["purchase"], controllers["budget"], controllers["vendor"])
+    return controllers
+
+
+def message(text):
+    print(text, file=sys.stderr)
+
+
+def finish(result):
+    """Print a controller's (success, message) and turn it into an exit code"""
+    success, text = result
+    message(text)
+    return 0 if success else 1
+
+
+class Progress:
+    """Progress lines on standard error, at most one per second (none with --quiet)"""
+
+    def __init__(self, quiet):
+        self.quiet = quiet
+        self.last = 0.0
+
+    def show(self, text, force=False):
+        now = datetime.now().timestamp()
+        if self.quiet or (not force and now - self.last < 1.0):
+            return
+        self.last = now
+        message(text)
+
+    def fraction(self, fraction, text):
+        self.show(f"{text} ({fraction * 100:.0f}%)" if fraction is not None else text)
+
+    def rows(self, written, total):
+        self.show(f"{written:,} of {total:,} rows written" if total else f"{written:,} rows written")
+
+    def snapshot(self, table, rows):
+        self.show(f"{table.replace('_', ' ')}: {rows:,} rows read")
+
+    def importer(self, progress):
+        fraction = progress.get("fraction")
+        done = f" {fraction * 100:.0f}%" if fraction is not None else ""
+        self.show(f"{progress.get('status', 'Running')}{done}: {progress['imported']:,} purchases imported, "
+                  f"{progress['skipped']:,} skipped, {progress['errors']:,} errors")
+
+
+# --- Commands ---
+
+# Tables counted by `stats`, with the keys DatabaseManager.get_db_stats() uses
+STATS_TABLES = {
+    "vendors": "vendors",
+    "budgets": "budgets",
+    "purchases": "purchases",
+    "line_items": "line_items",
+    "budget_allocations": "purchase_budgets",
+    "yearly_budget_amounts": "yearly_budget_amounts",
+}
+
+
+def read_stats(db_file):
+    """
+    The same counts as DatabaseManager.get_db_stats(), read with the sqlite3
+    module: `stats` is run from scripts and monitoring, and importing
+    SQLAlchemy alone would take most of its startup time.
+    """
+    import sqlite3
+    connection = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True)
+    try:
+        counts = ", ".join(f"(SELECT COUNT(*) FROM {table})" for table in STATS_TABLES.values())
+        stats = dict(zip(STATS_TABLES, connection.execute(f"SELECT {counts}").fetchone()))
+        by_status = dict(connection.execute("SELECT status, COUNT(*) FROM purchases GROUP BY status"))
+        for status in ("Pending", "Approved", "Rejected"):
+            stats[f"{status.lower()}_purchases"] = by_status.get(status, 0)
+        return stats
+    finally:
+        connection.close()
+
+
+def cmd_stats(args):
+    import os
+    import sqlite3
+    from config.settings import DATABASE_FILE
+    db_file = args.db or DATABASE_FILE
+    if not os.path.exists(db_file):
+        message(f"Database not found: {db_file}")
+        return 1
+    try:
+        stats = read_stats(db_file)
+    except sqlite3.Error as e:
+        message(f"Could not read database statistics: {str(e)}")
+        return 1
+    stats["database_file"] = db_file
+    stats["database_size_bytes"] = os.path.getsize(db_file)
+
+    if args.json:
+        json.dump(stats, sys.stdout, indent=2)
+        print()
+        return 0
+    for key, value in stats.items():
+        label = key.replace("_", " ").capitalize()
+        print(f"{label + ':':<26} {value:,}" if isinstance(value, int) else f"{label + ':':<26} {value}")
+    return 0
+
+
+def cmd_import(args):
+    controller = create_controllers(create_database(args))["purchase"]
+    progress = Progress(args.quiet)
+
+    if args.list_jobs:
+        jobs = controller.get_resumable_import_jobs()
+        for job in jobs:
+            print(f"{job['id']}  {job['status']:<9} {job['updated_at']}  {job['file_path']}")
+        if not jobs:
+            message("No unfinished imports.")
+        return 0
+
+    if args.resume is not None:
+        job_id = args.resume
+        if not job_id:
+            jobs = controller.get_resumable_import_jobs()
+            if not jobs:
+                message("No unfinished imports to resume.")
+                return 1
+            job_id = jobs[0]["id"]
+        importer = controller.create_purchase_importer(chunk_size=args.chunk_size, progress_callback=progress.importer)
+        return finish(importer.resume_job(job_id, workers=args.workers))
+
+    if not args.file:
+        message("Give a file to import, or --resume / --list-jobs.")
+        return 2
+    if args.dry_run:
+        return finish(controller.validate_purchase_import(args.file, error_report_path=args.errors))
+    importer = controller.create_purchase_importer(chunk_size=args.chunk_size, error_report_path=args.errors,
+                                                   progress_callback=progress.importer)
+    return finish(importer.import_file(args.file, workers=args.workers))
+
+
+def cmd_export(args):
+    db_manager = create_database(args)
+    progress = Progress(args.quiet)
+
+    if args.kind == "vendors":
+        from utils.exporters import CSVExporter
+        vendors = create_controllers(db_manager)["vendor"].get_all_vendors()
+        return finish(CSVExporter.export_vendors(vendors, args.out))
+
+    controller = create_controllers(db_manager)["purchase"]
+    if args.kind == "snapshot":
+        if args.out == "-":
+            message("A snapshot cannot be written to standard output; give a file name.")
+            return 2
+        return finish(controller.export_snapshot(args.out, progress_callback=progress.snapshot))
+
+    criteria = {
+        "status": args.status,
+        "search": args.search,
+        "search_field": args.search_field,
+        "sort_column": args.sort,
+        "sort_reverse": args.desc,
+    }
+    if args.kind == "purchases":
+        return finish(controller.export_purchases_csv(args.out, progress_callback=progress.rows, **criteria))
+
+    columns = args.columns if "," not in args.columns else args.columns.split(",")
+    detail = "line_items" if args.kind == "line-items" else "allocations"
+    return finish(controller.export_purchase_details(args.out, detail, columns, progress_callback=progress.rows,
+                                                     **criteria))
+
+
+def cmd_report(args):
+    report_controller = create_controllers(create_database(args))["report"]
+    progress = Progress(args.quiet)
+
+    if args.kind == "all":
+        if not args.out or args.out == "-":
+            message("Give the archive to write with --out.")
+            return 2
+        formats = ["json"] if args.format == "json" else [args.format] if args.format else ["csv", "pdf"]
+        if "json" in formats:
+            message("Archives hold CSV and PDF reports; use --format csv or pdf.")
+            return 2
+        years = [int(year) for year in args.years.split(",")] if args.years else None
+        return finish(report_controller.export_all_years(args.out, years, formats, args.workers,
+                                                         progress_callback=progress.fraction))
+
+    year = args.year or datetime.now().year
+    data = report_controller.compute_all_years([year])[year]
+    file_format = args.format or "csv"
+    out = args.out or "-"
+
+    if file_format == "json":
+        payload = {"year": year}
+        if args.kind == "budget":
+            payload.update(budget_usage=data["budget_usage"], monthly_spending=data["monthly_spending"])
+        elif args.kind == "vendor":
+            payload["vendor_spending"] = data["vendor_spending"]
+        else:
+            payload["monthly_spending"] = data["monthly_spending"]
+
+        if out == "-":
+            json.dump(payload, sys.stdout, indent=2)
+            print()
+            return 0
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(payload, f, indent=2)
+        message(f"Report written to {out}")
+        return 0
+
+    if file_format == "pdf":
+        if out == "-":
+            message("Give the PDF file to write with --out.")
+            return 2
+        from utils.pdf_exporter import PDFExporter as exporter
+    else:
+        from utils.exporters import CSVExporter as exporter
+
+    if args.kind == "budget":
+        return finish(exporter.export_budget_report(data["budget_usage"], data["monthly_spending"], year, out))
+    if args.kind == "vendor":
+        return finish(exporter.export_vendor_report(data["vendor_spending"], year, out))
+    message("The monthly report is available as JSON only (or as part of the budget report).")
+    return 2
+
+
+def cmd_import_budgets(args):
+    controller = create_controllers(create_database(args))["budget"]
+    return finish(controller.import_budget_amounts(args.file))
+
+
+def cmd_backup(args):
+    return finish(create_database(args).backup_database(args.dir))
+
+
+def cmd_restore(args):
+    if not args.yes:
+        message("Restoring REPLACES the current database with the backup; repeat with --yes to go ahead.")
+        return 2
+    return finish(create_database(args).restore_from_backup(args.backup))
+
+
+def cmd_maintenance(args):
+    return finish(create_database(args).run_maintenance(args.task))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m cli", description="Purchase Management System command line")
+    parser.add_argument("--db", help="SQLite database file (default: the application database)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="no progress messages")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    stats = commands.add_parser("stats", help="record counts and database size")
+    stats.add_argument("--json", action="store_true", help="print JSON")
+    stats.set_defaults(func=cmd_stats)
+
+    import_parser = commands.add_parser("import", help="import purchases from CSV or JSON Lines")
+    import_parser.add_argument("file", nargs="?", help="file to import")
+    import_parser.add_argument("--workers", type=int, default=1, help="parse worker processes (default 1)")
+    import_parser.add_argument("--chunk-size", type=int, default=20000, help="purchases per commit")
+    import_parser.add_argument("--errors", help="error report CSV (default: next to the file)")
+    import_parser.add_argument("--dry-run", action="store_true", help="only check the file")
+    import_parser.add_argument("--resume", nargs="?", const="", metavar="JOB_ID",
+                               help="resume an unfinished import (default: the most recent)")
+    import_parser.add_argument("--list-jobs", action="store_true", help="list unfinished imports")
+    import_parser.set_defaults(func=cmd_import)
+
+    import_budgets = commands.add_parser("import-budgets", help="set yearly budget amounts from a CSV file")
+    import_budgets.add_argument("file", help="CSV with Budget Code, Year, Amount, or Budget Code and a column per year")
+    import_budgets.set_defaults(func=cmd_import_budgets)
+
+    export = commands.add_parser("export", help="export purchases, line items, allocations, vendors or a snapshot")
+    export.add_argument("kind", choices=EXPORT_KINDS)
+    export.add_argument("out", help="file to write; - for standard output; .gz compresses")
+    export.add_argument("--status", help="receiving status filter: Pending, Partial or Received")
+    export.add_argument("--search", help="search text")
+    export.add_argument("--search-field", default="All Fields", help="Order #, Vendor, Date, Status or All Fields")
+    export.add_argument("--sort", help="sort column: Order #, Vendor, Date, Total or Status")
+    export.add_argument("--desc", action="store_true", help="sort descending")
+    export.add_argument("--columns", default="standard",
+                        help="detail exports: standard, full, or comma separated column keys")
+    export.set_defaults(func=cmd_export)
+
+    report = commands.add_parser("report", help="budget, vendor or monthly report, or all years into a zip")
+    report.add_argument("kind", choices=REPORT_KINDS)
+    report.add_argument("--year", type=int, help="report year (default: this year)")
+    report.add_argument("--years", help="all: comma separated years (default: every year with data)")
+    report.add_argument("--format", choices=("csv", "pdf", "json"), help="default csv (all: csv and pdf)")
+    report.add_argument("--out", help="file to write (default: standard output)")
+    report.add_argument("--workers", type=int, help="all: worker processes (default: CPU count)")
+    report.set_defaults(func=cmd_report)
+
+    backup = commands.add_parser("backup", help="copy the database into the backup directory")
+    backup.add_argument("--dir", help="backup directory (default: backups)")
+    backup.set_defaults(func=cmd_backup)
+
+    restore = commands.add_parser("restore", help="replace the database with a backup")
+    restore.add_argument("backup", help="backup file")
+    restore.add_argument("--yes", action="store_true", help="confirm replacing the current database")
+    restore.set_defaults(func=cmd_restore)
+
+    maintenance = commands.add_parser("maintenance", help="SQLite maintenance")
+    maintenance.add_argument("task", choices=MAINTENANCE_TASKS)
+    maintenance.set_defaults(func=cmd_maintenance)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except BrokenPipeError:
+        # Output piped into head and the like
+        sys.stderr.close()
+        return 0
+    except KeyboardInterrupt:
+        message("Interrupted.")
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,6 +11,32 @@ DATABASE_FILE = "purchase_system.db"
 DATABASE_URL = f"sqlite:///{DATABASE_FILE}"
 BACKUP_DIR = "backups"
 
+# Report cache settings
+REPORT_CACHE_SIZE = 128  # Maximum number of cached report results per controller
+
+# Export settings
+EXPORT_BATCH_SIZE = 5000  # Rows fetched from the database and written per batch
+EXPORT_BUFFER_SIZE = 1024 * 1024  # Write buffer for export files, in bytes
+BULK_UPDATE_CHUNK_SIZE = 500  # Purchases changed per statement by bulk approve/reject
+PDF_PAGED_ROWS = 200  # PDF report tables longer than this are rendered page by page
+PDF_PAGE_SUBTOTALS = True  # Add a subtotal row to every page of a paged PDF table
+
+# Receiving scan mode settings
+RECEIVING_FLUSH_SCANS = 20  # Queued scans are saved together once this many are waiting
+RECEIVING_FLUSH_MS = 1000  # ...and at the latest after this long
+RECEIVING_JOURNAL_SUFFIX = ".receiving-journal"  # Unsaved scans, one journal per session next to the database file
+
+# Local API server settings (python -m api.server)
+API_HOST = "127.0.0.1"  # Listen on this machine only; use 0.0.0.0 to serve the network
+API_PORT = 8765
+API_DB_WORKERS = 4  # Threads running database calls; stay below the engine's pool size
+API_MAX_QUEUED = 64  # Requests waiting for a database worker before new ones get 503
+API_PAGE_SIZE = 100  # Default page size of list endpoints
+API_MAX_PAGE_SIZE = 1000
+API_MAX_BODY_BYTES = 1024 * 1024
+API_RESPONSE_CACHE_SIZE = 256  # Encoded GET responses kept, keyed by ETag
+API_KEEPALIVE_SECONDS = 15  # Idle connections are closed after this long
+
 # UI settings
 UI_THEME = "clam"  # Possible values: "clam", "alt", "default"
 UI_FONTS = {
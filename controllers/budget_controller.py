@@ -1,13 +1,40 @@
 # controllers/budget_controller.py
 from datetime import datetime
 from database.models import Budget, YearlyBudgetAmount, PurchaseBudget, Purchase
+from sqlalchemy import select, insert, update, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import joinedload
+from utils.report_cache import ReportCache
+from utils.reference_cache import ReferenceCache
+from config.settings import REPORT_CACHE_SIZE, BULK_UPDATE_CHUNK_SIZE
 import uuid
 
 class BudgetController:
     def __init__(self, db_manager):
         self.db_manager = db_manager
         self.purchase_controller = None  # Will be set after initialization
+        self.report_cache = ReportCache(REPORT_CACHE_SIZE)
+        # Budget names, codes and ids for forms, reloaded only after budgets change
+        self.reference = ReferenceCache(db_manager, "budgets", self._load_reference)
+
+    def _load_reference(self):
+        session = self.db_manager.Session()
+        try:
+            rows = session.execute(select(Budget.id, Budget.code, Budget.name)).all()
+        finally:
+            session.close()
+        return {
+            "options": tuple((budget_id, name) for budget_id, _, name in rows),
+            "ids_by_code": {code: budget_id for budget_id, code, _ in rows},
+        }
+
+    def _code_taken(self, session, code, budget_id=None):
+        """Whether another budget has this code, checked only while duplicates hold back uq_budgets_code"""
+        if "uq_budgets_code" not in self.db_manager.skipped_indexes:
+            return False # The unique index rejects duplicates on flush
+        query = select(Budget.id).where(Budget.code == code, Budget.id != budget_id).limit(1)
+        return session.execute(query).first() is not None
 
     def set_purchase_controller(self, purchase_controller):
         """Set the purchase controller reference"""
@@ -35,11 +62,6 @@ class BudgetController:
         """Add a new budget with yearly amounts"""
         session = self.db_manager.Session()
         try:
-            # Check if budget code already exists
-            existing = session.query(Budget).filter(Budget.code == budget_data.get('code')).first()
-            if existing:
-                return False, "A budget with this code already exists"
-            
             # Extract yearly amount data before creating budget
             yearly_amount_data = budget_data.pop('yearly_amount', {}) if 'yearly_amount' in budget_data else {}
             
@@ -50,22 +72,23 @@ class BudgetController:
                 name=budget_data.get('name', ''),
                 description=budget_data.get('description', '')
             )
+            if self._code_taken(session, budget.code):
+                return False, "A budget with this code already exists"
             
             session.add(budget)
-            session.flush()  # Flush to get ID
+            session.flush()  # Flush to get ID; the unique index on code rejects duplicates here
             
-            # Now add yearly amounts as separate objects
-            for year, amount in yearly_amount_data.items():
-                yearly_amount = YearlyBudgetAmount(
-                    id=str(uuid.uuid4()),
-                    budget_id=budget.id,
-                    year=str(year),
-                    amount=float(amount)
-                )
-                session.add(yearly_amount)
+            # Now add yearly amounts in one statement
+            self._upsert_yearly_amounts(
+                session, [(budget.id, year, amount) for year, amount in yearly_amount_data.items()])
             
             session.commit()
             return True, "Budget added successfully"
+        except IntegrityError as e:
+            session.rollback()
+            if self.db_manager.is_unique_violation(e, "budgets.code"):
+                return False, "A budget with this code already exists"
+            return False, f"Failed to add budget: {str(e)}"
         except Exception as e:
             session.rollback()
             return False, f"Failed to add budget: {str(e)}"
@@ -85,52 +108,154 @@ class BudgetController:
             if not budget:
                 return False, "Budget not found"
             
-            # Check if budget code already exists (for a different budget)
-            code = budget_data.get('code')
-            existing = session.query(Budget).filter(
-                Budget.code == code, Budget.id != budget_id
-            ).first()
-            
-            if existing:
+            # Update budget fields; the unique index on code rejects duplicates
+            if budget_data.get('code', budget.code) != budget.code and self._code_taken(
+                    session, budget_data['code'], budget_id):
                 return False, "A budget with this code already exists"
-            
-            # Update budget fields
             budget.code = budget_data.get('code', budget.code)
             budget.name = budget_data.get('name', budget.name)
             budget.description = budget_data.get('description', budget.description)
             
-            # Handle yearly amounts
+            # Insert or replace the yearly amounts in one statement
             yearly_amount_data = budget_data.get('yearly_amount', {})
-            if yearly_amount_data:
-                # For each year in the data
-                for year, amount in yearly_amount_data.items():
-                    # Check if this year already exists
-                    existing_amount = session.query(YearlyBudgetAmount).filter(
-                        YearlyBudgetAmount.budget_id == budget_id,
-                        YearlyBudgetAmount.year == str(year)
-                    ).first()
-                    
-                    if existing_amount:
-                        # Update existing amount
-                        existing_amount.amount = float(amount)
-                    else:
-                        # Create new yearly amount
-                        new_amount = YearlyBudgetAmount(
-                            id=str(uuid.uuid4()),
-                            budget_id=budget_id,
-                            year=str(year),
-                            amount=float(amount)
-                        )
-                        session.add(new_amount)
+            self._upsert_yearly_amounts(
+                session, [(budget_id, year, amount) for year, amount in yearly_amount_data.items()])
             
             session.commit()
             return True, "Budget updated successfully"
+        except IntegrityError as e:
+            session.rollback()
+            if self.db_manager.is_unique_violation(e, "budgets.code"):
+                return False, "A budget with this code already exists"
+            return False, f"Failed to update budget: {str(e)}"
         except Exception as e:
             session.rollback()
             return False, f"Failed to update budget: {str(e)}"
         finally:
             session.close()
 
+    def _upsert_yearly_amounts(self, session, amounts):
+        """
+        Insert or replace yearly amounts given as (budget_id, year, amount):
+        one INSERT ... ON CONFLICT (budget_id, year) DO UPDATE, executed for
+        BULK_UPDATE_CHUNK_SIZE rows at a time.
+        """
+        rows = [
+            {"id": str(uuid.uuid4()), "budget_id": budget_id, "year": str(year), "amount": float(amount)}
+            for budget_id, year, amount in amounts
+        ]
+        if "uq_yearly_budget_amounts_budget_year" in self.db_manager.skipped_indexes:
+            # ON CONFLICT needs the unique index, which duplicates are holding back
+            self._update_or_insert_yearly_amounts(session, rows)
+        else:
+            statement = sqlite_insert(YearlyBudgetAmount)
+            statement = statement.on_conflict_do_update(
+                index_elements=[YearlyBudgetAmount.budget_id, YearlyBudgetAmount.year],
+                set_={"amount": statement.excluded.amount}
+            )
+            for start in range(0, len(rows), BULK_UPDATE_CHUNK_SIZE):
+                session.execute(statement, rows[start:start + BULK_UPDATE_CHUNK_SIZE])
+        if rows:
+            # Core statements bypass the ORM's change tracking
+            self.db_manager.touch(session, "budgets", *{f"year:{row['year']}" for row in rows})
+
+    @staticmethod
+    def _update_or_insert_yearly_amounts(session, rows):
+        """Set the first amount entered for each budget and year (the one shown), inserting missing years"""
+        first_ids = {}
+        budget_ids = list({row["budget_id"] for row in rows})
+        for start in range(0, len(budget_ids), BULK_UPDATE_CHUNK_SIZE):
+            for amount_id, budget_id, year in session.execute(
+                select(YearlyBudgetAmount.id, YearlyBudgetAmount.budget_id, YearlyBudgetAmount.year)
+                .where(YearlyBudgetAmount.budget_id.in_(budget_ids[start:start + BULK_UPDATE_CHUNK_SIZE]))
+                .order_by(text("yearly_budget_amounts.rowid"))
+            ):
+                first_ids.setdefault((budget_id, year), amount_id)
+
+        updates = [{"id": first_ids[(row["budget_id"], row["year"])], "amount": row["amount"]}
+                   for row in rows if (row["budget_id"], row["year"]) in first_ids]
+        inserts = [row for row in rows if (row["budget_id"], row["year"]) not in first_ids]
+        if updates:
+            session.execute(update(YearlyBudgetAmount), updates)
+        if inserts:
+            session.execute(insert(YearlyBudgetAmount), inserts)
+
+    def import_budget_amounts(self, file_path):
+        """
+        Set yearly amounts for many budgets from a CSV file, with either one
+        row per budget and year (Budget Code, Year, Amount) or one row per
+        budget and a column per year (Budget Code, 2024, 2025, ...).
+
+        Amounts already set for a budget and year are replaced. The file is
+        checked first and nothing is written if any row is invalid; then all
+        amounts are upserted in one transaction. Returns (success, message).
+        """
+        import csv
+        from utils.importers import normalize_headers
+
+        try:
+            with open(file_path, newline="", encoding="utf-8-sig") as f:
+                reader = csv.reader(f)
+                headers = normalize_headers(next(reader, []))
+                rows = list(reader)
+        except OSError as e:
+            return False, f"Could not read {file_path}: {str(e)}"
+
+        if "budget code" not in headers:
+            return False, "The file needs a Budget Code column"
+        code_index = headers.index("budget code")
+        if "year" in headers and "amount" in headers:
+            year_columns = None
+            year_index, amount_index = headers.index("year"), headers.index("amount")
+        else:
+            year_columns = [(i, name) for i, name in enumerate(headers) if name.isdigit() and len(name) == 4]
+            if not year_columns:
+                return False, "The file needs Year and Amount columns, or one column per year (e.g. 2025)"
+
+        budget_ids = self.reference.get()["ids_by_code"]
+        session = self.db_manager.Session()
+        try:
+            amounts = {}
+            problems = []
+            for row_num, values in enumerate(rows, start=2):
+                if not any(value.strip() for value in values):
+                    continue
+                values = values + [""] * (len(headers) - len(values))
+                code = values[code_index].strip()
+                if code not in budget_ids:
+                    problems.append(f"Row {row_num}: unknown budget code '{code}'")
+                    continue
+                if year_columns is None:
+                    cells = [(values[year_index].strip(), values[amount_index])]
+                else:
+                    # Blank cells leave that year's amount as it is
+                    cells = [(year, values[i]) for i, year in year_columns if values[i].strip()]
+                for year, amount in cells:
+                    if not (year.isdigit() and len(year) == 4):
+                        problems.append(f"Row {row_num}: invalid year '{year}'")
+                        continue
+                    try:
+                        amounts[(budget_ids[code], year)] = float(amount.replace(",", "").replace("$", ""))
+                    except ValueError:
+                        problems.append(f"Row {row_num}: invalid amount '{amount}' for {year}")
+
+            if problems:
+                more = f"\n... and {len(problems) - 10} more" if len(problems) > 10 else ""
+                return False, "Nothing was imported:\n" + "\n".join(problems[:10]) + more
+            if not amounts:
+                return False, "The file has no budget amounts"
+
+            self._upsert_yearly_amounts(
+                session, [(budget_id, year, amount) for (budget_id, year), amount in amounts.items()])
+            session.commit()
+            budgets = len({budget_id for budget_id, _ in amounts})
+            return True, f"Set {len(amounts)} yearly amounts for {budgets} budgets"
+        except Exception as e:
+            session.rollback()
+            return False, f"Failed to import budget amounts: {str(e)}"
+        finally:
+            session.close()
+
     def delete_budget(self, budget_id):
         """Delete a budget by ID"""
         session = self.db_manager.Session()
@@ -159,11 +284,24 @@ class BudgetController:
 
     def get_budget_options(self):
         """Get a list of budget options for dropdowns"""
-        return [(b.id, b.name) for b in self.get_all_budgets()]
+        return list(self.reference.get()["options"])
+
+    def get_budget_id_by_code(self, code):
+        """Get the id of the budget with this code, or None"""
+        return self.reference.get()["ids_by_code"].get(code)
 
     def calculate_budget_usage(self, year=None):
-        """Calculate budget usage for a specific year"""
+        """Calculate budget usage for a specific year (cached until the year's data changes)"""
         year = year or datetime.now().year
+        try:
+            key = ReportCache.make_key("budget_usage", year)
+            version = self.db_manager.cache_version(f"year:{year}")
+            return self.report_cache.get_or_compute(key, version, lambda: self._compute_budget_usage(year))
+        except Exception as e:
+            print(f"Error calculating budget usage: {str(e)}")
+            return []
+
+    def _compute_budget_usage(self, year):
         session = self.db_manager.Session()
         
         try:
@@ -210,8 +348,9 @@ class BudgetController:
                 })
             
             return result
-        except Exception as e:
-            print(f"Error calculating budget usage: {str(e)}")
-            return []
         finally:
-            session.close()
\ No newline at end of file
+            session.close()
+
+    def get_cache_stats(self):
+        """Return hit/miss statistics for the budget report cache"""
+        return self.report_cache.get_stats()
\ No newline at end of file
@@ -1,10 +1,34 @@
 # controllers/purchase_controller.py
-import csv
 import uuid
 from datetime import datetime
+from sqlalchemy import select, update, insert, delete, func, case, or_, false, literal_column
 from sqlalchemy.orm import joinedload, selectinload
 # Import related models needed for relationships and CSV import
 from database.models import Purchase, LineItem, PurchaseBudget, Vendor, Budget
+from config.settings import EXPORT_BATCH_SIZE, BULK_UPDATE_CHUNK_SIZE
+
+# Receiving statuses shown in the purchase list (see Purchase.get_status())
+RECEIVING_STATUSES = ("Pending", "Partial", "Received")
+
+# Columns update_purchase() takes from the form data
+PURCHASE_FIELDS = ("order_number", "invoice_number", "date", "vendor_id", "vendor_name",
+                   "status", "approver", "approval_date", "notes")
+LINE_ITEM_FIELDS = ("description", "quantity", "unit_price", "received")
+
+# Column sets offered by the detail exports, by export type
+DETAIL_COLUMN_SETS = {
+    "line_items": {
+        "standard": ["order_number", "date", "vendor", "description", "quantity", "unit_price",
+                     "line_total", "received"],
+        "full": ["order_number", "date", "vendor", "invoice_number", "approval_status", "approver",
+                 "description", "quantity", "unit_price", "line_total", "received"],
+    },
+    "allocations": {
+        "standard": ["order_number", "date", "vendor", "budget_code", "budget_year", "amount"],
+        "full": ["order_number", "date", "vendor", "invoice_number", "approval_status", "approver",
+                 "budget_code", "budget_name", "budget_year", "amount"],
+    },
+}
 
 
 class PurchaseController:
@@ -90,76 +114,177 @@ class PurchaseController:
 
     def update_purchase(self, purchase_id, updated_data):
         """Update an existing purchase"""
+        success, _, _ = self.update_purchase_diff(purchase_id, updated_data)
+        return success
+
+    def update_purchase_diff(self, purchase_id, updated_data):
+        """
+        Update an existing purchase, writing only what changed.
+
+        Incoming line items are matched to the purchase's rows by "id"; items
+        without one are matched to an unclaimed row with the same description,
+        quantity and unit price. Allocations are matched by "id", then by
+        budget_id. An "id" listed twice or belonging to another purchase
+        fails the update. Matched rows are updated only if a value differs,
+        the rest are inserted or deleted, one executemany statement per kind.
+        A missing "line_items" or "budgets" key leaves those rows alone.
+
+        Returns (success, message, changes), where changes counts the rows
+        written: {"purchase": 0 or 1, "line_items": {"updated", "inserted",
+        "deleted"}, "allocations": {...}} and the message summarises them.
+        """
+        changes = {
+            "purchase": 0,
+            "line_items": {"updated": 0, "inserted": 0, "deleted": 0},
+            "allocations": {"updated": 0, "inserted": 0, "deleted": 0},
+        }
         session = self.db_manager.Session()
         try:
-            # Fetch purchase with relationships needed for deletion/update
-            purchase = session.query(Purchase).options(
-                joinedload(Purchase.line_items),
-                joinedload(Purchase.budgets)
-            ).filter(Purchase.id == purchase_id).first()
-
+            purchase = session.get(Purchase, purchase_id)
             if not purchase:
-                return False
-
-            # Update purchase fields
-            purchase.order_number = updated_data.get("order_number", purchase.order_number)
-            purchase.invoice_number = updated_data.get("invoice_number", purchase.invoice_number)
-            purchase.date = updated_data.get("date", purchase.date)
-            purchase.vendor_id = updated_data.get("vendor_id", purchase.vendor_id)
-            purchase.vendor_name = updated_data.get("vendor_name", purchase.vendor_name)
-            purchase.status = updated_data.get("status", purchase.status)
-            purchase.approver = updated_data.get("approver", purchase.approver)
-            purchase.approval_date = updated_data.get("approval_date", purchase.approval_date)
-            purchase.notes = updated_data.get("notes", purchase.notes)
-
-            # Efficiently update line items: delete old, add new
-            # Delete existing line items associated with the purchase
-            for item in purchase.line_items:
-                session.delete(item)
-            # Clear the collection proxy to reflect the deletion
-            purchase.line_items.clear()
-            session.flush() # Ensure deletions are processed before adding new items
-
-            # Add new line items
-            for item_data in updated_data.get("line_items", []):
-                line_item = LineItem(
-                    id=str(uuid.uuid4()),
-                    purchase_id=purchase_id, # Explicitly set purchase_id
-                    description=item_data.get("description", ""),
-                    quantity=item_data.get("quantity", 1),
-                    unit_price=item_data.get("unit_price", 0.0),
-                    received=item_data.get("received", False)
-                )
-                session.add(line_item) # Add directly to session
-
-            # Efficiently update budget allocations: delete old, add new
-            # Delete existing budget allocations
-            for alloc in purchase.budgets:
-                session.delete(alloc)
-            # Clear the collection proxy
-            purchase.budgets.clear()
-            session.flush() # Ensure deletions are processed
-
-            # Add new budget allocations
-            for budget_alloc in updated_data.get("budgets", []):
-                if budget_alloc.get("budget_id"):
-                    purchase_budget = PurchaseBudget(
-                        id=str(uuid.uuid4()),
-                        purchase_id=purchase_id, # Explicitly set purchase_id
-                        budget_id=budget_alloc.get("budget_id"),
-                        amount=budget_alloc.get("amount", 0.0)
-                    )
-                    session.add(purchase_budget) # Add directly to session
+                return False, "Purchase not found", changes
+
+            old_date = purchase.date
+            for field in PURCHASE_FIELDS:
+                if field in updated_data and getattr(purchase, field) != updated_data[field]:
+                    setattr(purchase, field, updated_data[field])
+                    changes["purchase"] = 1
 
+            if "line_items" in updated_data:
+                self._apply_line_item_diff(session, purchase_id, updated_data["line_items"],
+                                           changes["line_items"])
+            if "budgets" in updated_data:
+                self._apply_allocation_diff(session, purchase_id, updated_data["budgets"],
+                                            changes["allocations"])
+
+            rows_changed = changes["purchase"] + sum(
+                count for kind in ("line_items", "allocations") for count in changes[kind].values())
+            if rows_changed > changes["purchase"]:
+                # Line item and allocation statements bypass the ORM's change tracking
+                years = {f"year:{str(d)[:4]}" for d in (old_date, purchase.date) if d}
+                self.db_manager.touch(session, "purchases", *years)
             session.commit()
-            return True
         except Exception as e:
             session.rollback()
             print(f"Error updating purchase: {str(e)}")
-            return False
+            return False, f"Failed to update purchase: {str(e)}", changes
         finally:
             session.close()
 
+        if not rows_changed:
+            return True, "No changes to save", changes
+        return True, self._describe_changes(changes), changes
+
+    @staticmethod
+    def _describe_changes(changes):
+        """Summary such as: Purchase updated: line items: 1 updated, 2 added; allocations: 1 removed"""
+        parts = ["details changed"] if changes["purchase"] else []
+        for kind, noun in (("line_items", "line items"), ("allocations", "allocations")):
+            counts = changes[kind]
+            done = [f"{counts[key]} {label}" for key, label in
+                    (("updated", "updated"), ("inserted", "added"), ("deleted", "removed")) if counts[key]]
+            if done:
+                parts.append(f"{noun}: {', '.join(done)}")
+        return "Purchase updated: " + "; ".join(parts)
+
+    @staticmethod
+    def _check_incoming_ids(rows_data, existing, noun):
+        """Ids sent with line items or allocations must be unique and belong to the purchase"""
+        ids = [row_data["id"] for row_data in rows_data if row_data.get("id")]
+        if len(set(ids)) != len(ids):
+            raise ValueError(f"The same {noun} is listed more than once")
+        unknown = set(ids) - existing.keys()
+        if unknown:
+            raise ValueError(f"{len(unknown)} {noun}(s) do not belong to this purchase")
+
+    def _apply_line_item_diff(self, session, purchase_id, items_data, counts):
+        existing = {row.id: row for row in session.execute(
+            select(LineItem.id, *[getattr(LineItem, field) for field in LINE_ITEM_FIELDS])
+            .where(LineItem.purchase_id == purchase_id)
+        )}
+
+        self._check_incoming_ids(items_data, existing, "line item")
+
+        # Claim rows by id first, so content matching cannot take a row an id refers to
+        matches = [item_data.get("id") or None for item_data in items_data]
+        unclaimed = [row for row_id, row in existing.items() if row_id not in set(matches)]
+        for i, item_data in enumerate(items_data):
+            if matches[i] is None:
+                key = (item_data.get("description", ""), item_data.get("quantity", 1),
+                       item_data.get("unit_price", 0.0))
+                row = next((row for row in unclaimed
+                            if (row.description, row.quantity, row.unit_price) == key), None)
+                if row is not None:
+                    unclaimed.remove(row)
+                    matches[i] = row.id
+
+        updates, inserts = [], []
+        for item_data, row_id in zip(items_data, matches):
+            if row_id is None:
+                inserts.append({
+                    "id": str(uuid.uuid4()),
+                    "purchase_id": purchase_id,
+                    "description": item_data.get("description", ""),
+                    "quantity": item_data.get("quantity", 1),
+                    "unit_price": item_data.get("unit_price", 0.0),
+                    "received": item_data.get("received", False),
+                })
+                continue
+            row = existing[row_id]
+            # A missing "received" keeps the row's flag
+            values = {field: item_data.get(field, getattr(row, field)) for field in LINE_ITEM_FIELDS}
+            if any(values[field] != getattr(row, field) for field in LINE_ITEM_FIELDS):
+                updates.append(dict(values, id=row_id))
+
+        deletes = [row.id for row in unclaimed]
+        self._write_diff(session, LineItem, updates, inserts, deletes)
+        counts.update(updated=len(updates), inserted=len(inserts), deleted=len(deletes))
+
+    def _apply_allocation_diff(self, session, purchase_id, budgets_data, counts):
+        existing = {row.id: row for row in session.execute(
+            select(PurchaseBudget.id, PurchaseBudget.budget_id, PurchaseBudget.amount)
+            .where(PurchaseBudget.purchase_id == purchase_id)
+        )}
+        budgets_data = [budget_alloc for budget_alloc in budgets_data if budget_alloc.get("budget_id")]
+        self._check_incoming_ids(budgets_data, existing, "budget allocation")
+
+        # Rows claimed by id are not matched by budget
+        claimed = {budget_alloc.get("id") for budget_alloc in budgets_data}
+        unclaimed = {}
+        for row in existing.values():
+            if row.id not in claimed:
+                unclaimed.setdefault(row.budget_id, []).append(row)
+
+        updates, inserts = [], []
+        for budget_alloc in budgets_data:
+            budget_id = budget_alloc["budget_id"]
+            amount = budget_alloc.get("amount", 0.0)
+            if budget_alloc.get("id"):
+                row = existing[budget_alloc["id"]]
+            elif unclaimed.get(budget_id):
+                row = unclaimed[budget_id].pop(0)
+            else:
+                inserts.append({"id": str(uuid.uuid4()), "purchase_id": purchase_id,
+                                "budget_id": budget_id, "amount": amount})
+                continue
+            if (row.budget_id, row.amount) != (budget_id, amount):
+                updates.append({"id": row.id, "budget_id": budget_id, "amount": amount})
+
+        deletes = [row.id for rows in unclaimed.values() for row in rows]
+        self._write_diff(session, PurchaseBudget, updates, inserts, deletes)
+        counts.update(updated=len(updates), inserted=len(inserts), deleted=len(deletes))
+
+    @staticmethod
+    def _write_diff(session, model, updates, inserts, deletes):
+        """Apply a diff with one executemany UPDATE and INSERT and a DELETE per chunk of ids"""
+        if updates:
+            session.execute(update(model), updates)
+        if inserts:
+            session.execute(insert(model), inserts)
+        for start in range(0, len(deletes), BULK_UPDATE_CHUNK_SIZE):
+            session.execute(delete(model).where(model.id.in_(deletes[start:start + BULK_UPDATE_CHUNK_SIZE]))
+                            .execution_options(synchronize_session=False))
+
     def delete_purchase(self, purchase_id):
         """Delete a purchase by ID"""
         session = self.db_manager.Session()
@@ -235,37 +360,135 @@ class PurchaseController:
     # def _calculate_purchase_total(self, purchase): ... (removed for simplicity)
 
     def receive_items(self, purchase_id, item_indices, received_status):
-        """Mark items as received or not received"""
+        """
+        Mark items as received or not received, by their position in the
+        purchase's line items in entry order (position 0 is line 1 of
+        get_open_line_items()). Prefer receive_line_items(), which takes
+        ids. Returns (success, message).
+        """
         session = self.db_manager.Session()
         try:
-            # Load purchase and relevant line items efficiently
-            purchase = session.query(Purchase).options(
-                joinedload(Purchase.line_items)
-            ).filter(Purchase.id == purchase_id).first()
+            item_ids = session.scalars(
+                select(LineItem.id).where(LineItem.purchase_id == purchase_id)
+                .order_by(literal_column("line_items.rowid"))
+            ).all()
+            if not item_ids and session.get(Purchase, purchase_id) is None:
+                return False, "Purchase not found"
+        except Exception as e:
+            print(f"Error receiving items: {str(e)}")
+            return False, f"Failed to update items: {str(e)}"
+        finally:
+            session.close()
 
-            if not purchase:
-                return False
+        selected = [item_ids[idx] for idx in item_indices if 0 <= idx < len(item_ids)]
+        if not selected:
+            return True, "No line items to update"
+        success, message, _ = self.receive_line_items(selected, received_status)
+        return success, message
 
-            # Ensure line_items are loaded and accessible as a list
-            line_items_list = list(purchase.line_items)
+    def receive_line_items(self, line_item_ids, received_status=True):
+        """
+        Mark line items as received or not received, by id. The items may
+        belong to any number of purchases; all of them are updated in one
+        transaction, with one UPDATE per BULK_UPDATE_CHUNK_SIZE ids.
 
-            updated = False
-            for idx in item_indices:
-                if 0 <= idx < len(line_items_list):
-                    if line_items_list[idx].received != received_status:
-                         line_items_list[idx].received = received_status
-                         updated = True
+        Returns (success, message, rollups). rollups maps the id of every
+        purchase with an updated item to its new total, item_count,
+        received_count and receiving status. Unknown ids are skipped and
+        counted in the message.
+        """
+        ids = list(dict.fromkeys(line_item_ids))
+        if not ids:
+            return True, "No line items to update", {}
 
-            if updated:
-                session.commit()
-            return True
+        session = self.db_manager.Session()
+        try:
+            purchase_ids = set()
+            updated = 0
+            for start in range(0, len(ids), BULK_UPDATE_CHUNK_SIZE):
+                chunk = ids[start:start + BULK_UPDATE_CHUNK_SIZE]
+                rows = session.scalars(
+                    update(LineItem)
+                    .where(LineItem.id.in_(chunk))
+                    .values(received=bool(received_status))
+                    .returning(LineItem.purchase_id)
+                    .execution_options(synchronize_session=False)
+                ).all()
+                updated += len(rows)
+                purchase_ids.update(rows)
+            if not updated:
+                session.rollback()
+                return False, "Line items not found", {}
+
+            rollups = self._receiving_rollups(session, list(purchase_ids))
+            # Core UPDATEs bypass the ORM; received flags only show in purchase lists
+            self.db_manager.touch(session, "purchases")
+            session.commit()
         except Exception as e:
             session.rollback()
             print(f"Error receiving items: {str(e)}")
-            return False
+            return False, f"Failed to update items: {str(e)}", {}
         finally:
             session.close()
 
+        message = f"{updated} line items marked as {'received' if received_status else 'not received'}"
+        if updated < len(ids):
+            message += f", {len(ids) - updated} not found"
+        return True, message, rollups
+
+    def get_open_line_items(self, order_numbers):
+        """
+        Line items not yet received on the given orders, for receiving scans.
+        Returns rows of (order_number, line, line_item_id, purchase_id,
+        description, quantity), where line is the item's 1-based position
+        in its purchase counting received items too. Rejected purchases are
+        left out.
+        """
+        session = self.db_manager.Session()
+        try:
+            numbered = select(
+                Purchase.order_number,
+                func.row_number().over(
+                    partition_by=LineItem.purchase_id,
+                    order_by=literal_column("line_items.rowid")
+                ).label("line"),
+                LineItem.id.label("line_item_id"),
+                LineItem.purchase_id,
+                LineItem.description,
+                LineItem.quantity,
+                LineItem.received,
+            ).join(Purchase, Purchase.id == LineItem.purchase_id).where(
+                Purchase.order_number.in_(list(order_numbers)),
+                Purchase.status != "Rejected"
+            ).subquery()
+            return session.execute(
+                select(numbered.c.order_number, numbered.c.line, numbered.c.line_item_id,
+                       numbered.c.purchase_id, numbered.c.description, numbered.c.quantity)
+                .where(or_(numbered.c.received == False, numbered.c.received.is_(None)))
+                .order_by(numbered.c.order_number, numbered.c.line)
+            ).all()
+        except Exception as e:
+            print(f"Error loading open line items: {str(e)}")
+            return []
+        finally:
+            session.close()
+
+    def _receiving_rollups(self, session, purchase_ids):
+        """{purchase_id: {"total", "item_count", "received_count", "status"}} from the database"""
+        rollups = {}
+        for start in range(0, len(purchase_ids), BULK_UPDATE_CHUNK_SIZE):
+            items = self._line_item_totals(purchase_ids[start:start + BULK_UPDATE_CHUNK_SIZE])
+            total, receiving_status = self._receiving_columns(items)
+            for row in session.execute(select(items.c.purchase_id, total, items.c.item_count,
+                                              items.c.received_count, receiving_status)):
+                rollups[row[0]] = {
+                    "total": row[1],
+                    "item_count": row[2],
+                    "received_count": row[3],
+                    "status": row[4],
+                }
+        return rollups
+
     def approve_purchase(self, purchase_id, approver):
         """Approve a purchase"""
         session = self.db_manager.Session()
@@ -311,6 +534,432 @@ class PurchaseController:
         finally:
             session.close()
 
+    def approve_purchases(self, purchase_ids, approver, progress_callback=None, cancel_event=None):
+        """
+        Approve many purchases at once.
+
+        Returns {purchase_id: (success, message)}, with the messages
+        approve_purchase() gives. See _set_approval_status.
+        """
+        return self._set_approval_status(purchase_ids, "Approved", approver, None,
+                                         progress_callback, cancel_event)
+
+    def reject_purchases(self, purchase_ids, approver, notes="", progress_callback=None, cancel_event=None):
+        """
+        Reject many purchases at once, with the same notes.
+
+        Returns {purchase_id: (success, message)}, with the messages
+        reject_purchase() gives. See _set_approval_status.
+        """
+        return self._set_approval_status(purchase_ids, "Rejected", approver, notes,
+                                         progress_callback, cancel_event)
+
+    def _set_approval_status(self, purchase_ids, status, approver, notes, progress_callback, cancel_event):
+        """
+        Approve or reject purchases with one conditional UPDATE per chunk of
+        BULK_UPDATE_CHUNK_SIZE ids, committed chunk by chunk. Only purchases
+        still Pending are changed, so a purchase another user decided on in
+        the meantime is reported rather than overwritten.
+
+        progress_callback(done, total) is called after every chunk; setting
+        cancel_event stops before the next chunk (purchases not reached get
+        no outcome).
+        """
+        verb, done_message = {
+            "Approved": ("approve", "Purchase approved successfully"),
+            "Rejected": ("reject", "Purchase rejected successfully"),
+        }[status]
+        values = {"status": status, "approver": approver, "approval_date": datetime.now().strftime("%Y-%m-%d")}
+        if notes is not None:
+            values["notes"] = notes
+
+        ids = list(dict.fromkeys(purchase_ids))
+        outcomes = {}
+        session = self.db_manager.Session()
+        try:
+            for start in range(0, len(ids), BULK_UPDATE_CHUNK_SIZE):
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                chunk = ids[start:start + BULK_UPDATE_CHUNK_SIZE]
+                try:
+                    changed = set(session.scalars(
+                        update(Purchase)
+                        .where(Purchase.status == "Pending", Purchase.id.in_(chunk))
+                        .values(**values)
+                        .returning(Purchase.id)
+                        .execution_options(synchronize_session=False)
+                    ))
+                    # Say why the others were left alone, as of this transaction
+                    others = [purchase_id for purchase_id in chunk if purchase_id not in changed]
+                    current = dict(session.execute(
+                        select(Purchase.id, Purchase.status).where(Purchase.id.in_(others))
+                    ).all()) if others else {}
+                    if changed:
+                        # Core UPDATEs bypass the ORM; approval status only shows in purchase lists
+                        self.db_manager.touch(session, "purchases")
+                    session.commit()
+                except Exception as e:
+                    session.rollback()
+                    for purchase_id in ids[start:]:
+                        outcomes[purchase_id] = (False, f"Failed to {verb} purchase: {str(e)}")
+                    break
+
+                for purchase_id in chunk:
+                    if purchase_id in changed:
+                        outcomes[purchase_id] = (True, done_message)
+                    elif purchase_id in current:
+                        outcomes[purchase_id] = (False, f"Purchase status is already {current[purchase_id]}")
+                    else:
+                        outcomes[purchase_id] = (False, "Purchase not found")
+                if progress_callback:
+                    progress_callback(start + len(chunk), len(ids))
+            return outcomes
+        finally:
+            session.close()
+
+    def count_purchases_by_approval_status(self):
+        """Get {approval status: number of purchases}"""
+        session = self.db_manager.Session()
+        try:
+            return dict(session.execute(
+                select(Purchase.status, func.count(Purchase.id)).group_by(Purchase.status)
+            ).all())
+        finally:
+            session.close()
+
+    @staticmethod
+    def _line_item_totals(purchase_ids=None):
+        """Subquery of each purchase's total, item count and received item count"""
+        items = select(
+            LineItem.purchase_id,
+            func.sum(LineItem.quantity * LineItem.unit_price).label("total"),
+            func.count(LineItem.id).label("item_count"),
+            func.sum(case((LineItem.received == True, 1), else_=0)).label("received_count")
+        )
+        if purchase_ids is not None:
+            items = items.where(LineItem.purchase_id.in_(purchase_ids))
+        return items.group_by(LineItem.purchase_id).subquery()
+
+    @staticmethod
+    def _receiving_columns(items):
+        """Total and receiving status expressions over a _line_item_totals() subquery"""
+        total = func.coalesce(items.c.total, 0.0)
+        # Same rules as Purchase.get_status()
+        receiving_status = case(
+            (items.c.received_count == items.c.item_count, "Received"),
+            (items.c.received_count > 0, "Partial"),
+            else_="Pending"
+        )
+        return total, receiving_status
+
+    @staticmethod
+    def _status_can_match(search):
+        """Whether a search text is part of any receiving status name"""
+        return any(search.lower() in name.lower() for name in RECEIVING_STATUSES)
+
+    @staticmethod
+    def _listing_search(search, search_field, columns):
+        """
+        WHERE condition for a purchase list search. columns maps the list
+        headings to expressions; the Status column is skipped when the text
+        cannot match a status name.
+        """
+        fields = [search_field] if search_field in columns else list(columns)
+        if "Status" in fields and not PurchaseController._status_can_match(search):
+            fields.remove("Status")
+        if not fields:
+            return false()
+        return or_(*[
+            func.lower(func.coalesce(columns[field], "")).contains(search.lower(), autoescape=True)
+            for field in fields
+        ])
+
+    def _listing_needs_totals(self, status=None, search=None, search_field="All Fields", sort_column=None):
+        """Whether filtering or sorting the purchase list depends on line item totals"""
+        if (status and status != "All") or sort_column in ("Total", "Status"):
+            return True
+        return bool(search) and search_field not in ("Order #", "Vendor", "Date") and self._status_can_match(search)
+
+    def _listing_purchases(self, search=None, search_field="All Fields", approval_status=None):
+        """The purchase list's own columns, filtered on the purchases table alone"""
+        query = select(
+            Purchase.id,
+            Purchase.order_number,
+            Purchase.vendor_name,
+            Purchase.date,
+            Purchase.invoice_number,
+            Purchase.status.label("approval_status")
+        )
+        if approval_status and approval_status != "All":
+            query = query.where(Purchase.status == approval_status)
+        if search:
+            query = query.where(self._listing_search(search, search_field, {
+                "Order #": Purchase.order_number,
+                "Vendor": Purchase.vendor_name,
+                "Date": Purchase.date,
+                "Status": None,
+            }))
+        return query
+
+    def _purchase_listing_query(self, status=None, search=None, search_field="All Fields",
+                                sort_column=None, sort_reverse=False, approval_status=None, page=None):
+        """
+        Build the purchase list query: one row per purchase with its total and
+        receiving status computed in SQL, filtered and sorted like the list view.
+
+        page=(offset, limit) selects one page of the list. When neither the
+        filters nor the sort depend on totals, the page is picked from the
+        purchases table first and totals are computed for its rows only.
+        """
+        def ordering(sort_expression, unique_column):
+            order = [] if sort_expression is None else [
+                sort_expression.desc() if sort_reverse else sort_expression.asc()]
+            # A unique tie-breaker keeps consecutive pages from overlapping
+            return order + [unique_column] if page is not None else order
+
+        if page is not None and not self._listing_needs_totals(status, search, search_field, sort_column):
+            offset, limit = page
+            sort_expression = self._listing_sort_expression(
+                Purchase.order_number, Purchase.vendor_name, Purchase.date, None, None, sort_column)
+            rows = self._listing_purchases(search, search_field, approval_status).order_by(
+                *ordering(sort_expression, Purchase.id)).offset(offset).limit(limit).subquery()
+
+            items = self._line_item_totals(select(rows.c.id))
+            total, receiving_status = self._receiving_columns(items)
+            sort_expression = self._listing_sort_expression(
+                rows.c.order_number, rows.c.vendor_name, rows.c.date, None, None, sort_column)
+            return select(
+                rows.c.id,
+                rows.c.order_number,
+                rows.c.vendor_name,
+                rows.c.date,
+                rows.c.invoice_number,
+                total.label("total"),
+                receiving_status.label("status"),
+                rows.c.approval_status
+            ).outerjoin(items, items.c.purchase_id == rows.c.id).order_by(*ordering(sort_expression, rows.c.id))
+
+        items = self._line_item_totals()
+        total, receiving_status = self._receiving_columns(items)
+        query = select(
+            Purchase.id,
+            Purchase.order_number,
+            Purchase.vendor_name,
+            Purchase.date,
+            Purchase.invoice_number,
+            total.label("total"),
+            receiving_status.label("status"),
+            Purchase.status.label("approval_status")
+        ).outerjoin(items, items.c.purchase_id == Purchase.id)
+
+        if status and status != "All":
+            query = query.where(receiving_status == status)
+        if approval_status and approval_status != "All":
+            query = query.where(Purchase.status == approval_status)
+
+        if search:
+            query = query.where(self._listing_search(search, search_field, {
+                "Order #": Purchase.order_number,
+                "Vendor": Purchase.vendor_name,
+                "Date": Purchase.date,
+                "Status": receiving_status,
+            }))
+
+        sort_expression = self._listing_sort_expression(
+            Purchase.order_number, Purchase.vendor_name, Purchase.date, total, receiving_status, sort_column)
+        order = ordering(sort_expression, Purchase.id)
+        if order:
+            query = query.order_by(*order)
+        if page is not None:
+            query = query.offset(page[0]).limit(page[1])
+        return query
+
+    @staticmethod
+    def _listing_sort_expression(order_number, vendor_name, date, total, status, sort_column):
+        """The ORDER BY expression for a purchase list column heading, or None"""
+        return {
+            "Order #": func.coalesce(order_number, ""),
+            "Vendor": func.coalesce(vendor_name, ""),
+            "Date": func.coalesce(date, ""),
+            "Total": total,
+            "Status": status,
+        }.get(sort_column)
+
+    def get_purchase_listing(self, status=None, search=None, search_field="All Fields",
+                             sort_column=None, sort_reverse=False, approval_status=None, offset=0, limit=None):
+        """
+        Get (id, order_number, vendor_name, date, invoice_number, total, status,
+        approval_status) rows for the purchase list, without loading line items.
+        With a limit, returns one page of the list starting at offset.
+        """
+        session = self.db_manager.Session()
+        try:
+            page = (offset, limit) if limit is not None else None
+            query = self._purchase_listing_query(status, search, search_field, sort_column, sort_reverse,
+                                                 approval_status, page)
+            return session.execute(query).all()
+        finally:
+            session.close()
+
+    def count_purchase_listing(self, status=None, search=None, search_field="All Fields", approval_status=None):
+        """Count the purchases get_purchase_listing() returns for the same filters"""
+        session = self.db_manager.Session()
+        try:
+            if self._listing_needs_totals(status, search, search_field):
+                query = self._purchase_listing_query(status, search, search_field, approval_status=approval_status)
+            else:
+                query = self._listing_purchases(search, search_field, approval_status)
+            return session.scalar(select(func.count()).select_from(query.subquery()))
+        finally:
+            session.close()
+
+    def get_purchase_listing_ids(self, status=None, search=None, search_field="All Fields", approval_status=None):
+        """Get the ids of every purchase get_purchase_listing() returns for the same filters"""
+        session = self.db_manager.Session()
+        try:
+            if self._listing_needs_totals(status, search, search_field):
+                query = self._purchase_listing_query(status, search, search_field, approval_status=approval_status)
+            else:
+                query = self._listing_purchases(search, search_field, approval_status)
+            return list(session.scalars(select(query.subquery().c.id)))
+        finally:
+            session.close()
+
+    def export_purchases_csv(self, file_path, status=None, search=None, search_field="All Fields",
+                             sort_column=None, sort_reverse=False, progress_callback=None, cancel_event=None):
+        """
+        Export the purchase list, with the given filters and sort, to CSV.
+
+        Rows are streamed from the database in batches, so memory use does
+        not grow with the number of purchases. Files ending in .gz are
+        gzip-compressed.
+        """
+        from utils.exporters import CSVExporter
+        session = self.db_manager.Session()
+        try:
+            query = self._purchase_listing_query(status, search, search_field, sort_column, sort_reverse)
+            total = None
+            if progress_callback:
+                total = session.scalar(select(func.count()).select_from(query.order_by(None).subquery()))
+
+            result = session.execute(query, execution_options={"yield_per": EXPORT_BATCH_SIZE})
+            rows = ((row.order_number, row.date, row.vendor_name, row.invoice_number, row.total, row.status)
+                    for row in result)
+            return CSVExporter.export_purchase_rows(rows, file_path, total=total,
+                                                    progress_callback=progress_callback,
+                                                    cancel_event=cancel_event)
+        except Exception as e:
+            return False, f"Export failed: {str(e)}"
+        finally:
+            session.close()
+
+    def _detail_export_columns(self, detail):
+        """
+        Columns available to a detail export: key -> (header, SQL expression).
+
+        Numbers are formatted in SQL so the rows can be written as they come.
+        """
+        def money(value):
+            return func.printf("%.2f", func.coalesce(value, 0.0))
+
+        columns = {
+            "order_number": ("Order Number", Purchase.order_number),
+            "date": ("Date", Purchase.date),
+            "vendor": ("Vendor", Purchase.vendor_name),
+            "invoice_number": ("Invoice Number", Purchase.invoice_number),
+            "approval_status": ("Approval Status", Purchase.status),
+            "approver": ("Approver", Purchase.approver),
+        }
+        if detail == "line_items":
+            columns.update({
+                "description": ("Description", LineItem.description),
+                "quantity": ("Quantity", LineItem.quantity),
+                "unit_price": ("Unit Price", money(LineItem.unit_price)),
+                "line_total": ("Line Total", money(LineItem.quantity * LineItem.unit_price)),
+                "received": ("Received", case((LineItem.received == True, "Yes"), else_="No")),
+            })
+        else:
+            columns.update({
+                "budget_code": ("Budget Code", Budget.code),
+                "budget_name": ("Budget Name", Budget.name),
+                # Allocations count against the budget year the purchase is dated in
+                "budget_year": ("Budget Year", func.substr(Purchase.date, 1, 4)),
+                "amount": ("Amount", money(PurchaseBudget.amount)),
+            })
+        return columns
+
+    def export_purchase_details(self, file_path, detail="line_items", columns="standard", status=None,
+                                search=None, search_field="All Fields", sort_column=None, sort_reverse=False,
+                                progress_callback=None, cancel_event=None):
+        """
+        Export one row per line item (detail="line_items") or per budget
+        allocation (detail="allocations") for the purchases in the list.
+
+        columns is a column set name from DETAIL_COLUMN_SETS or a list of
+        column keys. The list filters and sort apply as in
+        export_purchases_csv, and rows are streamed from a join query in
+        batches, so memory use does not grow with the number of rows.
+        """
+        from utils.exporters import CSVExporter
+        if detail not in DETAIL_COLUMN_SETS:
+            return False, f"Unknown detail export: {detail}"
+        available = self._detail_export_columns(detail)
+        keys = DETAIL_COLUMN_SETS[detail].get(columns) if isinstance(columns, str) else list(columns)
+        if not keys:
+            return False, f"Unknown column set: {columns}"
+        unknown = [key for key in keys if key not in available]
+        if unknown:
+            return False, f"Unknown export columns: {', '.join(unknown)}"
+
+        if detail == "line_items":
+            query = select(*[available[key][1] for key in keys]).select_from(LineItem).join(
+                Purchase, Purchase.id == LineItem.purchase_id)
+            detail_id = LineItem.id
+            noun = "line items"
+        else:
+            query = select(*[available[key][1] for key in keys]).select_from(PurchaseBudget).join(
+                Purchase, Purchase.id == PurchaseBudget.purchase_id).outerjoin(
+                Budget, Budget.id == PurchaseBudget.budget_id)
+            detail_id = PurchaseBudget.id
+            noun = "budget allocations"
+
+        filtered = (status and status != "All") or search
+        if filtered or sort_column:
+            # Restrict and order by the purchase list, so the export matches the screen
+            listing = self._purchase_listing_query(status, search, search_field).subquery()
+            query = query.join(listing, listing.c.id == Purchase.id)
+            sort_expression = self._listing_sort_expression(
+                listing.c.order_number, listing.c.vendor_name, listing.c.date, listing.c.total,
+                listing.c.status, sort_column)
+            if sort_expression is not None:
+                query = query.order_by(sort_expression.desc() if sort_reverse else sort_expression.asc(),
+                                       Purchase.id, detail_id)
+
+        session = self.db_manager.Session()
+        try:
+            total = None
+            if progress_callback:
+                total = session.scalar(select(func.count()).select_from(query.order_by(None).subquery()))
+
+            result = session.execute(query, execution_options={"yield_per": EXPORT_BATCH_SIZE})
+            return CSVExporter.export_formatted_rows(result.partitions(), file_path,
+                                                     [available[key][0] for key in keys], noun=noun,
+                                                     total=total, progress_callback=progress_callback,
+                                                     cancel_event=cancel_event)
+        except Exception as e:
+            return False, f"Export failed: {str(e)}"
+        finally:
+            session.close()
+
+    def export_snapshot(self, path, file_format=None, progress_callback=None, cancel_event=None):
+        """
+        Write a columnar snapshot of purchases, line items, allocations,
+        vendors and budgets for analysis: a NumPy .npz file, or Parquet /
+        Arrow IPC files when pyarrow is installed (see utils.snapshot)
+        """
+        from utils.snapshot import SnapshotExporter
+        return SnapshotExporter(self.db_manager).export(path, file_format, progress_callback, cancel_event)
+
     def get_purchases_by_approval_status(self, status="Pending"):
         """Get purchases by approval status with relationships eagerly loaded"""
         session = self.db_manager.Session()
@@ -324,179 +973,70 @@ class PurchaseController:
         finally:
             session.close()
 
-    def import_purchases_from_csv(self, file_path):
-        """Import purchases from a CSV file"""
+    def create_purchase_importer(self, chunk_size=20000, error_report_path=None, progress_callback=None):
+        """Create an importer that can be paused, resumed or cancelled while it runs"""
+        from utils.importers import PurchaseImporter
+        return PurchaseImporter(self.db_manager, chunk_size=chunk_size, error_report_path=error_report_path,
+                                progress_callback=progress_callback)
+
+    def import_purchases_from_csv(self, file_path, chunk_size=20000, error_report_path=None, workers=1,
+                                  dry_run=False):
+        """
+        Import purchases from a CSV or JSON Lines (.jsonl) file.
+
+        Rows are streamed and committed in chunks; rows that fail are listed
+        in an error report CSV next to the input file (or error_report_path).
+        With workers > 1, rows are parsed and validated in worker processes.
+        With dry_run, the file is only validated (see validate_purchase_import).
+        """
+        if dry_run:
+            return self.validate_purchase_import(file_path, error_report_path=error_report_path)
+        importer = self.create_purchase_importer(chunk_size=chunk_size, error_report_path=error_report_path)
+        return importer.import_file(file_path, workers=workers)
+
+    def validate_purchase_import(self, file_path, error_report_path=None):
+        """
+        Dry run of an import: check the whole file without writing to the database.
+
+        Returns (success, summary). The summary is also saved next to the
+        file, with the per-row problems in an error report CSV.
+        """
+        from utils.import_validation import ImportValidator
+        validator = ImportValidator(self.db_manager, error_report_path=error_report_path)
+        return validator.validate(file_path)
+
+    def get_resumable_import_jobs(self):
+        """Get imports that stopped before finishing, most recent first"""
+        from database.models import ImportJob
+        from utils.importers import RESUMABLE_JOB_STATUSES
+        session = self.db_manager.Session()
+        try:
+            jobs = session.query(ImportJob).filter(
+                ImportJob.status.in_(RESUMABLE_JOB_STATUSES)
+            ).order_by(ImportJob.updated_at.desc()).all()
+            return [job.to_dict() for job in jobs]
+        finally:
+            session.close()
+
+    def resume_import_job(self, job_id, chunk_size=20000, workers=1):
+        """Continue an interrupted import from its last committed chunk"""
+        importer = self.create_purchase_importer(chunk_size=chunk_size)
+        return importer.resume_job(job_id, workers=workers)
+
+    def cancel_import_job(self, job_id):
+        """Mark an unfinished import as cancelled so it is no longer offered for resuming"""
+        from database.models import ImportJob
         session = self.db_manager.Session()
         try:
-            imported_count = 0
-            error_count = 0
-            skipped_count = 0
-            processed_orders = set() # Keep track of processed order numbers
-
-            # Pre-fetch existing vendors and budgets for efficiency
-            vendors_dict = {v.name: v.id for v in session.query(Vendor).all()}
-            budgets_dict = {b.code: b.id for b in session.query(Budget).all()}
-            existing_orders = {p.order_number for p in session.query(Purchase.order_number).all()}
-
-
-            with open(file_path, 'r', newline='', encoding='utf-8') as csvfile: # Added encoding
-                reader = csv.DictReader(csvfile)
-                if not reader.fieldnames:
-                     return False, "CSV file is empty or header is missing."
-
-                # Normalize headers (lowercase, strip spaces)
-                reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
-                required_headers = ['order number', 'vendor', 'date']
-                # Case-insensitive check for required headers
-                if not all(req in reader.fieldnames for req in required_headers):
-                     missing = [req for req in required_headers if req not in reader.fieldnames]
-                     return False, f"Missing required CSV headers: {', '.join(missing)}"
-
-
-                for row_num, row in enumerate(reader, start=2): # Start from row 2 (after header)
-                    # Normalize row keys
-                    row = {k.strip().lower(): v.strip() for k, v in row.items()}
-
-                    order_number = row.get('order number', '').strip()
-
-                    # Skip if required fields are missing for this row
-                    if not order_number or not row.get('vendor') or not row.get('date'):
-                        print(f"Skipping row {row_num}: Missing required fields (Order Number, Vendor, or Date).")
-                        error_count += 1
-                        continue
-
-                    # Skip if order number already exists in DB or this batch
-                    if order_number in existing_orders or order_number in processed_orders:
-                        print(f"Skipping row {row_num}: Order Number '{order_number}' already exists.")
-                        skipped_count += 1
-                        continue
-
-                    try:
-                        # --- Vendor Handling ---
-                        vendor_name = row.get('vendor', '').strip()
-                        vendor_id = vendors_dict.get(vendor_name)
-
-                        if not vendor_id:
-                            # Create new vendor if not found
-                            vendor_id = str(uuid.uuid4())
-                            new_vendor = Vendor(
-                                id=vendor_id,
-                                name=vendor_name,
-                            )
-                            session.add(new_vendor)
-                            vendors_dict[vendor_name] = vendor_id # Add to cache
-                            print(f"Row {row_num}: Created new vendor '{vendor_name}'.")
-
-
-                        # --- Date Parsing ---
-                        date_str = row.get('date', '').strip()
-                        date_formats = ["%Y-%m-%d", "%m/%d/%Y", "%m-%d-%Y", "%Y/%m/%d"]
-                        parsed_date = None
-                        for fmt in date_formats:
-                            try:
-                                parsed_date = datetime.strptime(date_str, fmt).strftime("%Y-%m-%d")
-                                break
-                            except ValueError:
-                                continue
-                        if not parsed_date:
-                            print(f"Skipping row {row_num}: Could not parse date '{date_str}'. Using today's date.")
-                            # error_count += 1 # Decide if this counts as error or just use today
-                            # continue
-                            parsed_date = datetime.now().strftime("%Y-%m-%d")
-
-
-                        # --- Create Purchase ---
-                        purchase = Purchase(
-                            id=str(uuid.uuid4()),
-                            order_number=order_number,
-                            invoice_number=row.get('invoice number', ''),
-                            date=parsed_date,
-                            vendor_id=vendor_id,
-                            vendor_name=vendor_name, # Store name for easier display
-                            status='Pending', # Default status for imported items
-                        )
-                        session.add(purchase)
-                        session.flush() # Get purchase.id
-
-
-                        # --- Line Item Handling ---
-                        description = row.get('description', '').strip()
-                        if description:
-                            try:
-                                quantity = int(float(row.get('quantity', '1'))) # Allow float then convert
-                                unit_price = float(row.get('unit price', '0.0'))
-                                if quantity <= 0 or unit_price < 0:
-                                    raise ValueError("Quantity must be positive, Unit Price must be non-negative.")
-                            except (ValueError, TypeError) as ve:
-                                print(f"Skipping line item in row {row_num}: Invalid quantity or price - {ve}. Using defaults (1, 0.0).")
-                                quantity = 1
-                                unit_price = 0.0
-                                # Decide if row should be skipped entirely if item data is bad
-                                # error_count += 1
-                                # continue # Skip whole row?
-
-                            line_item = LineItem(
-                                id=str(uuid.uuid4()),
-                                purchase_id=purchase.id,
-                                description=description,
-                                quantity=quantity,
-                                unit_price=unit_price,
-                                received=False # Default for imported items
-                            )
-                            session.add(line_item)
-
-
-                        # --- Budget Allocation Handling ---
-                        budget_code = row.get('budget code', '').strip()
-                        if budget_code:
-                            budget_id = budgets_dict.get(budget_code)
-                            if budget_id:
-                                try:
-                                    amount = float(row.get('amount', '0.0'))
-                                    if amount <= 0:
-                                        # If amount is required and invalid, skip budget alloc or whole row?
-                                        print(f"Warning in row {row_num}: Budget amount '{row.get('amount')}' is invalid or zero. Skipping budget allocation.")
-                                    else:
-                                         purchase_budget = PurchaseBudget(
-                                             id=str(uuid.uuid4()),
-                                             purchase_id=purchase.id,
-                                             budget_id=budget_id,
-                                             amount=amount
-                                         )
-                                         session.add(purchase_budget)
-                                except (ValueError, TypeError):
-                                    print(f"Warning in row {row_num}: Invalid budget amount '{row.get('amount')}'. Skipping budget allocation.")
-                            else:
-                                print(f"Warning in row {row_num}: Budget code '{budget_code}' not found. Skipping budget allocation.")
-
-
-                        processed_orders.add(order_number) # Mark order as processed in this batch
-                        imported_count += 1
-
-                    except Exception as e:
-                        session.rollback() # Rollback transaction for this specific row
-                        print(f"Error processing row {row_num} (Order: {order_number}): {str(e)}. Rolling back row.")
-                        error_count += 1
-                        # Need to re-add vendor to cache if it was created in this failed transaction?
-                        # Or simply let the next row try again if the vendor is repeated.
-                        # For simplicity, we don't handle the cache rollback here.
-                        continue # Move to the next row
-
-            # --- Final Commit ---
-            session.commit() # Commit all successfully processed rows
-            final_message = f"Import completed: {imported_count} purchases imported."
-            if skipped_count > 0:
-                final_message += f" {skipped_count} orders skipped (already existed)."
-            if error_count > 0:
-                final_message += f" {error_count} rows encountered errors (see console logs)."
-
-            return True, final_message
-
-        except FileNotFoundError:
-            return False, f"Import failed: File not found at {file_path}"
+            job = session.get(ImportJob, job_id)
+            if not job:
+                return False, "Import job not found"
+            job.status = "Cancelled"
+            job.updated_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            session.commit()
+            return True, "Import job cancelled"
         except Exception as e:
-            session.rollback() # Rollback any partial commits if error happens outside row loop
-            print(f"Critical import error: {str(e)}")
-            return False, f"Import failed: {str(e)}"
+            session.rollback()
+            return False, f"Failed to cancel import job: {str(e)}"
         finally:
             session.close()
\ No newline at end of file
@@ -0,0 +1,309 @@
+# controllers/receiving_session.py
+"""
+Scan-driven receiving with write-behind batching.
+
+A dock worker scans "<order number>/<line>" labels one after another.
+Each scan is looked up in an in-memory index of the order's open line
+items, written to a journal file (flushed and fsynced) and queued; it is
+shown as received straight away. A writer thread saves the queue with
+PurchaseController.receive_line_items(), one transaction per batch, when
+RECEIVING_FLUSH_SCANS scans are waiting or RECEIVING_FLUSH_MS has passed.
+
+The journal holds every scan not yet saved. Each session has its own
+journal next to the database file and keeps it locked while it runs, so
+sessions in other windows or programs leave it alone. If the program
+dies, the lock goes with it and the next session to start replays the
+journal before taking new scans; receiving an item twice is harmless,
+so scans saved just before a crash may safely be replayed.
+"""
+import glob
+import json
+import os
+import threading
+import uuid
+from datetime import datetime
+
+from config.settings import RECEIVING_FLUSH_SCANS, RECEIVING_FLUSH_MS, RECEIVING_JOURNAL_SUFFIX
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+    import msvcrt
+
+
+def _try_lock(journal):
+    """Take an exclusive lock on an open journal file without waiting; False if another session holds it"""
+    try:
+        if fcntl is not None:
+            fcntl.flock(journal.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            journal.seek(0)
+            msvcrt.locking(journal.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+class ReceivingSession:
+    def __init__(self, purchase_controller, journal_path=None, flush_scans=None, flush_ms=None):
+        self.controller = purchase_controller
+        # Journals of this database are named <database file><suffix>-<session>
+        self.journal_prefix = purchase_controller.db_manager.db_file + RECEIVING_JOURNAL_SUFFIX
+        self.journal_path = journal_path or f"{self.journal_prefix}-{uuid.uuid4().hex[:12]}"
+        self.flush_scans = flush_scans or RECEIVING_FLUSH_SCANS
+        self.flush_interval = (flush_ms or RECEIVING_FLUSH_MS) / 1000
+
+        # order number -> {line: open line item}, filled as orders are first scanned
+        self._open_items = {}
+        self._scanned = set()  # Line item ids scanned in this session
+        self._queue = []  # Scans waiting to be saved, oldest first
+        self._results = {}  # Purchase rollups saved since the last collect_results()
+        self._seq = 0
+        self.saved_through = 0  # Every scan up to this sequence number is in the database
+        self.saved_count = 0
+        self.last_error = None
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # One batch in flight at a time
+        self._wakeup = threading.Event()
+        self._closing = False
+        self._journal = None
+        self._writer = None
+
+    @staticmethod
+    def parse_scan(text):
+        """Split "<order number>/<line>" (or "<order number> <line>") into (order_number, line)"""
+        text = text.strip()
+        separator = max(text.rfind("/"), text.rfind(" "))
+        if separator <= 0:
+            raise ValueError(f"Expected <order number>/<line>, got '{text}'")
+        order_number, line = text[:separator].strip(), text[separator + 1:].strip()
+        if not line.isdigit():
+            raise ValueError(f"Line must be a number, got '{line}'")
+        return order_number, int(line)
+
+    def start(self):
+        """
+        Replay scans earlier sessions left unsaved, then start taking
+        scans. Returns (success, message); on failure their journals are
+        kept and the session does not start.
+        """
+        # Lock our own journal first so a session starting meanwhile does not replay it
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        if not _try_lock(self._journal):
+            self._journal.close()
+            self._journal = None
+            return False, f"Another receiving session is using {self.journal_path}"
+        success, message = self._replay_journals()
+        if not success:
+            self._journal.close()
+            self._journal = None
+            os.remove(self.journal_path)
+            return False, message
+        self._writer = threading.Thread(target=self._run_writer, daemon=True)
+        self._writer.start()
+        return True, message
+
+    def scan(self, order_number, line):
+        """
+        Receive one line item. Returns (success, message, item) where item
+        is a dict describing the queued scan (seq, order_number, line,
+        description, quantity, purchase_id).
+        """
+        order_number = order_number.strip()
+        lines = self._order_lines(order_number)
+        if lines is None:
+            return False, f"Order {order_number} not found or nothing left to receive", None
+
+        with self._lock:
+            item = lines.get(line)
+            if item is None:
+                return False, f"Line {line} of order {order_number} is already received or does not exist", None
+            if item["line_item_id"] in self._scanned:
+                return False, f"Line {line} of order {order_number} was already scanned", None
+
+            self._seq += 1
+            item = dict(item, seq=self._seq, order_number=order_number, line=line)
+            self._write_journal({
+                "seq": item["seq"],
+                "line_item_id": item["line_item_id"],
+                "order_number": order_number,
+                "line": line,
+                "time": datetime.now().isoformat(timespec="seconds"),
+            })
+            del lines[line]
+            self._scanned.add(item["line_item_id"])
+            self._queue.append(item)
+            if len(self._queue) >= self.flush_scans:
+                self._wakeup.set()
+        return True, f"Received line {line} of order {order_number}", item
+
+    def remaining_items(self, order_number):
+        """Open line items of an already scanned order, by line number"""
+        with self._lock:
+            return dict(self._open_items.get(order_number.strip()) or {})
+
+    def status(self):
+        """(queued scans, saved scans, last save error or None)"""
+        with self._lock:
+            return len(self._queue), self.saved_count, self.last_error
+
+    def collect_results(self):
+        """Rollups ({purchase_id: {...}}) of the purchases saved since the last call"""
+        with self._lock:
+            results, self._results = self._results, {}
+            return results
+
+    def flush(self):
+        """Save the queued scans now (on the calling thread)"""
+        with self._flush_lock:
+            with self._lock:
+                batch = list(self._queue)
+            if not batch:
+                return True
+            return self._save_batch(batch)
+
+    def _save_batch(self, batch):
+        success, message, rollups = self.controller.receive_line_items(
+            [item["line_item_id"] for item in batch], True)
+        with self._lock:
+            if not success and message != "Line items not found":
+                # Keep the batch; the journal still has it and the next flush retries
+                self.last_error = message
+                return False
+            # Items deleted since they were scanned cannot be received; drop them
+            self.last_error = None if success else f"{len(batch)} scanned items no longer exist"
+            del self._queue[:len(batch)]
+            self.saved_count += len(batch)
+            self.saved_through = batch[-1]["seq"]
+            self._results.update(rollups)
+            self._write_journal({"saved_through": self.saved_through})
+            if not self._queue:
+                # Everything is in the database: start the journal afresh
+                self._journal.truncate(0)
+        return True
+
+    def close(self):
+        """Stop the writer after saving what is queued. Returns (success, message)."""
+        if self._writer is not None:
+            self._closing = True
+            self._wakeup.set()
+            self._writer.join()
+            self._writer = None
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+        queued, saved, error = self.status()
+        if queued:
+            return False, (f"{queued} scans could not be saved ({error}). They are kept in "
+                           f"{self.journal_path} and will be saved by the next receiving session.")
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        return True, f"{saved} scans saved"
+
+    def _order_lines(self, order_number):
+        """Open line items of an order by line number, loading the order on first use"""
+        with self._lock:
+            if order_number in self._open_items:
+                return self._open_items[order_number]
+
+        rows = self.controller.get_open_line_items([order_number])
+        if len({row.purchase_id for row in rows}) > 1:
+            # Duplicate order numbers: line numbers would be ambiguous
+            return None
+        lines = {
+            row.line: {
+                "line_item_id": row.line_item_id,
+                "purchase_id": row.purchase_id,
+                "description": row.description or "",
+                "quantity": row.quantity or 0,
+            }
+            for row in rows if row.line_item_id not in self._scanned
+        }
+        if not lines:
+            return None
+        with self._lock:
+            return self._open_items.setdefault(order_number, lines)
+
+    def _write_journal(self, record):
+        self._journal.write(json.dumps(record) + "\n")
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+
+    def _run_writer(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                with self._lock:
+                    self.last_error = str(e)
+                print(f"Error saving receiving scans: {str(e)}")
+            if self._closing:
+                return
+
+    def _orphaned_journals(self):
+        """
+        Journals of sessions that ended without saving every scan, each
+        opened and locked. A journal still locked by a running session
+        is skipped.
+        """
+        journals = []
+        paths = glob.glob(glob.escape(self.journal_prefix) + "*")
+        for path in sorted(paths):
+            if path == self.journal_path:
+                continue
+            try:
+                journal = open(path, "r+", encoding="utf-8")
+            except OSError:
+                continue # Removed by the session that owned it
+            if _try_lock(journal):
+                journals.append(journal)
+            else:
+                journal.close()
+        return journals
+
+    @staticmethod
+    def _unsaved_scans(journal):
+        """Line item ids journaled but not marked saved, by sequence number"""
+        scans = {}
+        journal.seek(0)
+        for text in journal:
+            try:
+                record = json.loads(text)
+            except ValueError:
+                # A line cut short by the crash; its scan was never confirmed
+                continue
+            if "saved_through" in record:
+                scans = {seq: item for seq, item in scans.items() if seq > record["saved_through"]}
+            elif "seq" in record:
+                scans[record["seq"]] = record["line_item_id"]
+        return scans
+
+    def _replay_journals(self):
+        """Save scans that earlier sessions journaled but did not save"""
+        journals = self._orphaned_journals()
+        try:
+            line_item_ids = []
+            for journal in journals:
+                line_item_ids += self._unsaved_scans(journal).values()
+
+            if line_item_ids:
+                success, message, _ = self.controller.receive_line_items(line_item_ids, True)
+                if not success and message != "Line items not found":
+                    return False, f"Could not save {len(line_item_ids)} scans from an earlier session: {message}"
+        finally:
+            for journal in journals:
+                journal.close()
+
+        for journal in journals:
+            try:
+                os.remove(journal.name)
+            except FileNotFoundError:
+                pass # Replayed and removed by a session starting at the same time
+        if line_item_ids:
+            return True, f"Saved {len(line_item_ids)} scans left over from an earlier session"
+        return True, "No unsaved scans"
@@ -1,13 +1,15 @@
 # controllers/report_controller.py
 from datetime import datetime
-from database.models import Purchase, Budget, Vendor, PurchaseBudget
+from database.models import Purchase, Budget, Vendor, PurchaseBudget, LineItem, YearlyBudgetAmount
+from sqlalchemy import select, func
 from sqlalchemy.orm import joinedload
-import csv
-import os
+from utils.report_cache import ReportCache
+from config.settings import REPORT_CACHE_SIZE
 
 class ReportController:
     def __init__(self, db_manager):
         self.db_manager = db_manager
+        self.report_cache = ReportCache(REPORT_CACHE_SIZE)
         self.purchase_controller = None
         self.budget_controller = None
         self.vendor_controller = None
@@ -25,9 +27,22 @@ class ReportController:
 
         return self.budget_controller.calculate_budget_usage(year)
 
+    def _cached(self, report_type, year, compute):
+        """Serve a report from the cache while the year's data is unchanged"""
+        key = ReportCache.make_key(report_type, year)
+        version = self.db_manager.cache_version(f"year:{year}")
+        return self.report_cache.get_or_compute(key, version, lambda: compute(year))
+
+    def get_cache_stats(self):
+        """Return hit/miss statistics for the report cache"""
+        return self.report_cache.get_stats()
+
     def generate_monthly_spending(self, year=None):
         """Generate monthly spending report data"""
         year = year or datetime.now().year
+        return self._cached("monthly_spending", year, self._compute_monthly_spending)
+
+    def _compute_monthly_spending(self, year):
         session = self.db_manager.Session()
         
         try:
@@ -73,6 +88,9 @@ class ReportController:
     def generate_vendor_spending(self, year=None):
         """Generate vendor spending report data"""
         year = year or datetime.now().year
+        return self._cached("vendor_spending", year, self._compute_vendor_spending)
+
+    def _compute_vendor_spending(self, year):
         session = self.db_manager.Session()
         
         try:
@@ -137,4 +155,108 @@ class ReportController:
             from utils.exporters import CSVExporter
             return CSVExporter.export_vendor_report(vendor_data, year, file_path)
         except Exception as e:
-            return False, f"Export failed: {str(e)}"
\ No newline at end of file
+            return False, f"Export failed: {str(e)}"
+
+    def compute_all_years(self, years=None):
+        """
+        Compute the budget usage, monthly spending and vendor spending
+        reports of every year in one pass over the data.
+
+        Returns {year: {"budget_usage": [...], "monthly_spending": [...],
+        "vendor_spending": [...]}} with the same rows as the per-year
+        report methods, for every year with purchases or budget amounts
+        (or just the given years). A handful of grouped queries replace
+        loading each year's purchases and line items separately.
+        """
+        session = self.db_manager.Session()
+        try:
+            purchase_totals = select(
+                LineItem.purchase_id,
+                func.sum(LineItem.quantity * LineItem.unit_price).label("total")
+            ).group_by(LineItem.purchase_id).subquery()
+            purchase_total = func.coalesce(purchase_totals.c.total, 0.0)
+            purchase_year = func.substr(Purchase.date, 1, 4)
+
+            vendor_rows = session.execute(
+                select(purchase_year, Purchase.vendor_id, func.max(Purchase.vendor_name),
+                       func.sum(purchase_total), func.count(Purchase.id))
+                .outerjoin(purchase_totals, purchase_totals.c.purchase_id == Purchase.id)
+                .group_by(purchase_year, Purchase.vendor_id)
+            ).all()
+            # Dates are few compared to purchases; parse each once like _compute_monthly_spending
+            date_rows = session.execute(
+                select(Purchase.date, func.sum(purchase_total))
+                .outerjoin(purchase_totals, purchase_totals.c.purchase_id == Purchase.id)
+                .group_by(Purchase.date)
+            ).all()
+            allocation_rows = session.execute(
+                select(purchase_year, PurchaseBudget.budget_id, func.sum(PurchaseBudget.amount))
+                .join(Purchase, Purchase.id == PurchaseBudget.purchase_id)
+                .group_by(purchase_year, PurchaseBudget.budget_id)
+            ).all()
+            amount_rows = session.execute(
+                select(YearlyBudgetAmount.budget_id, YearlyBudgetAmount.year, YearlyBudgetAmount.amount)
+            ).all()
+            budgets = session.execute(select(Budget.id, Budget.code, Budget.name)).all()
+        finally:
+            session.close()
+
+        if years is None:
+            found = {row[0] for row in vendor_rows} | {row[1] for row in amount_rows}
+            years = sorted(int(year) for year in found if year and len(year) == 4 and year.isdigit())
+        results = {year: {"budget_usage": [], "monthly_spending": [], "vendor_spending": []} for year in years}
+
+        # Vendor spending
+        for year, vendor_id, name, total_spent, purchase_count in vendor_rows:
+            if year and year.isdigit() and int(year) in results:
+                results[int(year)]["vendor_spending"].append({
+                    "vendor_id": vendor_id,
+                    "name": name,
+                    "total_spent": total_spent,
+                    "purchase_count": purchase_count,
+                    "avg_order": total_spent / purchase_count if purchase_count > 0 else 0
+                })
+
+        # Monthly spending
+        monthly = {year: {m: 0 for m in range(1, 13)} for year in years}
+        for date, total in date_rows:
+            try:
+                purchase_date = datetime.strptime(date, "%Y-%m-%d")
+            except (ValueError, TypeError):
+                # Skip purchases with invalid dates
+                continue
+            if purchase_date.year in monthly:
+                monthly[purchase_date.year][purchase_date.month] += total
+
+        months = ["January", "February", "March", "April", "May", "June",
+                  "July", "August", "September", "October", "November", "December"]
+
+        # Budget usage
+        spent = {(year, budget_id): amount for year, budget_id, amount in allocation_rows}
+        budget_amounts = {(budget_id, year): amount for budget_id, year, amount in amount_rows}
+
+        for year, data in results.items():
+            data["vendor_spending"].sort(key=lambda x: x["total_spent"], reverse=True)
+            data["monthly_spending"] = [
+                {"month_num": month_num, "month": months[month_num - 1], "amount": amount}
+                for month_num, amount in monthly[year].items()
+            ]
+            for budget_id, code, name in budgets:
+                budget_amount = budget_amounts.get((budget_id, str(year)), 0)
+                budget_spent = spent.get((str(year), budget_id), 0)
+                data["budget_usage"].append({
+                    "id": budget_id,
+                    "code": code,
+                    "name": name,
+                    "amount": budget_amount,
+                    "spent": budget_spent,
+                    "remaining": budget_amount - budget_spent,
+                    "percent": (budget_spent / budget_amount * 100) if budget_amount > 0 else 0
+                })
+        return results
+
+    def export_all_years(self, archive_path, years=None, formats=("csv", "pdf"), workers=None,
+                         progress_callback=None, cancel_event=None):
+        """Write budget and vendor reports for every year into one zip archive (see utils.batch_reports)"""
+        from utils.batch_reports import BatchReportJob
+        return BatchReportJob(self, formats, workers).run(archive_path, years, progress_callback, cancel_event)
\ No newline at end of file
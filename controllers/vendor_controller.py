@@ -1,11 +1,34 @@
 # controllers/vendor_controller.py
 from database.models import Vendor, Purchase
+from sqlalchemy import select, update, func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import joinedload
+from utils.reference_cache import ReferenceCache
 import uuid
 
 class VendorController:
     def __init__(self, db_manager):
         self.db_manager = db_manager
+        # Vendor names and ids for forms, reloaded only after vendors change
+        self.reference = ReferenceCache(db_manager, "vendors", self._load_reference)
+
+    def _load_reference(self):
+        session = self.db_manager.Session()
+        try:
+            rows = session.execute(select(Vendor.id, Vendor.name)).all()
+        finally:
+            session.close()
+        return {
+            "names": tuple(name for _, name in rows),
+            "ids_by_name": {name: vendor_id for vendor_id, name in rows},
+        }
+
+    def _name_taken(self, session, name, vendor_id=None):
+        """Whether another vendor has this name, checked only while duplicates hold back uq_vendors_name"""
+        if "uq_vendors_name" not in self.db_manager.skipped_indexes:
+            return False # The unique index rejects duplicates on flush
+        query = select(Vendor.id).where(Vendor.name == name, Vendor.id != vendor_id).limit(1)
+        return session.execute(query).first() is not None
 
     def get_all_vendors(self):
         """Get all vendors as Vendor objects"""
@@ -27,12 +50,7 @@ class VendorController:
         """Add a new vendor using SQLAlchemy models"""
         session = self.db_manager.Session()
         try:
-            # Check if vendor name already exists
-            existing = session.query(Vendor).filter(Vendor.name == vendor_data.get('name')).first()
-            if existing:
-                return False, "A vendor with this name already exists"
-            
-            # Create new vendor from data
+            # Create new vendor from data; the unique index on name rejects duplicates
             vendor = Vendor(
                 id=vendor_data.get('id') or str(uuid.uuid4()),
                 name=vendor_data.get('name', ''),
@@ -41,10 +59,17 @@ class VendorController:
                 email=vendor_data.get('email', ''),
                 address=vendor_data.get('address', '')
             )
+            if self._name_taken(session, vendor.name):
+                return False, "A vendor with this name already exists"
             
             session.add(vendor)
             session.commit()
             return True, "Vendor added successfully"
+        except IntegrityError as e:
+            session.rollback()
+            if self.db_manager.is_unique_violation(e, "vendors.name"):
+                return False, "A vendor with this name already exists"
+            return False, f"Failed to add vendor: {str(e)}"
         except Exception as e:
             session.rollback()
             return False, f"Failed to add vendor: {str(e)}"
@@ -64,28 +89,36 @@ class VendorController:
             if not vendor:
                 return False, "Vendor not found"
             
-            # Check if vendor name already exists (for a different vendor)
-            name = vendor_data.get('name')
-            existing = session.query(Vendor).filter(
-                Vendor.name == name, Vendor.id != vendor_id
-            ).first()
-            if existing:
+            # Update vendor fields; the unique index on name rejects duplicates
+            old_name = vendor.name
+            if vendor_data.get('name', old_name) != old_name and self._name_taken(
+                    session, vendor_data['name'], vendor_id):
                 return False, "A vendor with this name already exists"
-            
-            # Update vendor fields
             vendor.name = vendor_data.get('name', vendor.name)
             vendor.contact = vendor_data.get('contact', vendor.contact)
             vendor.phone = vendor_data.get('phone', vendor.phone)
             vendor.email = vendor_data.get('email', vendor.email)
             vendor.address = vendor_data.get('address', vendor.address)
             
-            # Update vendor name in purchases
-            purchases = session.query(Purchase).filter(Purchase.vendor_id == vendor_id).all()
-            for purchase in purchases:
-                purchase.vendor_name = vendor.name
+            # Copy a new name to the vendor's purchases with one UPDATE in the same transaction
+            if vendor.name != old_name:
+                years = set(session.scalars(
+                    update(Purchase)
+                    .where(Purchase.vendor_id == vendor_id)
+                    .values(vendor_name=vendor.name)
+                    .returning(func.substr(Purchase.date, 1, 4))
+                    .execution_options(synchronize_session=False)
+                ))
+                # The name shows in the reports of every year the vendor was used
+                self.db_manager.touch(session, "purchases", *(f"year:{year}" for year in years if year))
             
             session.commit()
             return True, "Vendor updated successfully"
+        except IntegrityError as e:
+            session.rollback()
+            if self.db_manager.is_unique_violation(e, "vendors.name"):
+                return False, "A vendor with this name already exists"
+            return False, f"Failed to update vendor: {str(e)}"
         except Exception as e:
             session.rollback()
             return False, f"Failed to update vendor: {str(e)}"
@@ -117,9 +150,8 @@ class VendorController:
 
     def get_vendor_names(self):
         """Get a list of all vendor names"""
-        session = self.db_manager.Session()
-        try:
-            vendors = session.query(Vendor).all()
-            return [vendor.name for vendor in vendors]
-        finally:
-            session.close()
\ No newline at end of file
+        return list(self.reference.get()["names"])
+
+    def get_vendor_id_by_name(self, name):
+        """Get the id of the vendor with this name, or None"""
+        return self.reference.get()["ids_by_name"].get(name)
\ No newline at end of file
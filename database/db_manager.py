@@ -2,11 +2,13 @@
 import os
 import logging
 import shutil
+import threading
 from datetime import datetime
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect
 from sqlalchemy.orm import sessionmaker, scoped_session
 from sqlalchemy.exc import SQLAlchemyError
-from database.models import Base
+from database.models import Base, Purchase, LineItem, PurchaseBudget, YearlyBudgetAmount, Budget, Vendor
+from database.migrations import upgrade_schema, resolve_duplicates
 
 # Import centralized settings
 from config.settings import DATABASE_URL, DATABASE_FILE, BACKUP_DIR
@@ -19,6 +21,10 @@ logging.basicConfig(
 )
 logger = logging.getLogger('database_manager')
 
+# Data version scope that invalidates everything
+GLOBAL_SCOPE = "*"
+_TOUCHED_SCOPES_KEY = "touched_scopes"
+
 
 class DatabaseManager:
     def __init__(self, db_url=None):
@@ -27,7 +33,6 @@ class DatabaseManager:
 
         # Use the provided URL or default from settings
         self.db_url = db_url or DATABASE_URL
-        self.db_file = DATABASE_FILE
         
         self.engine = create_engine(
             self.db_url,
@@ -37,12 +42,164 @@ class DatabaseManager:
             pool_timeout=30,
             pool_recycle=3600
         )
+        # Backups copy the file behind the URL, which need not be the default one
+        self.db_file = self.engine.url.database or DATABASE_FILE
         self.Session = scoped_session(sessionmaker(bind=self.engine))
 
+        # Data versions per scope ("year:2024", "purchases", "vendors", "budgets"), bumped on commit
+        self._data_versions = {GLOBAL_SCOPE: 0}
+        self._version_lock = threading.Lock()
+        # File stamp after this process's last writing commit (see file_stamp)
+        self.last_commit_stamp = None
+        self._register_session_events()
+
         # Create tables if they don't exist
         Base.metadata.create_all(self.engine)
+        # create_all skips existing tables, so bring those up to date; the
+        # report lists what needs attention (e.g. duplicates blocking a unique
+        # index, whose name is then in skipped_indexes)
+        self.schema_report, self.skipped_indexes = upgrade_schema(self.engine, Base.metadata)
+        # File stamp at the last check_external_changes()
+        self._seen_stamp = self.file_stamp()
         logger.info(f"Database initialized at {self.db_file}")
 
+    def _register_session_events(self):
+        """Track which data scopes each transaction touches so caches can be invalidated"""
+        factory = self.Session.session_factory
+        event.listen(factory, "after_flush", self._collect_touched_scopes)
+        event.listen(factory, "after_commit", self._publish_touched_scopes)
+        event.listen(factory, "after_transaction_end", self._discard_touched_scopes)
+
+    @staticmethod
+    def _year_scope(date_value):
+        """Return the data version scope for a 'YYYY-MM-DD' date or a year"""
+        if not date_value:
+            return None
+        return f"year:{str(date_value)[:4]}"
+
+    @staticmethod
+    def _history_values(obj, attr_name):
+        """Return the current and previous values of an attribute"""
+        history = inspect(obj).attrs[attr_name].history
+        values = set(history.added) | set(history.unchanged) | set(history.deleted)
+        return values or {getattr(obj, attr_name, None)}
+
+    def _parent_purchase_scopes(self, session, obj):
+        """Find the year of the purchase a line item or allocation belongs to"""
+        scopes = set()
+        for purchase_id in self._history_values(obj, "purchase_id"):
+            purchase = session.identity_map.get(inspect(Purchase).identity_key_from_primary_key((purchase_id,)))
+            if purchase is None:
+                # Parent not loaded in this session, so we cannot tell which year changed
+                return {GLOBAL_SCOPE}
+            scopes |= {self._year_scope(d) for d in self._history_values(purchase, "date")}
+        return scopes
+
+    def _collect_touched_scopes(self, session, flush_context):
+        touched = session.info.setdefault(_TOUCHED_SCOPES_KEY, set())
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            if isinstance(obj, Purchase):
+                touched |= {self._year_scope(d) for d in self._history_values(obj, "date")}
+                touched.add("purchases")
+            elif isinstance(obj, (LineItem, PurchaseBudget)):
+                touched |= self._parent_purchase_scopes(session, obj)
+                touched.add("purchases")
+            elif isinstance(obj, YearlyBudgetAmount):
+                touched |= {self._year_scope(y) for y in self._history_values(obj, "year")}
+                touched.add("budgets")
+            elif isinstance(obj, Budget):
+                # Budget names and codes appear in every year's reports
+                touched |= {"budgets", GLOBAL_SCOPE}
+            elif isinstance(obj, Vendor):
+                touched.add("vendors")
+        touched.discard(None)
+
+    def _publish_touched_scopes(self, session):
+        touched = session.info.pop(_TOUCHED_SCOPES_KEY, None)
+        if touched:
+            self.bump_data_versions(*touched)
+            self.last_commit_stamp = self.file_stamp()
+
+    def _discard_touched_scopes(self, session, transaction):
+        # Anything left over when the outermost transaction ends was rolled back
+        if transaction.parent is None:
+            session.info.pop(_TOUCHED_SCOPES_KEY, None)
+
+    def touch(self, session, *scopes):
+        """
+        Mark data scopes as changed by the session's current transaction.
+
+        ORM changes are tracked automatically; this is for Core statements
+        (bulk UPDATE/INSERT/DELETE) that bypass the unit of work.
+        """
+        session.info.setdefault(_TOUCHED_SCOPES_KEY, set()).update(
+            scope for scope in scopes if scope)
+
+    def bump_data_versions(self, *scopes):
+        with self._version_lock:
+            for scope in scopes:
+                self._data_versions[scope] = self._data_versions.get(scope, 0) + 1
+
+    def invalidate_all(self):
+        """Invalidate every cached result (after restores or bulk data replacement)"""
+        self.bump_data_versions(GLOBAL_SCOPE)
+
+    def get_data_version(self, *scopes):
+        """
+        Return a version stamp for the given scopes. The stamp changes whenever
+        a commit touches one of the scopes or everything is invalidated.
+        """
+        with self._version_lock:
+            return (self._data_versions[GLOBAL_SCOPE],) + tuple(
+                self._data_versions.get(scope, 0) for scope in scopes)
+
+    def file_stamp(self):
+        """
+        Modification time and size of the database file and its WAL. A stamp
+        that differs from last_commit_stamp means another program (or
+        connection outside the ORM) changed the database.
+        """
+        stamp = []
+        for path in (self.db_file, self.db_file + "-wal"):
+            try:
+                info = os.stat(path)
+                stamp.append((info.st_mtime_ns, info.st_size))
+            except OSError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def check_external_changes(self):
+        """
+        Invalidate every cached result if another program (or a connection
+        outside the ORM) has committed to the database since the last check.
+        Data versions only count this process's commits, so callers serving
+        cached data call this first. Returns True if there were such changes.
+        """
+        stamp = self.file_stamp()
+        with self._version_lock:
+            if stamp == self._seen_stamp:
+                return False
+            self._seen_stamp = stamp
+            external = stamp != self.last_commit_stamp
+        if external:
+            self.invalidate_all()
+        return external
+
+    def cache_version(self, *scopes):
+        """
+        Version stamp to key cached results by: get_data_version() after
+        check_external_changes(), so commits by other programs count too.
+        Every cache of database data (reports, reference data, API
+        responses) looks its entries up with this.
+        """
+        self.check_external_changes()
+        return self.get_data_version(*scopes)
+
+    @staticmethod
+    def is_unique_violation(error, column):
+        """Whether an IntegrityError came from the unique index on column ("table.column")"""
+        return f"UNIQUE constraint failed: {column}" in str(getattr(error, "orig", error))
+
     def _commit_session(self, session):
         """Commit session and handle exceptions"""
         try:
@@ -63,7 +220,8 @@ class DatabaseManager:
 
         # Create timestamp
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_path = os.path.join(backup_dir, f"{os.path.splitext(self.db_file)[0]}_{timestamp}.db")
+        backup_name = os.path.splitext(os.path.basename(self.db_file))[0]
+        backup_path = os.path.join(backup_dir, f"{backup_name}_{timestamp}.db")
 
         try:
             # Copy the database file
@@ -113,6 +271,58 @@ class DatabaseManager:
         finally:
             session.close()
 
+    def run_maintenance(self, action):
+        """
+        Run a SQLite maintenance task: "analyze" (refresh query planner
+        statistics), "optimize", "vacuum" (rebuild the file, reclaiming
+        free pages), "integrity_check" or "dedupe" (see resolve_duplicates).
+        Returns (success, message).
+        """
+        if action == "dedupe":
+            return self.resolve_duplicates()
+        statements = {
+            "analyze": "ANALYZE",
+            "optimize": "PRAGMA optimize",
+            "vacuum": "VACUUM",
+            "integrity_check": "PRAGMA integrity_check",
+        }
+        if action not in statements:
+            return False, f"Unknown maintenance task: {action}"
+
+        try:
+            # VACUUM cannot run inside a transaction
+            with self.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+                result = connection.exec_driver_sql(statements[action])
+                rows = [row[0] for row in result] if result.returns_rows else []
+            logger.info(f"Maintenance task {action} completed")
+            if action == "integrity_check":
+                if rows == ["ok"]:
+                    return True, "Integrity check passed"
+                return False, "Integrity check found problems:\n" + "\n".join(str(row) for row in rows[:20])
+            return True, f"{action.capitalize()} completed"
+        except Exception as e:
+            logger.error(f"Maintenance task {action} failed: {str(e)}")
+            return False, f"{action.capitalize()} failed: {str(e)}"
+
+    def resolve_duplicates(self):
+        """
+        Back up the database, then resolve the duplicates that keep unique
+        indexes from being created (see database.migrations.DEDUPE_STEPS)
+        and create them. Returns (success, message).
+        """
+        if not self.skipped_indexes:
+            return True, "No duplicates to resolve"
+        success, message = self.backup_database()
+        if not success:
+            return False, message
+        try:
+            report, self.skipped_indexes = resolve_duplicates(self.engine, Base.metadata)
+        except Exception as e:
+            logger.error(f"Resolving duplicates failed: {str(e)}")
+            return False, f"Resolving duplicates failed: {str(e)}"
+        self.invalidate_all()
+        return not self.skipped_indexes, "\n".join([message] + report)
+
     def restore_from_backup(self, backup_path):
         """Restore database from a backup file"""
         try:
@@ -129,9 +339,15 @@ class DatabaseManager:
             # Recreate the engine and session factory
             self.engine = create_engine(self.db_url)
             self.Session = scoped_session(sessionmaker(bind=self.engine))
+            self._register_session_events()
+            # The backup may come from an older version
+            self.schema_report, self.skipped_indexes = upgrade_schema(self.engine, Base.metadata)
+            self._seen_stamp = self.file_stamp()
+            self.invalidate_all()
 
             logger.info(f"Database restored from backup: {backup_path}")
-            return True, f"Database successfully restored from backup: {os.path.basename(backup_path)}"
+            message = f"Database successfully restored from backup: {os.path.basename(backup_path)}"
+            return True, "\n".join([message] + self.schema_report)
         except Exception as e:
             logger.error(f"Restore failed: {str(e)}")
             return False, f"Restore failed: {str(e)}"
\ No newline at end of file
@@ -0,0 +1,203 @@
+# database/migrations.py
+"""
+Schema upgrades for databases created by older versions.
+
+create_all() only creates missing tables, so indexes and constraints
+added to existing tables later are applied here. upgrade_schema() only
+creates what is missing, so it runs on every startup and after
+restoring a backup.
+
+Upgrading never changes the data. A unique index that existing rows
+would violate is not created; the duplicates are reported instead, and
+the index is created once they are resolved, by hand or with the
+explicit resolve_duplicates() ("python -m cli maintenance dedupe").
+"""
+import logging
+from sqlalchemy import inspect, text
+
+logger = logging.getLogger('database_manager')
+
+# Duplicate groups listed in a report; the rest are counted
+REPORT_LIMIT = 20
+
+DEDUPE_HINT = ("Nothing was changed. Correct these by hand, or run \"python -m cli maintenance "
+               "dedupe\" to resolve them automatically (it backs up the database first).")
+
+
+def _has_index(connection, table_name, index_name):
+    return any(index["name"] == index_name for index in inspect(connection).get_indexes(table_name))
+
+
+def _listed(lines):
+    """The first REPORT_LIMIT lines, and a count of the rest"""
+    if len(lines) <= REPORT_LIMIT:
+        return lines
+    return lines[:REPORT_LIMIT] + [f"  ... and {len(lines) - REPORT_LIMIT} more"]
+
+
+def find_duplicate_yearly_budget_amounts(connection):
+    """Report lines for budgets with more than one amount for a year (empty if none)"""
+    rows = connection.execute(text(
+        "SELECT COALESCE(b.code, y.budget_id), y.year, GROUP_CONCAT(y.amount, ', ') "
+        "FROM (SELECT * FROM yearly_budget_amounts ORDER BY rowid) y "
+        "LEFT JOIN budgets b ON b.id = y.budget_id "
+        "GROUP BY y.budget_id, y.year HAVING COUNT(*) > 1 ORDER BY 1, 2"
+    )).all()
+    if not rows:
+        return []
+    report = ["These budgets have more than one amount for a year (the first one listed is "
+              "the one in use):"]
+    report += _listed([f"  {code} {year}: {amounts}" for code, year, amounts in rows])
+    return report
+
+
+def keep_first_yearly_budget_amounts(connection):
+    """
+    Delete all but the first amount entered for each budget and year:
+    the one the budget screens have been showing and editing.
+    """
+    deleted = connection.execute(text(
+        "SELECT y.id, COALESCE(b.code, y.budget_id), y.year, y.amount "
+        "FROM yearly_budget_amounts y LEFT JOIN budgets b ON b.id = y.budget_id "
+        "WHERE y.rowid NOT IN (SELECT MIN(rowid) FROM yearly_budget_amounts GROUP BY budget_id, year) "
+        "ORDER BY 2, 3, y.rowid"
+    )).all()
+    report = []
+    for amount_id, code, year, amount in deleted:
+        connection.execute(text("DELETE FROM yearly_budget_amounts WHERE id = :id"), {"id": amount_id})
+        line = f"Deleted duplicate amount {amount} for budget {code} {year} (kept the first one entered)"
+        logger.warning(line)
+        report.append(line)
+    return report
+
+
+def _find_duplicates(connection, table_name, column, noun):
+    """Report lines for values of column shared by more than one row (empty if none)"""
+    rows = connection.execute(text(
+        f"SELECT {column}, COUNT(*) FROM {table_name} GROUP BY {column} HAVING COUNT(*) > 1 ORDER BY {column}"
+    )).all()
+    if not rows:
+        return []
+    report = [f"These {noun}s are shared by more than one row in {table_name}:"]
+    report += _listed([f"  '{value}' ({count} rows)" for value, count in rows])
+    return report
+
+
+def find_duplicate_vendor_names(connection):
+    """Report lines for vendor names shared by several vendors"""
+    return _find_duplicates(connection, "vendors", "name", "vendor name")
+
+
+def find_duplicate_budget_codes(connection):
+    """Report lines for budget codes shared by several budgets"""
+    return _find_duplicates(connection, "budgets", "code", "budget code")
+
+
+def _rename_duplicates(connection, table_name, column, noun):
+    """
+    Give every row but the first of each duplicated value a " (2)", " (3)"...
+    suffix. Returns [(row id, old value, new value)] and report lines.
+    """
+    duplicated = connection.execute(text(
+        f"SELECT {column} FROM {table_name} GROUP BY {column} HAVING COUNT(*) > 1"
+    )).scalars().all()
+    if not duplicated:
+        return [], []
+
+    taken = set(connection.execute(text(f"SELECT {column} FROM {table_name}")).scalars())
+    renamed = []
+    for value in duplicated:
+        row_ids = connection.execute(text(
+            f"SELECT id FROM {table_name} WHERE {column} = :value ORDER BY rowid"
+        ), {"value": value}).scalars().all()
+        suffix = 2
+        for row_id in row_ids[1:]:
+            while f"{value} ({suffix})" in taken:
+                suffix += 1
+            new_value = f"{value} ({suffix})"
+            taken.add(new_value)
+            connection.execute(text(f"UPDATE {table_name} SET {column} = :new WHERE id = :id"),
+                               {"new": new_value, "id": row_id})
+            renamed.append((row_id, value, new_value))
+
+    report = [f"Renamed {len(renamed)} of {len(duplicated)} duplicated {noun}s so each is unique:"]
+    report += [f"  '{old}' -> '{new}'" for _, old, new in renamed]
+    for line in report:
+        logger.warning(line)
+    return renamed, report
+
+
+def rename_duplicate_vendor_names(connection):
+    """Rename vendors sharing a name, keeping purchases' copies of the name in step"""
+    renamed, report = _rename_duplicates(connection, "vendors", "name", "vendor name")
+    for vendor_id, _, new_name in renamed:
+        connection.execute(text("UPDATE purchases SET vendor_name = :name WHERE vendor_id = :id"),
+                           {"name": new_name, "id": vendor_id})
+    if renamed:
+        report.append("Merge or rename these vendors on the Vendors screen.")
+    return report
+
+
+def rename_duplicate_budget_codes(connection):
+    """Rename budgets sharing a code"""
+    renamed, report = _rename_duplicates(connection, "budgets", "code", "budget code")
+    if renamed:
+        report.append("Correct these codes on the Budgets screen.")
+    return report
+
+
+# Unique indexes that existing rows may violate, with the check that
+# reports the duplicates blocking them
+UNIQUE_INDEX_CHECKS = {
+    "uq_yearly_budget_amounts_budget_year": find_duplicate_yearly_budget_amounts,
+    "uq_vendors_name": find_duplicate_vendor_names,
+    "uq_budgets_code": find_duplicate_budget_codes,
+}
+
+# Explicit clean-up run by resolve_duplicates(); each step returns lines
+# describing what it changed
+DEDUPE_STEPS = [
+    keep_first_yearly_budget_amounts,
+    rename_duplicate_vendor_names,
+    rename_duplicate_budget_codes,
+]
+
+
+def upgrade_schema(engine, metadata):
+    """
+    Create any index the models define but the database lacks, except
+    unique indexes that existing duplicates would violate. Returns
+    (report, skipped): the lines of a report for the user (empty when
+    nothing needs attention) and the names of the indexes not created.
+    """
+    report = []
+    skipped = set()
+    with engine.begin() as connection:
+        for table in metadata.sorted_tables:
+            for index in table.indexes:
+                check = UNIQUE_INDEX_CHECKS.get(index.name)
+                if check is not None and not _has_index(connection, table.name, index.name):
+                    duplicates = check(connection)
+                    if duplicates:
+                        report += duplicates
+                        skipped.add(index.name)
+                        continue
+                index.create(connection, checkfirst=True)
+    if skipped:
+        report.append(DEDUPE_HINT)
+    for line in report:
+        logger.warning(line)
+    return report, skipped
+
+
+def resolve_duplicates(engine, metadata):
+    """
+    Remove the duplicates blocking unique indexes (see DEDUPE_STEPS) and
+    create the indexes. Returns (report, skipped) as upgrade_schema().
+    """
+    report = []
+    with engine.begin() as connection:
+        for step in DEDUPE_STEPS:
+            report += step(connection)
+    upgrade_report, skipped = upgrade_schema(engine, metadata)
+    return report + upgrade_report, skipped
@@ -1,7 +1,7 @@
 # database/models.py - Complete file with updated relationships
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, Float, Integer, Boolean, ForeignKey, Table, Text, create_engine
+from sqlalchemy import Column, String, Float, Integer, Boolean, ForeignKey, Table, Text, Index, create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
@@ -9,6 +9,9 @@ Base = declarative_base()
 
 class Vendor(Base):
     __tablename__ = 'vendors'
+    __table_args__ = (
+        Index('uq_vendors_name', 'name', unique=True),
+    )
 
     id = Column(String, primary_key=True)
     name = Column(String, nullable=False)
@@ -41,6 +44,9 @@ class Vendor(Base):
 
 class Budget(Base):
     __tablename__ = 'budgets'
+    __table_args__ = (
+        Index('uq_budgets_code', 'code', unique=True),
+    )
 
     id = Column(String, primary_key=True)
     code = Column(String, nullable=False)
@@ -80,6 +86,10 @@ class Budget(Base):
 
 class YearlyBudgetAmount(Base):
     __tablename__ = 'yearly_budget_amounts'
+    __table_args__ = (
+        # One amount per budget and year; budget amounts are upserted against it
+        Index('uq_yearly_budget_amounts_budget_year', 'budget_id', 'year', unique=True),
+    )
 
     id = Column(String, primary_key=True)
     budget_id = Column(String, ForeignKey('budgets.id', ondelete='CASCADE'))
@@ -100,7 +110,7 @@ class LineItem(Base):
     __tablename__ = 'line_items'
 
     id = Column(String, primary_key=True)
-    purchase_id = Column(String, ForeignKey('purchases.id', ondelete='CASCADE'))
+    purchase_id = Column(String, ForeignKey('purchases.id', ondelete='CASCADE'), index=True)
     description = Column(String)
     quantity = Column(Integer, default=1)
     unit_price = Column(Float, default=0.0)
@@ -133,7 +143,7 @@ class PurchaseBudget(Base):
     __tablename__ = 'purchase_budgets'
 
     id = Column(String, primary_key=True)
-    purchase_id = Column(String, ForeignKey('purchases.id', ondelete='CASCADE'))
+    purchase_id = Column(String, ForeignKey('purchases.id', ondelete='CASCADE'), index=True)
     budget_id = Column(String, ForeignKey('budgets.id', ondelete='CASCADE'))
     amount = Column(Float, default=0.0)
 
@@ -158,10 +168,10 @@ class Purchase(Base):
     __tablename__ = 'purchases'
 
     id = Column(String, primary_key=True)
-    order_number = Column(String)
+    order_number = Column(String, index=True)
     invoice_number = Column(String)
     date = Column(String)
-    vendor_id = Column(String, ForeignKey('vendors.id'))
+    vendor_id = Column(String, ForeignKey('vendors.id'), index=True)
     vendor_name = Column(String)
     status = Column(String, default="Pending")  # Pending, Approved, Rejected
     approver = Column(String)
@@ -233,4 +243,84 @@ class Purchase(Base):
         self.status = "Rejected"
         self.approver = approver
         self.approval_date = datetime.now().strftime("%Y-%m-%d")
-        self.notes = notes
\ No newline at end of file
+        self.notes = notes
+
+class ImportJob(Base):
+    __tablename__ = 'import_jobs'
+
+    id = Column(String, primary_key=True)
+    file_path = Column(String, nullable=False)
+    file_format = Column(String, default="csv")  # csv, jsonl
+    file_size = Column(Integer, default=0)
+    file_mtime = Column(Float, default=0.0)
+    status = Column(String, default="Running")  # Running, Paused, Cancelled, Failed, Completed
+    sorted_input = Column(Boolean, default=False)
+
+    # Checkpoint, saved in the same transaction as each committed chunk.
+    # Sorted input is read in a different order than the file, so it
+    # resumes by the number of sorted records read instead of byte offset.
+    byte_offset = Column(Integer, default=0)
+    row_number = Column(Integer, default=0)
+    records_read = Column(Integer, default=0)
+    error_report_path = Column(String)
+    error_report_offset = Column(Integer, default=0)
+    imported = Column(Integer, default=0)
+    line_items = Column(Integer, default=0)
+    skipped = Column(Integer, default=0)
+    errors = Column(Integer, default=0)
+    warnings = Column(Integer, default=0)
+    vendors_created = Column(Integer, default=0)
+
+    message = Column(Text)
+    created_at = Column(String)
+    updated_at = Column(String)
+
+    def __init__(self, id=None, file_path="", file_format="csv", file_size=0, file_mtime=0.0,
+                 status="Running", error_report_path=None):
+        self.id = id or str(uuid.uuid4())
+        self.file_path = file_path
+        self.file_format = file_format
+        self.file_size = file_size
+        self.file_mtime = file_mtime
+        self.status = status
+        self.sorted_input = False
+        self.byte_offset = 0
+        self.row_number = 0
+        self.records_read = 0
+        self.error_report_path = error_report_path
+        self.error_report_offset = 0
+        self.imported = 0
+        self.line_items = 0
+        self.skipped = 0
+        self.errors = 0
+        self.warnings = 0
+        self.vendors_created = 0
+        self.message = ""
+        self.created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.updated_at = self.created_at
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "file_path": self.file_path,
+            "file_format": self.file_format,
+            "file_size": self.file_size,
+            "status": self.status,
+            "byte_offset": self.byte_offset,
+            "row_number": self.row_number,
+            "imported": self.imported,
+            "line_items": self.line_items,
+            "skipped": self.skipped,
+            "errors": self.errors,
+            "warnings": self.warnings,
+            "vendors_created": self.vendors_created,
+            "message": self.message,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at
+        }
+
+    def get_progress(self):
+        """Fraction of the file imported so far"""
+        if not self.file_size:
+            return 0.0
+        return min(self.byte_offset / self.file_size, 1.0)
@@ -0,0 +1,126 @@
+# tests/test_budget_amounts.py
+"""
+Yearly budget amounts are upserted one row per budget and year, through
+ON CONFLICT while the unique index exists and by updating the first
+amount entered while duplicates hold the index back; resolving the
+duplicates keeps that first amount. Amounts import from long and wide
+CSV files.
+
+Run from the repository root:
+    python -m unittest tests.test_budget_amounts
+"""
+import os
+import sqlite3
+import tempfile
+import unittest
+
+INDEX = "uq_yearly_budget_amounts_budget_year"
+
+
+class BudgetAmountsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        # database.log is written to the working directory
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        self.db_path = os.path.join(self.tmp.name, "budgets.db")
+        self.db_manager = self.open_database()
+        self.assertTrue(self.controller.add_budget(
+            {"code": "B-1", "name": "Budget 1", "yearly_amount": {"2024": 100.0}})[0])
+        self.assertTrue(self.controller.add_budget({"code": "B-2", "name": "Budget 2"})[0])
+        self.budget_ids = self.controller.reference.get()["ids_by_code"]
+
+    def tearDown(self):
+        self.db_manager.engine.dispose()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def open_database(self):
+        from database.db_manager import DatabaseManager
+        from controllers.budget_controller import BudgetController
+
+        db_manager = DatabaseManager(f"sqlite:///{self.db_path}")
+        self.controller = BudgetController(db_manager)
+        return db_manager
+
+    def amounts(self):
+        """[(budget code, year, amount)] in the order entered"""
+        with sqlite3.connect(self.db_path) as connection:
+            return connection.execute(
+                "SELECT b.code, y.year, y.amount FROM yearly_budget_amounts y "
+                "JOIN budgets b ON b.id = y.budget_id ORDER BY y.rowid").fetchall()
+
+    def write_csv(self, text):
+        path = os.path.join(self.tmp.name, "amounts.csv")
+        with open(path, "w", newline="") as f:
+            f.write(text)
+        return path
+
+    def test_upsert_replaces_amounts(self):
+        self.assertNotIn(INDEX, self.db_manager.skipped_indexes)
+        success, message = self.controller.update_budget(
+            {"id": self.budget_ids["B-1"], "yearly_amount": {"2024": 150.0, "2025": 200.0}})
+        self.assertTrue(success, message)
+        self.assertEqual(self.amounts(), [("B-1", "2024", 150.0), ("B-1", "2025", 200.0)])
+
+    def test_duplicates_update_the_first_amount_until_resolved(self):
+        # A database from before the unique index, with a second 2024 amount
+        # entered later (its id sorts first, its rowid does not)
+        self.db_manager.engine.dispose()
+        with sqlite3.connect(self.db_path) as connection:
+            connection.execute(f"DROP INDEX {INDEX}")
+            connection.execute("INSERT INTO yearly_budget_amounts (id, budget_id, year, amount) "
+                               "VALUES ('0', ?, '2024', 999.0)", (self.budget_ids["B-1"],))
+
+        self.db_manager = self.open_database()
+        self.assertIn(INDEX, self.db_manager.skipped_indexes)
+        self.assertTrue(any("B-1 2024: 100.0, 999.0" in line for line in self.db_manager.schema_report))
+        self.assertEqual(self.amounts(), [("B-1", "2024", 100.0), ("B-1", "2024", 999.0)])
+
+        success, message = self.controller.update_budget(
+            {"id": self.budget_ids["B-1"], "yearly_amount": {"2024": 150.0, "2026": 5.0}})
+        self.assertTrue(success, message)
+        self.assertEqual(self.amounts(),
+                         [("B-1", "2024", 150.0), ("B-1", "2024", 999.0), ("B-1", "2026", 5.0)])
+
+        success, message = self.db_manager.resolve_duplicates()
+        self.assertTrue(success, message)
+        self.assertIn("Deleted duplicate amount 999.0 for budget B-1 2024", message)
+        self.assertEqual(self.db_manager.skipped_indexes, set())
+        self.assertEqual(self.amounts(), [("B-1", "2024", 150.0), ("B-1", "2026", 5.0)])
+        with sqlite3.connect(self.db_path) as connection:
+            self.assertTrue(connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (INDEX,)).fetchone())
+
+    def test_import_long_csv(self):
+        path = self.write_csv("Budget Code,Year,Amount\n"
+                              "B-1,2024,\"$1,200.50\"\n"
+                              "B-2,2024,300\n"
+                              "B-2,2025,350\n")
+        self.assertEqual(self.controller.import_budget_amounts(path),
+                         (True, "Set 3 yearly amounts for 2 budgets"))
+        self.assertEqual(sorted(self.amounts()),
+                         [("B-1", "2024", 1200.5), ("B-2", "2024", 300.0), ("B-2", "2025", 350.0)])
+
+    def test_import_wide_csv(self):
+        # A blank cell leaves that year's amount alone
+        path = self.write_csv("Budget Code,2024,2025\n"
+                              "B-1,,110\n"
+                              "B-2,20,25\n")
+        self.assertEqual(self.controller.import_budget_amounts(path),
+                         (True, "Set 3 yearly amounts for 2 budgets"))
+        self.assertEqual(sorted(self.amounts()), [("B-1", "2024", 100.0), ("B-1", "2025", 110.0),
+                                                  ("B-2", "2024", 20.0), ("B-2", "2025", 25.0)])
+
+    def test_import_with_a_bad_row_writes_nothing(self):
+        path = self.write_csv("Budget Code,Year,Amount\n"
+                              "B-2,2024,300\n"
+                              "B-9,2024,10\n")
+        success, message = self.controller.import_budget_amounts(path)
+        self.assertFalse(success)
+        self.assertEqual(message, "Nothing was imported:\nRow 3: unknown budget code 'B-9'")
+        self.assertEqual(self.amounts(), [("B-1", "2024", 100.0)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+# tests/test_import_resume.py
+"""
+An import killed while it saves a chunk's checkpoint must resume with
+exact counts: the chunk's purchases and its checkpoint commit together.
+
+Run from the repository root:
+    python -m unittest tests.test_import_resume
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imports the file in chunks of 3 orders and kills the process (no
+# clean-up, no rollback) while the second chunk saves its checkpoint
+CRASHING_IMPORT = """
+import os, sys
+from database.db_manager import DatabaseManager
+from utils.importers import PurchaseImporter
+
+db_path, csv_path = sys.argv[1:3]
+importer = PurchaseImporter(DatabaseManager(f"sqlite:///{db_path}"), chunk_size=3)
+save_checkpoint = importer._save_checkpoint
+calls = []
+
+def crash_on_second_checkpoint(session, report, **fields):
+    calls.append(1)
+    if len(calls) == 2:
+        os._exit(3)
+    save_checkpoint(session, report, **fields)
+
+importer._save_checkpoint = crash_on_second_checkpoint
+importer.import_file(csv_path)
+"""
+
+
+class ImportResumeTest(unittest.TestCase):
+    ORDERS = 9
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        # database.log is written to the working directory
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        self.db_path = os.path.join(self.tmp.name, "import.db")
+        self.csv_path = os.path.join(self.tmp.name, "purchases.csv")
+        with open(self.csv_path, "w", newline="") as f:
+            f.write("Order Number,Vendor,Date,Description,Quantity,Unit Price\n")
+            for i in range(self.ORDERS):
+                f.write(f"PO-{i:03d},Resume Vendor,2024-03-{i + 1:02d},Item {i},1,10.00\n")
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_crash_during_checkpoint_resumes_exactly(self):
+        from sqlalchemy import func, select
+        from database.db_manager import DatabaseManager
+        from database.models import ImportJob, Purchase
+        from utils.importers import PurchaseImporter
+
+        crashed = subprocess.run([sys.executable, "-c", CRASHING_IMPORT, self.db_path, self.csv_path],
+                                 cwd=self.tmp.name, env=dict(os.environ, PYTHONPATH=ROOT))
+        self.assertEqual(crashed.returncode, 3)
+
+        db_manager = DatabaseManager(f"sqlite:///{self.db_path}")
+        try:
+            session = db_manager.Session()
+            try:
+                job = session.execute(select(ImportJob)).scalar_one()
+                purchases = session.scalar(select(func.count()).select_from(Purchase))
+                # Only the first chunk and its checkpoint are committed
+                self.assertEqual((purchases, job.imported), (3, 3))
+                job_id = job.id
+            finally:
+                session.close()
+
+            success, message = PurchaseImporter(db_manager, chunk_size=3).resume_job(job_id)
+            self.assertTrue(success, message)
+
+            session = db_manager.Session()
+            try:
+                job = session.get(ImportJob, job_id)
+                purchases = session.scalar(select(func.count()).select_from(Purchase))
+                self.assertEqual((purchases, job.imported, job.skipped), (self.ORDERS, self.ORDERS, 0))
+                self.assertEqual(job.status, "Completed")
+            finally:
+                session.close()
+        finally:
+            db_manager.engine.dispose()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+# tests/test_purchase_update.py
+"""
+update_purchase_diff() writes only what changed, reports it exactly,
+refuses line item ids that are not the purchase's own, and marks the
+report years of both the old and the new date as changed.
+
+Run from the repository root:
+    python -m unittest tests.test_purchase_update
+"""
+import os
+import tempfile
+import unittest
+
+
+class PurchaseUpdateTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        # database.log is written to the working directory
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        from database.db_manager import DatabaseManager
+        from controllers.budget_controller import BudgetController
+        from controllers.purchase_controller import PurchaseController
+
+        self.db_manager = DatabaseManager(f"sqlite:///{os.path.join(self.tmp.name, 'update.db')}")
+        self.controller = PurchaseController(self.db_manager)
+        budgets = BudgetController(self.db_manager)
+        for code in ("B-1", "B-2"):
+            self.assertTrue(budgets.add_budget({"code": code, "name": f"Budget {code}"})[0])
+        self.budget_ids = budgets.reference.get()["ids_by_code"]
+
+        for order_number in ("PO-1", "PO-2"):
+            self.assertTrue(self.controller.add_purchase({
+                "order_number": order_number,
+                "date": "2024-03-01",
+                "vendor_name": "Update Vendor",
+                "line_items": [{"description": name, "quantity": 1, "unit_price": 10.0}
+                               for name in ("A", "B", "C")],
+                "budgets": [{"budget_id": self.budget_ids["B-1"], "amount": 30.0}],
+            }))
+        self.purchase_ids = {purchase.order_number: purchase.id
+                             for purchase in self.controller.get_all_purchases()}
+
+    def tearDown(self):
+        self.db_manager.engine.dispose()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def snapshot(self, order_number):
+        """(date, notes, {description: (id, quantity)}, {budget_id: amount}) as stored"""
+        purchase = self.controller.get_purchase_by_id(self.purchase_ids[order_number])
+        return (purchase.date, purchase.notes,
+                {item.description: (item.id, item.quantity) for item in purchase.line_items},
+                {allocation.budget_id: allocation.amount for allocation in purchase.budgets})
+
+    def test_only_changed_rows_are_written_and_counted(self):
+        _, _, items, _ = self.snapshot("PO-1")
+        data = {
+            "notes": "Rush order",
+            "line_items": [
+                {"id": items["A"][0], "description": "A", "quantity": 5, "unit_price": 10.0},
+                {"id": items["B"][0], "description": "B", "quantity": 1, "unit_price": 10.0},
+                {"description": "D", "quantity": 2, "unit_price": 4.0},
+            ],
+            "budgets": [{"budget_id": self.budget_ids["B-1"], "amount": 30.0},
+                        {"budget_id": self.budget_ids["B-2"], "amount": 28.0}],
+        }
+        success, message, changes = self.controller.update_purchase_diff(self.purchase_ids["PO-1"], data)
+        self.assertTrue(success, message)
+        self.assertEqual(changes, {
+            "purchase": 1,
+            "line_items": {"updated": 1, "inserted": 1, "deleted": 1},
+            "allocations": {"updated": 0, "inserted": 1, "deleted": 0},
+        })
+        self.assertEqual(message, "Purchase updated: details changed; line items: 1 updated, "
+                                  "1 added, 1 removed; allocations: 1 added")
+
+        _, notes, items_after, allocations = self.snapshot("PO-1")
+        self.assertEqual(notes, "Rush order")
+        self.assertEqual({name: quantity for name, (_, quantity) in items_after.items()},
+                         {"A": 5, "B": 1, "D": 2})
+        self.assertEqual(items_after["A"][0], items["A"][0])
+        self.assertEqual(allocations, {self.budget_ids["B-1"]: 30.0, self.budget_ids["B-2"]: 28.0})
+
+        # Sending the same data again matches every row and writes nothing
+        success, message, changes = self.controller.update_purchase_diff(self.purchase_ids["PO-1"], data)
+        self.assertEqual((success, message), (True, "No changes to save"))
+        self.assertEqual(changes["purchase"], 0)
+
+    def test_ids_of_other_rows_are_rejected(self):
+        _, _, items, _ = self.snapshot("PO-1")
+        _, _, other_items, _ = self.snapshot("PO-2")
+        before = self.snapshot("PO-1"), self.snapshot("PO-2")
+        version = self.db_manager.get_data_version("purchases")
+
+        cases = [
+            ([{"id": other_items["A"][0], "description": "A"}],
+             "Failed to update purchase: 1 line item(s) do not belong to this purchase"),
+            ([{"id": items["A"][0], "description": "A"}, {"id": items["A"][0], "description": "A2"}],
+             "Failed to update purchase: The same line item is listed more than once"),
+        ]
+        for line_items, expected in cases:
+            success, message, _ = self.controller.update_purchase_diff(
+                self.purchase_ids["PO-1"], {"notes": "Changed", "line_items": line_items})
+            self.assertEqual((success, message), (False, expected))
+
+        self.assertEqual((self.snapshot("PO-1"), self.snapshot("PO-2")), before)
+        self.assertEqual(self.db_manager.get_data_version("purchases"), version)
+
+    def test_date_change_marks_both_years_changed(self):
+        versions = {year: self.db_manager.get_data_version(f"year:{year}") for year in ("2022", "2023", "2024")}
+
+        # The line item goes through a Core statement, the date through the ORM
+        success, message, _ = self.controller.update_purchase_diff(self.purchase_ids["PO-1"], {
+            "date": "2023-12-31",
+            "line_items": [{"description": name, "quantity": 1, "unit_price": 10.0} for name in ("A", "B")],
+        })
+        self.assertTrue(success, message)
+        self.assertEqual(message, "Purchase updated: details changed; line items: 1 removed")
+        self.assertEqual(self.snapshot("PO-1")[0], "2023-12-31")
+
+        self.assertNotEqual(self.db_manager.get_data_version("year:2023"), versions["2023"])
+        self.assertNotEqual(self.db_manager.get_data_version("year:2024"), versions["2024"])
+        self.assertEqual(self.db_manager.get_data_version("year:2022"), versions["2022"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+# tests/test_receiving_session.py
+"""
+Scans a receiving session journaled but did not save are saved by the
+next session to start, exactly once, and only when the session that
+wrote them is gone.
+
+Run from the repository root:
+    python -m unittest tests.test_receiving_session
+"""
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Saves line 1 of PO-1, scans lines 2 and 3 and kills the process (no
+# close(), no flush) before the writer saves them
+CRASHING_SESSION = """
+import os, sys
+from database.db_manager import DatabaseManager
+from controllers.purchase_controller import PurchaseController
+from controllers.receiving_session import ReceivingSession
+
+session = ReceivingSession(PurchaseController(DatabaseManager(f"sqlite:///{sys.argv[1]}")),
+                           flush_scans=1000, flush_ms=600000)
+session.start()
+session.scan("PO-1", 1)
+session.flush()
+session.scan("PO-1", 2)
+session.scan("PO-1", 3)
+os._exit(3)
+"""
+
+
+class ReceivingSessionTest(unittest.TestCase):
+    LINES = 4
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        # database.log is written to the working directory
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        from database.db_manager import DatabaseManager
+        from controllers.purchase_controller import PurchaseController
+
+        self.db_path = os.path.join(self.tmp.name, "receiving.db")
+        self.db_manager = DatabaseManager(f"sqlite:///{self.db_path}")
+        self.controller = PurchaseController(self.db_manager)
+        self.assertTrue(self.controller.add_purchase({
+            "order_number": "PO-1",
+            "date": "2024-03-01",
+            "vendor_name": "Receiving Vendor",
+            "line_items": [{"description": f"Item {i}", "quantity": 1, "unit_price": 10.0}
+                           for i in range(1, self.LINES + 1)],
+        }))
+        self.line_ids = {row.line: row.line_item_id for row in self.controller.get_open_line_items(["PO-1"])}
+
+    def tearDown(self):
+        self.db_manager.engine.dispose()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def received_lines(self):
+        from sqlalchemy import select
+        from database.models import LineItem
+
+        session = self.db_manager.Session()
+        try:
+            received = set(session.scalars(select(LineItem.id).where(LineItem.received == True)))
+        finally:
+            session.close()
+        return {line for line, line_item_id in self.line_ids.items() if line_item_id in received}
+
+    def journals(self):
+        from config.settings import RECEIVING_JOURNAL_SUFFIX
+        return glob.glob(glob.escape(self.db_path + RECEIVING_JOURNAL_SUFFIX) + "*")
+
+    def start_session(self):
+        from controllers.receiving_session import ReceivingSession
+
+        session = ReceivingSession(self.controller, flush_scans=1000, flush_ms=600000)
+        success, message = session.start()
+        self.assertTrue(success, message)
+        return session, message
+
+    def test_abandoned_session_is_replayed_once(self):
+        crashed = subprocess.run([sys.executable, "-c", CRASHING_SESSION, self.db_path],
+                                 cwd=self.tmp.name, env=dict(os.environ, PYTHONPATH=ROOT))
+        self.assertEqual(crashed.returncode, 3)
+        self.assertEqual(self.received_lines(), {1})
+        self.assertEqual(len(self.journals()), 1)
+
+        session, message = self.start_session()
+        self.assertEqual(message, "Saved 2 scans left over from an earlier session")
+        self.assertEqual(self.received_lines(), {1, 2, 3})
+        self.assertEqual(self.journals(), [session.journal_path])
+        self.assertEqual(session.close(), (True, "0 scans saved"))
+        self.assertEqual(self.journals(), [])
+
+    def test_saved_and_truncated_records_are_not_replayed(self):
+        from config.settings import RECEIVING_JOURNAL_SUFFIX
+
+        # Line 1 was saved; the record for line 4 was cut short by the crash
+        records = [{"seq": 1, "line_item_id": self.line_ids[1], "order_number": "PO-1", "line": 1},
+                   {"saved_through": 1},
+                   {"seq": 2, "line_item_id": self.line_ids[2], "order_number": "PO-1", "line": 2}]
+        with open(f"{self.db_path}{RECEIVING_JOURNAL_SUFFIX}-abandoned", "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(record) + "\n" for record in records)
+            f.write(json.dumps({"seq": 3, "line_item_id": self.line_ids[4]})[:30])
+
+        session, message = self.start_session()
+        self.assertEqual(message, "Saved 1 scans left over from an earlier session")
+        self.assertEqual(self.received_lines(), {2})
+        self.assertEqual(self.journals(), [session.journal_path])
+        session.close()
+
+    def test_running_session_journal_is_left_alone(self):
+        running, _ = self.start_session()
+        self.assertTrue(running.scan("PO-1", 1)[0])
+
+        # The first session still holds its journal: its queued scan is not replayed
+        other, message = self.start_session()
+        self.assertEqual(message, "No unsaved scans")
+        self.assertEqual(self.received_lines(), set())
+        self.assertIn(running.journal_path, self.journals())
+
+        self.assertEqual(running.close(), (True, "1 scans saved"))
+        self.assertEqual(other.close(), (True, "0 scans saved"))
+        self.assertEqual(self.received_lines(), {1})
+        self.assertEqual(self.journals(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+# tests/test_unique_names.py
+"""
+A database whose vendor names or budget codes are already duplicated
+opens unchanged, without the unique indexes, and reports the duplicates;
+new duplicates are still refused meanwhile. resolve_duplicates() renames
+all but the first of each and creates the indexes.
+
+Run from the repository root:
+    python -m unittest tests.test_unique_names
+"""
+import os
+import sqlite3
+import tempfile
+import unittest
+
+VENDOR_EXISTS = (False, "A vendor with this name already exists")
+BUDGET_EXISTS = (False, "A budget with this code already exists")
+
+
+class UniqueNamesTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        # database.log is written to the working directory
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        self.db_path = os.path.join(self.tmp.name, "names.db")
+        self.db_manager = self.open_database()
+        for name in ("Acme", "Beta"):
+            self.assertTrue(self.vendors.add_vendor({"id": name.lower(), "name": name})[0])
+        for code in ("B-1", "B-2"):
+            self.assertTrue(self.budgets.add_budget({"id": code.lower(), "code": code, "name": code})[0])
+
+        # A database from before the unique indexes, with a second Acme
+        # (and a purchase from it) and a second B-1
+        self.db_manager.engine.dispose()
+        with sqlite3.connect(self.db_path) as connection:
+            connection.execute("DROP INDEX uq_vendors_name")
+            connection.execute("DROP INDEX uq_budgets_code")
+            connection.execute("INSERT INTO vendors (id, name) VALUES ('acme-2', 'Acme')")
+            connection.execute("INSERT INTO purchases (id, order_number, vendor_id, vendor_name) "
+                               "VALUES ('p-1', 'PO-1', 'acme-2', 'Acme')")
+            connection.execute("INSERT INTO budgets (id, code, name) VALUES ('b-1-2', 'B-1', 'Second B-1')")
+        self.db_manager = self.open_database()
+
+    def tearDown(self):
+        self.db_manager.engine.dispose()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def open_database(self):
+        from database.db_manager import DatabaseManager
+        from controllers.budget_controller import BudgetController
+        from controllers.vendor_controller import VendorController
+
+        db_manager = DatabaseManager(f"sqlite:///{self.db_path}")
+        self.vendors = VendorController(db_manager)
+        self.budgets = BudgetController(db_manager)
+        return db_manager
+
+    def query(self, sql):
+        with sqlite3.connect(self.db_path) as connection:
+            return connection.execute(sql).fetchall()
+
+    def test_startup_reports_duplicates_and_changes_nothing(self):
+        self.assertEqual(self.db_manager.skipped_indexes, {"uq_vendors_name", "uq_budgets_code"})
+        report = "\n".join(self.db_manager.schema_report)
+        self.assertIn("  'Acme' (2 rows)", report)
+        self.assertIn("  'B-1' (2 rows)", report)
+        self.assertEqual(self.query("SELECT id, name FROM vendors ORDER BY rowid"),
+                         [("acme", "Acme"), ("beta", "Beta"), ("acme-2", "Acme")])
+        self.assertEqual(self.query("SELECT id, code FROM budgets ORDER BY rowid"),
+                         [("b-1", "B-1"), ("b-2", "B-2"), ("b-1-2", "B-1")])
+        self.assertEqual(self.query("SELECT name FROM sqlite_master WHERE name LIKE 'uq_%' ORDER BY name"),
+                         [("uq_yearly_budget_amounts_budget_year",)])
+
+    def test_new_duplicates_are_refused_without_the_index(self):
+        self.assertEqual(self.vendors.add_vendor({"name": "Beta"}), VENDOR_EXISTS)
+        self.assertEqual(self.vendors.update_vendor({"id": "beta", "name": "Acme"}), VENDOR_EXISTS)
+        self.assertEqual(self.budgets.add_budget({"code": "B-2", "name": "Another B-2"}), BUDGET_EXISTS)
+        self.assertEqual(self.budgets.update_budget({"id": "b-2", "code": "B-1"}), BUDGET_EXISTS)
+
+        # Saving a duplicated vendor or budget under its own name still works
+        self.assertTrue(self.vendors.update_vendor({"id": "acme-2", "name": "Acme", "phone": "555"})[0])
+        self.assertTrue(self.vendors.add_vendor({"name": "Gamma"})[0])
+        self.assertEqual(self.query("SELECT COUNT(*) FROM vendors"), [(4,)])
+        self.assertEqual(self.query("SELECT COUNT(*) FROM budgets"), [(3,)])
+
+    def test_resolve_duplicates_renames_and_creates_the_indexes(self):
+        success, message = self.db_manager.resolve_duplicates()
+        self.assertTrue(success, message)
+        self.assertIn("  'Acme' -> 'Acme (2)'", message)
+        self.assertIn("  'B-1' -> 'B-1 (2)'", message)
+        self.assertEqual(self.db_manager.skipped_indexes, set())
+
+        self.assertEqual(self.query("SELECT id, name FROM vendors ORDER BY rowid"),
+                         [("acme", "Acme"), ("beta", "Beta"), ("acme-2", "Acme (2)")])
+        self.assertEqual(self.query("SELECT vendor_name FROM purchases"), [("Acme (2)",)])
+        self.assertEqual(self.query("SELECT id, code FROM budgets ORDER BY rowid"),
+                         [("b-1", "B-1"), ("b-2", "B-2"), ("b-1-2", "B-1 (2)")])
+        self.assertEqual(self.query("SELECT name FROM sqlite_master WHERE name LIKE 'uq_%' ORDER BY name"),
+                         [("uq_budgets_code",), ("uq_vendors_name",), ("uq_yearly_budget_amounts_budget_year",)])
+
+        # The indexes refuse duplicates from now on
+        self.assertEqual(self.vendors.add_vendor({"name": "Acme"}), VENDOR_EXISTS)
+        self.assertEqual(self.budgets.add_budget({"code": "B-1", "name": "Another B-1"}), BUDGET_EXISTS)
+        self.assertEqual(self.db_manager.resolve_duplicates(), (True, "No duplicates to resolve"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+# utils/background.py
+import threading
+
+
+def run_in_background(widget, func, callback, *args, error_callback=None, poll_ms=30, **kwargs):
+    """
+    Run func(*args, **kwargs) on a daemon thread and hand the result to
+    callback on the Tk thread.
+
+    Tk is not thread-safe, so the worker never touches widgets: the Tk
+    thread polls the worker with widget.after() and calls callback(result)
+    or error_callback(exception) once it has finished. If the widget is
+    destroyed in the meantime the result is dropped.
+
+    Returns the worker thread.
+    """
+    outcome = {}
+
+    def worker():
+        try:
+            outcome["result"] = func(*args, **kwargs)
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+
+    def poll():
+        try:
+            if not widget.winfo_exists():
+                return
+        except Exception:
+            return
+
+        if thread.is_alive():
+            widget.after(poll_ms, poll)
+        elif "error" in outcome:
+            if error_callback:
+                error_callback(outcome["error"])
+            else:
+                print(f"Background task failed: {outcome['error']}")
+        else:
+            callback(outcome.get("result"))
+
+    widget.after(poll_ms, poll)
+    return thread
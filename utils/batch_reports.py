@@ -0,0 +1,150 @@
+# utils/batch_reports.py
+"""
+Year-end batch of budget and vendor reports for every fiscal year, as CSV
+and PDF, in a single zip archive.
+
+Runs from the dashboard or headless:
+    python -m utils.batch_reports --out year_end_reports.zip
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+REPORT_FORMATS = ("csv", "pdf")
+
+
+def render_report(report, file_format, year, data, file_path):
+    """Write one report file (runs in a worker process); returns (success, message)"""
+    if file_format == "pdf":
+        from utils.pdf_exporter import PDFExporter as exporter
+    else:
+        from utils.exporters import CSVExporter as exporter
+
+    if report == "budget":
+        return exporter.export_budget_report(data["budget_usage"], data["monthly_spending"], year, file_path)
+    return exporter.export_vendor_report(data["vendor_spending"], year, file_path)
+
+
+class BatchReportJob:
+    """
+    Budget and vendor reports for many years in one archive.
+
+    All years' datasets come from one multi-year aggregation pass
+    (ReportController.compute_all_years); the files are then rendered in
+    parallel worker processes and added to the archive as they finish.
+    """
+
+    def __init__(self, report_controller, formats=REPORT_FORMATS, workers=None):
+        self.report_controller = report_controller
+        self.formats = tuple(formats)
+        self.workers = workers or os.cpu_count() or 1
+
+    def run(self, archive_path, years=None, progress_callback=None, cancel_event=None):
+        """
+        Write the archive: <year>/budget_report_<year>.<fmt> and
+        <year>/vendor_report_<year>.<fmt> for every year.
+
+        progress_callback(fraction, message) is called as files finish;
+        setting cancel_event stops the job and removes the partial archive.
+        Returns (success, message).
+        """
+        unknown = [file_format for file_format in self.formats if file_format not in REPORT_FORMATS]
+        if unknown or not self.formats:
+            return False, f"Unknown report format: {', '.join(unknown) or 'none given'}"
+
+        if progress_callback:
+            progress_callback(None, "Computing report data for all years...")
+        datasets = self.report_controller.compute_all_years(years)
+        if not datasets:
+            return False, "No purchases or budget amounts found; there is nothing to report."
+
+        partial_path = archive_path + ".part"
+        try:
+            with tempfile.TemporaryDirectory() as work_dir:
+                failures, written = self._render(datasets, work_dir, partial_path, progress_callback, cancel_event)
+            if failures is None:
+                os.remove(partial_path)
+                return False, "Report generation cancelled."
+            os.replace(partial_path, archive_path)
+        except Exception as e:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            return False, f"Report generation failed: {str(e)}"
+
+        message = f"{written} reports for {len(datasets)} years written to {archive_path}"
+        if failures:
+            message += f"\n{len(failures)} reports failed:\n" + "\n".join(failures[:10])
+        return not failures, message
+
+    def _render(self, datasets, work_dir, archive_path, progress_callback, cancel_event):
+        """Render every report into the archive; returns (failures, written), or (None, written) if cancelled"""
+        tasks = []
+        for year, data in datasets.items():
+            budget_data = {"budget_usage": data["budget_usage"], "monthly_spending": data["monthly_spending"]}
+            vendor_data = {"vendor_spending": data["vendor_spending"]}
+            for file_format in self.formats:
+                tasks.append(("budget", file_format, year, budget_data))
+                tasks.append(("vendor", file_format, year, vendor_data))
+
+        failures = []
+        written = 0
+        # Spawn rather than fork: the dashboard runs Tk and other threads
+        context = multiprocessing.get_context("spawn")
+        with zipfile.ZipFile(archive_path, "w", zipfile.ZIP_DEFLATED) as archive, \
+                ProcessPoolExecutor(max_workers=min(self.workers, len(tasks)), mp_context=context) as pool:
+            pending = {}
+            for report, file_format, year, data in tasks:
+                name = f"{year}/{report}_report_{year}.{file_format}"
+                file_path = os.path.join(work_dir, name.replace("/", "_"))
+                future = pool.submit(render_report, report, file_format, year, data, file_path)
+                pending[future] = (name, file_path)
+
+            while pending:
+                done, _ = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                if cancel_event is not None and cancel_event.is_set():
+                    pool.shutdown(wait=True, cancel_futures=True)
+                    return None, written
+
+                for future in done:
+                    name, file_path = pending.pop(future)
+                    try:
+                        success, message = future.result()
+                    except Exception as e:
+                        success, message = False, str(e)
+                    if success:
+                        archive.write(file_path, name)
+                        os.remove(file_path)
+                        written += 1
+                    else:
+                        failures.append(f"{name}: {message}")
+                    if progress_callback:
+                        progress_callback((written + len(failures)) / len(tasks), f"Finished {name}")
+        return failures, written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write budget and vendor reports for every year into a zip archive")
+    parser.add_argument("--db", default=None, help="SQLite database file (default: the application database)")
+    parser.add_argument("--out", default="year_end_reports.zip", help="archive to write")
+    parser.add_argument("--years", help="comma separated years (default: every year with data)")
+    parser.add_argument("--formats", default="csv,pdf", help="comma separated formats: csv, pdf")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    from database.db_manager import DatabaseManager
+    from controllers.report_controller import ReportController
+
+    db_manager = DatabaseManager(f"sqlite:///{args.db}") if args.db else DatabaseManager()
+    years = [int(year) for year in args.years.split(",")] if args.years else None
+    success, message = ReportController(db_manager).export_all_years(
+        args.out, years, args.formats.split(","), args.workers,
+        progress_callback=lambda fraction, text: print(f"{text} ({fraction * 100:.0f}%)" if fraction else text))
+    print(message)
+    raise SystemExit(0 if success else 1)
+
+
+if __name__ == "__main__":
+    main()
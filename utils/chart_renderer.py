@@ -0,0 +1,130 @@
+# utils/chart_renderer.py
+import hashlib
+import io
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+
+
+class ChartRenderer:
+    """
+    Rasterizes charts to PNG bytes off the Tk thread.
+
+    Charts are drawn with the Agg backend on a worker thread and the PNG
+    bytes are cached under a hash of (chart type, data, title, options,
+    size, DPI), so showing the same data again (e.g. switching report
+    years back and forth) is served from the cache without redrawing.
+    """
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, max_entries=64, max_workers=1):
+        # A single worker keeps matplotlib usage serialized; it is still off the Tk thread
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="chart-render")
+        self._cache = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def get_default(cls):
+        """Return the renderer shared by all views"""
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    @staticmethod
+    def chart_types():
+        from utils.chart_utils import BudgetUsageChart, MonthlySpendingChart, PieChart
+        return {
+            "budget_usage": BudgetUsageChart,
+            "monthly_spending": MonthlySpendingChart,
+            "pie": PieChart,
+        }
+
+    @staticmethod
+    def cache_key(chart_type, data, title, size, dpi, options=None):
+        """Hash the chart inputs, output size and DPI into a cache key"""
+        payload = json.dumps([chart_type, data, title, options or {}, list(size), dpi],
+                             sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def get_cached(self, key):
+        """Return cached PNG bytes for a key, or None"""
+        with self._lock:
+            png = self._cache.get(key)
+            if png is not None:
+                self._cache.move_to_end(key)
+            return png
+
+    def render_async(self, chart_type, data, title="", size=(640, 480), dpi=100, options=None):
+        """
+        Render a chart on the worker thread.
+
+        Returns a (key, future) tuple. The future resolves to PNG bytes; it is
+        already resolved when the image is cached, and concurrent requests for
+        the same key share one render.
+        """
+        key = self.cache_key(chart_type, data, title, size, dpi, options)
+        with self._lock:
+            png = self._cache.get(key)
+            if png is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                future = Future()
+                future.set_result(png)
+                return key, future
+
+            future = self._pending.get(key)
+            if future is not None:
+                self.hits += 1
+                return key, future
+
+            self.misses += 1
+            future = self._executor.submit(self._render, chart_type, data, title, size, dpi, options)
+            self._pending[key] = future
+
+        future.add_done_callback(lambda f: self._store(key, f))
+        return key, future
+
+    def _store(self, key, future):
+        with self._lock:
+            self._pending.pop(key, None)
+            if future.cancelled() or future.exception() is not None:
+                return
+            self._cache[key] = future.result()
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def _render(self, chart_type, data, title, size, dpi, options):
+        chart_class = self.chart_types()[chart_type]
+        width, height = size
+        chart = chart_class(None, figsize=(width / dpi, height / dpi), dpi=dpi, **(options or {}))
+        try:
+            chart.update(data, title)
+            buffer = io.BytesIO()
+            chart.figure.canvas.print_png(buffer)
+            return buffer.getvalue()
+        finally:
+            chart.destroy()
+
+    def clear(self):
+        """Drop all cached images"""
+        with self._lock:
+            self._cache.clear()
+
+    def get_stats(self):
+        """Return cache statistics"""
+        with self._lock:
+            return {
+                "entries": len(self._cache),
+                "bytes": sum(len(png) for png in self._cache.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -1,137 +1,313 @@
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import numpy as np
+import math
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 from config.settings import CHART_COLORS
 
 
-class ChartGenerator:
+class BaseChart:
+    """
+    A chart whose figure is built once and updated in place.
+
+    The figure is a plain matplotlib Figure (no pyplot state), so nothing is
+    kept alive by pyplot's figure manager. When a Tk frame is given the chart
+    is drawn on a FigureCanvasTkAgg; without a frame an Agg canvas is used so
+    the same drawing code can render off-screen.
+    """
+
+    def __init__(self, frame=None, title="", figsize=(8, 6), dpi=100):
+        self.title = title
+        self.figure = Figure(figsize=figsize, dpi=dpi)
+        self.ax = self.figure.add_subplot(111)
+        self.canvas = None
+        self._built = False
+
+        if frame is not None:
+            # Imported here so off-screen rendering does not load the Tk backend
+            from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+            self.canvas = FigureCanvasTkAgg(self.figure, frame)
+            # Release the figure as soon as the widget goes away
+            self.canvas.get_tk_widget().bind("<Destroy>", self._on_widget_destroy, add="+")
+        else:
+            FigureCanvasAgg(self.figure)
+
+    def get_tk_widget(self):
+        """Return the Tk widget of the chart canvas"""
+        return self.canvas.get_tk_widget() if self.canvas else None
+
+    def update(self, data, title=None):
+        """Update the chart with new data, rebuilding artists only when needed"""
+        if self.figure is None:
+            raise RuntimeError("Chart has been destroyed")
+        if title is not None:
+            self.title = title
+
+        data = self._prepare(data)
+        rebuilt = False
+        if not self._built or not self._update_artists(data):
+            self.ax.clear()
+            self._build_artists(data)
+            self._built = True
+            rebuilt = True
+
+        self.ax.set_title(self.title)
+
+        # Layout only needs recomputing when the artists were recreated
+        if rebuilt:
+            self.figure.tight_layout()
+
+        self.draw()
+        return self
+
+    def draw(self):
+        """Schedule a redraw of the Tk canvas"""
+        if self.canvas is not None:
+            self.canvas.draw_idle()
+
+    def destroy(self):
+        """Release the figure and destroy the canvas widget"""
+        canvas = self.canvas
+        self._release()
+        if canvas is not None:
+            widget = canvas.get_tk_widget()
+            try:
+                if widget.winfo_exists():
+                    widget.destroy()
+            except Exception:
+                pass
+
+    def _on_widget_destroy(self, event):
+        if self.canvas is not None and event.widget is self.canvas.get_tk_widget():
+            self._release()
+
+    def _release(self):
+        if self.figure is not None:
+            self.figure.clear()
+        self.figure = None
+        self.ax = None
+        self.canvas = None
+        self._built = False
+
+    # Subclass hooks
+    def _prepare(self, data):
+        return data
+
+    def _build_artists(self, data):
+        raise NotImplementedError
+
+    def _update_artists(self, data):
+        """Update existing artists in place. Return False if a rebuild is needed."""
+        return False
+
+
+class BudgetUsageChart(BaseChart):
+    """Horizontal bar chart of budget usage (top 10 budgets by percent used)"""
+
+    def __init__(self, frame=None, title="Budget Usage", **kwargs):
+        super().__init__(frame, title, **kwargs)
+        self.bars = []
+        self.labels = []
+
     @staticmethod
-    def create_budget_usage_chart(frame, budget_data, title="Budget Usage"):
-        """Create a horizontal bar chart of budget usage"""
-        # Sort data by percentage used
-        sorted_data = sorted(budget_data, key=lambda x: x["percent"], reverse=True)
+    def _bar_color(percent):
+        if percent > 90:
+            return '#e15759'  # Red for high usage
+        elif percent > 70:
+            return '#f28e2c'  # Orange for moderate usage
+        return '#4e79a7'  # Blue for low usage
 
-        # Limit to top 10 for readability
-        if len(sorted_data) > 10:
-            sorted_data = sorted_data[:10]
+    def _prepare(self, budget_data):
+        # Sort data by percentage used and limit to top 10 for readability
+        sorted_data = sorted(budget_data, key=lambda x: x["percent"], reverse=True)[:10]
+        return ([item["name"] for item in sorted_data],
+                [item["percent"] for item in sorted_data])
 
-        budget_names = [item["name"] for item in sorted_data]
-        percentages = [item["percent"] for item in sorted_data]
+    def _build_artists(self, data):
+        budget_names, percentages = data
 
-        # Create figure and axis
-        fig, ax = plt.subplots(figsize=(8, 6))
+        self.bars = list(self.ax.barh(range(len(budget_names)), percentages))
+        for bar, percent in zip(self.bars, percentages):
+            bar.set_color(self._bar_color(percent))
 
-        # Create horizontal bar chart
-        bars = ax.barh(range(len(budget_names)), percentages)
+        self.ax.set_yticks(range(len(budget_names)))
+        self.ax.set_yticklabels(budget_names)
+        self.ax.set_xlabel('Percentage Used')
+        self.ax.set_xlim(0, 100)  # Percentage from 0 to 100
 
-        # Color bars based on percentage
-        for i, bar in enumerate(bars):
-            percent = percentages[i]
-            if percent > 90:
-                bar.set_color('#e15759')  # Red for high usage
-            elif percent > 70:
-                bar.set_color('#f28e2c')  # Orange for moderate usage
-            else:
-                bar.set_color('#4e79a7')  # Blue for low usage
+        self.labels = [self.ax.text(percent + 2, i, f"{percent:.1f}%", va='center')
+                       for i, percent in enumerate(percentages)]
 
-        # Set labels and title
-        ax.set_yticks(range(len(budget_names)))
-        ax.set_yticklabels(budget_names)
-        ax.set_xlabel('Percentage Used')
-        ax.set_title(title)
-        ax.set_xlim(0, 100)  # Percentage from 0 to 100
+    def _update_artists(self, data):
+        budget_names, percentages = data
+        if len(percentages) != len(self.bars):
+            return False
 
-        # Add percentage labels
-        for i, percent in enumerate(percentages):
-            ax.text(percent + 2, i, f"{percent:.1f}%", va='center')
+        for bar, label, percent in zip(self.bars, self.labels, percentages):
+            bar.set_width(percent)
+            bar.set_color(self._bar_color(percent))
+            label.set_x(percent + 2)
+            label.set_text(f"{percent:.1f}%")
+        self.ax.set_yticklabels(budget_names)
+        return True
 
-        fig.tight_layout()
 
-        # Create canvas widget
-        canvas = FigureCanvasTkAgg(fig, frame)
-        canvas.draw()
+class MonthlySpendingChart(BaseChart):
+    """Vertical bar chart of spending per month"""
 
-        return canvas
+    def __init__(self, frame=None, title="Monthly Spending", **kwargs):
+        super().__init__(frame, title, **kwargs)
+        self.bars = []
+        self.labels = []
 
-    @staticmethod
-    def create_monthly_spending_chart(frame, monthly_data, title="Monthly Spending"):
-        """Create a bar chart of monthly spending"""
-        months = [item["month"] for item in monthly_data]
-        amounts = [item["amount"] for item in monthly_data]
+    def _prepare(self, monthly_data):
+        return ([item["month"] for item in monthly_data],
+                [item["amount"] for item in monthly_data])
 
-        # Create figure and axis
-        fig, ax = plt.subplots(figsize=(8, 6))
+    def _build_artists(self, data):
+        months, amounts = data
 
-        # Create bar chart
-        bars = ax.bar(months, amounts, color=CHART_COLORS[0])
+        self.bars = list(self.ax.bar(months, amounts, color=CHART_COLORS[0]))
 
-        # Set labels and title
-        ax.set_xlabel('Month')
-        ax.set_ylabel('Amount ($)')
-        ax.set_title(title)
+        self.ax.set_xlabel('Month')
+        self.ax.set_ylabel('Amount ($)')
 
         # Add data labels on bars
-        for i, v in enumerate(amounts):
-            ax.text(i, v + 100, f"${v:,.0f}", ha='center')
+        self.labels = [self.ax.text(i, v + 100, f"${v:,.0f}", ha='center')
+                       for i, v in enumerate(amounts)]
 
         # Rotate x labels for better readability
-        plt.xticks(rotation=45, ha='right')
-
-        fig.tight_layout()
-
-        # Create canvas widget
-        canvas = FigureCanvasTkAgg(fig, frame)
-        canvas.draw()
-
-        return canvas
-
-    @staticmethod
-    def create_pie_chart(frame, data, label_field, value_field, title="Distribution"):
-        """Create a pie chart"""
-        # Sort data by value
-        sorted_data = sorted(data, key=lambda x: x[value_field], reverse=True)
+        for tick_label in self.ax.get_xticklabels():
+            tick_label.set_rotation(45)
+            tick_label.set_horizontalalignment('right')
+
+    def _update_artists(self, data):
+        months, amounts = data
+        if len(amounts) != len(self.bars):
+            return False
+
+        for bar, label, v in zip(self.bars, self.labels, amounts):
+            bar.set_height(v)
+            label.set_y(v + 100)
+            label.set_text(f"${v:,.0f}")
+        # Same number of months, but they may be different ones
+        self.ax.set_xticks(range(len(months)), months, rotation=45, ha='right')
+
+        self.ax.relim()
+        self.ax.autoscale_view()
+        return True
+
+
+class PieChart(BaseChart):
+    """Donut chart of the largest values with the rest grouped as "Other" """
+
+    START_ANGLE = 90
+    LABEL_DISTANCE = 1.1
+    PCT_DISTANCE = 0.6
+
+    def __init__(self, frame=None, label_field="label", value_field="value",
+                 title="Distribution", colors=None, **kwargs):
+        super().__init__(frame, title, **kwargs)
+        self.label_field = label_field
+        self.value_field = value_field
+        self.colors = colors or CHART_COLORS
+        self.wedges = []
+        self.texts = []
+        self.autotexts = []
+
+    def _prepare(self, data):
+        # Sort data by value and limit to top 8 slices for readability
+        sorted_data = sorted(data, key=lambda x: x[self.value_field], reverse=True)
 
-        # Limit to top 8 slices for readability
         other_total = 0
         if len(sorted_data) > 8:
-            other_total = sum(item[value_field] for item in sorted_data[8:])
+            other_total = sum(item[self.value_field] for item in sorted_data[8:])
             sorted_data = sorted_data[:8]
 
-        labels = [item[label_field] for item in sorted_data]
-        values = [item[value_field] for item in sorted_data]
+        labels = [item[self.label_field] for item in sorted_data]
+        values = [item[self.value_field] for item in sorted_data]
 
         # Add "Other" category if needed
         if other_total > 0:
             labels.append("Other")
             values.append(other_total)
 
-        # Create figure and axis
-        fig, ax = plt.subplots(figsize=(8, 6))
+        return labels, values
 
-        # Create pie chart
-        wedges, texts, autotexts = ax.pie(
+    def _build_artists(self, data):
+        labels, values = data
+
+        wedges, texts, autotexts = self.ax.pie(
             values,
             labels=labels,
             autopct='%1.1f%%',
-            startangle=90,
-            colors=CHART_COLORS,
+            startangle=self.START_ANGLE,
+            labeldistance=self.LABEL_DISTANCE,
+            pctdistance=self.PCT_DISTANCE,
+            colors=self.colors,
             wedgeprops=dict(width=0.5)  # Make it a donut chart
         )
+        self.wedges, self.texts, self.autotexts = list(wedges), list(texts), list(autotexts)
 
         # Equal aspect ratio ensures that pie is drawn as a circle
-        ax.axis('equal')
-        ax.set_title(title)
+        self.ax.axis('equal')
 
         # Make text more readable
-        for text in texts:
+        for text in self.texts:
+            text.set_fontsize(9)
+        for text in self.autotexts:
             text.set_fontsize(9)
+            text.set_fontweight('bold')
+
+    def _update_artists(self, data):
+        labels, values = data
+        total = float(sum(values))
+        if len(values) != len(self.wedges) or total <= 0:
+            return False
+
+        # Recompute wedge angles the same way Axes.pie lays them out
+        theta1 = self.START_ANGLE
+        for wedge, text, autotext, label, value in zip(
+                self.wedges, self.texts, self.autotexts, labels, values):
+            frac = value / total
+            theta2 = theta1 + 360 * frac
+            wedge.set_theta1(theta1)
+            wedge.set_theta2(theta2)
+
+            thetam = math.radians((theta1 + theta2) / 2)
+            x, y = math.cos(thetam), math.sin(thetam)
+            text.set_position((self.LABEL_DISTANCE * x, self.LABEL_DISTANCE * y))
+            text.set_horizontalalignment('left' if x > 0 else 'right')
+            text.set_text(label)
+            autotext.set_position((self.PCT_DISTANCE * x, self.PCT_DISTANCE * y))
+            autotext.set_text(f"{frac * 100:.1f}%")
+
+            theta1 = theta2
+        return True
 
-        plt.setp(autotexts, fontsize=9, fontweight='bold')
 
-        fig.tight_layout()
+class ChartGenerator:
+    """
+    Convenience constructors kept for callers that want a one-off canvas.
+    Views that refresh their charts should hold on to the chart objects
+    instead and call update().
+    """
 
-        # Create canvas widget
-        canvas = FigureCanvasTkAgg(fig, frame)
-        canvas.draw()
+    @staticmethod
+    def create_budget_usage_chart(frame, budget_data, title="Budget Usage"):
+        """Create a horizontal bar chart of budget usage"""
+        chart = BudgetUsageChart(frame, title).update(budget_data)
+        chart.canvas.draw()
+        return chart.canvas
 
-        return canvas
\ No newline at end of file
+    @staticmethod
+    def create_monthly_spending_chart(frame, monthly_data, title="Monthly Spending"):
+        """Create a bar chart of monthly spending"""
+        chart = MonthlySpendingChart(frame, title).update(monthly_data)
+        chart.canvas.draw()
+        return chart.canvas
+
+    @staticmethod
+    def create_pie_chart(frame, data, label_field, value_field, title="Distribution"):
+        """Create a pie chart"""
+        chart = PieChart(frame, label_field, value_field, title).update(data)
+        chart.canvas.draw()
+        return chart.canvas
@@ -1,45 +1,180 @@
 # utils/exporters.py
+import contextlib
 import csv
+import gzip
+import io
 import os
+import sys
 from datetime import datetime
+from config.settings import EXPORT_BATCH_SIZE, EXPORT_BUFFER_SIZE
+
+PURCHASE_EXPORT_HEADERS = ["Order Number", "Date", "Vendor", "Invoice Number", "Total Amount", "Status"]
+
+class ExportCancelled(Exception):
+    """Raised inside open_export_file() to discard the export"""
+
+
+@contextlib.contextmanager
+def open_export_file(file_path, compress=False, binary=False):
+    """
+    Open an export file for writing, gzip-compressed if compress is set.
+    A file_path of "-" writes to standard output, which is left open.
+
+    The file is written as file_path + ".part" and renamed when the block
+    completes, so an export that fails or is cancelled (an exception,
+    e.g. ExportCancelled, leaving the block) leaves no partial file and
+    any earlier export at file_path untouched.
+    """
+    to_stdout = file_path == "-"
+    if to_stdout:
+        sys.stdout.flush()
+        raw = sys.stdout.buffer
+        target = gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6) if compress else raw
+    else:
+        partial_path = file_path + ".part"
+        raw = open(partial_path, 'wb', buffering=EXPORT_BUFFER_SIZE)
+        # The gzip header names the final file, not the .part file
+        target = gzip.GzipFile(filename=file_path, fileobj=raw, mode='wb', compresslevel=6) if compress else raw
+    output = target if binary else io.TextIOWrapper(target, encoding='utf-8', newline='')
+
+    completed = False
+    try:
+        yield output
+        completed = True
+    finally:
+        if to_stdout:
+            output.flush()
+            if not binary:
+                output.detach()
+            if compress:
+                target.close() # Writes the gzip trailer; stdout itself stays open
+            sys.stdout.buffer.flush()
+        else:
+            try:
+                output.close()
+                raw.close() # GzipFile leaves the file it wraps open
+                if completed:
+                    os.replace(partial_path, file_path)
+            finally:
+                if os.path.exists(partial_path):
+                    os.remove(partial_path)
+
 
 class CSVExporter:
     @staticmethod
     def export_purchases(purchases, file_path):
         """Export purchases to CSV file"""
+        def purchase_rows():
+            for purchase in purchases:
+                # Total and status in one pass over the line items
+                total = 0
+                received = 0
+                line_items = getattr(purchase, 'line_items', None) or []
+                for line_item in line_items:
+                    total += line_item.quantity * line_item.unit_price
+                    received += bool(line_item.received)
+
+                status = "Pending"
+                if line_items and received == len(line_items):
+                    status = "Received"
+                elif received:
+                    status = "Partial"
+
+                yield (purchase.order_number, purchase.date, purchase.vendor_name,
+                       purchase.invoice_number, total, status)
+
+        return CSVExporter.export_purchase_rows(purchase_rows(), file_path)
+
+    @staticmethod
+    def export_purchase_rows(rows, file_path, total=None, progress_callback=None, cancel_event=None,
+                             compress=None):
+        """
+        Stream purchase rows to a CSV file.
+
+        rows is an iterable of (order_number, date, vendor_name,
+        invoice_number, total, status) tuples and is consumed once, so it can
+        be a database cursor. Rows are written in batches through a large
+        buffer; the file is gzip-compressed when compress is True or, by
+        default, when the path ends in .gz, and "-" writes to standard
+        output. progress_callback(written, total) is called after each
+        batch, and setting cancel_event stops the export, leaving no partial
+        file.
+        """
+        if compress is None:
+            compress = file_path.lower().endswith(".gz")
+
         try:
-            with open(file_path, 'w', newline='') as csvfile:
-                writer = csv.writer(csvfile)
+            written = 0
+            with open_export_file(file_path, compress) as output:
+                writer = csv.writer(output)
 
                 # Write header
-                writer.writerow(["Order Number", "Date", "Vendor", "Invoice Number", "Total Amount", "Status"])
+                writer.writerow(PURCHASE_EXPORT_HEADERS)
 
                 # Write data
-                for purchase in purchases:
-                    # Calculate total for this purchase
-                    total = 0
-                    if hasattr(purchase, 'line_items') and purchase.line_items:
-                        for line_item in purchase.line_items:
-                            total += line_item.quantity * line_item.unit_price
-                    
-                    status = "Pending"
-                    if hasattr(purchase, 'line_items') and purchase.line_items:
-                        if all(item.received for item in purchase.line_items):
-                            status = "Received"
-                        elif any(item.received for item in purchase.line_items):
-                            status = "Partial"
-
-                    writer.writerow([
-                        purchase.order_number,
-                        purchase.date,
-                        purchase.vendor_name,
-                        purchase.invoice_number,
-                        f"${total:.2f}",
-                        status
-                    ])
+                batch = []
+                for order_number, date, vendor_name, invoice_number, amount, status in rows:
+                    batch.append((order_number, date, vendor_name, invoice_number, f"${amount or 0:.2f}", status))
+                    if len(batch) >= EXPORT_BATCH_SIZE:
+                        writer.writerows(batch)
+                        written += len(batch)
+                        batch = []
+                        if progress_callback:
+                            progress_callback(written, total)
+                        if cancel_event is not None and cancel_event.is_set():
+                            raise ExportCancelled()
+
+                if batch:
+                    writer.writerows(batch)
+                    written += len(batch)
+                    if progress_callback:
+                        progress_callback(written, total)
+
+            return True, f"{written} purchases exported to {file_path}"
+
+        except ExportCancelled:
+            return False, "Export cancelled."
+        except Exception as e:
+            return False, f"Export failed: {str(e)}"
 
-            return True, f"Purchases exported to {file_path}"
+    @staticmethod
+    def export_formatted_rows(batches, file_path, headers, noun="rows", total=None, progress_callback=None,
+                              cancel_event=None, compress=None):
+        """
+        Stream batches of ready-formatted rows to a CSV file.
+
+        Fast path for large exports: values are written exactly as given, and
+        each batch is rendered to text in memory and written to the file as
+        one block of UTF-8 bytes. batches is an iterable of row lists (e.g.
+        Result.partitions()); compression, progress and cancellation work as
+        in export_purchase_rows.
+        """
+        if compress is None:
+            compress = file_path.lower().endswith(".gz")
 
+        try:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            written = 0
+            with open_export_file(file_path, compress, binary=True) as output:
+                writer.writerow(headers)
+                for batch in batches:
+                    writer.writerows(batch)
+                    output.write(buffer.getvalue().encode('utf-8'))
+                    buffer.seek(0)
+                    buffer.truncate()
+                    written += len(batch)
+                    if progress_callback:
+                        progress_callback(written, total)
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise ExportCancelled()
+                # Header only, when there were no rows
+                output.write(buffer.getvalue().encode('utf-8'))
+
+            return True, f"{written} {noun} exported to {file_path}"
+
+        except ExportCancelled:
+            return False, "Export cancelled."
         except Exception as e:
             return False, f"Export failed: {str(e)}"
 
@@ -47,7 +182,7 @@ class CSVExporter:
     def export_vendors(vendors, file_path):
         """Export vendors to CSV file"""
         try:
-            with open(file_path, 'w', newline='') as csvfile:
+            with open_export_file(file_path) as csvfile:
                 writer = csv.writer(csvfile)
 
                 # Write header
@@ -72,7 +207,7 @@ class CSVExporter:
     def export_budget_report(budget_data, monthly_data, year, file_path):
         """Export budget report to CSV"""
         try:
-            with open(file_path, 'w', newline='') as csvfile:
+            with open_export_file(file_path) as csvfile:
                 writer = csv.writer(csvfile)
 
                 # Write header
@@ -128,7 +263,7 @@ class CSVExporter:
     def export_vendor_report(vendor_data, year, file_path):
         """Export vendor report to CSV"""
         try:
-            with open(file_path, 'w', newline='') as csvfile:
+            with open_export_file(file_path) as csvfile:
                 writer = csv.writer(csvfile)
 
                 # Write header
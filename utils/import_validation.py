@@ -0,0 +1,321 @@
+# utils/import_validation.py
+import os
+from datetime import datetime
+import numpy as np
+from sqlalchemy import select
+from database.models import Purchase, Vendor, Budget
+from utils.importers import (DateParser, ImportErrorReport, detect_file_format, read_headers, read_records,
+                             sample_date_formats)
+
+# Number of rows checked together in one set of column operations
+VALIDATION_CHUNK_SIZE = 50000
+
+# Names listed in the summary for unknown budget codes and new vendors
+SUMMARY_SAMPLE_SIZE = 10
+
+
+def parse_numbers(values, default):
+    """
+    Convert a column of strings to floats, using default for empty strings.
+
+    Returns (numbers, invalid) arrays; invalid marks values that are not
+    numbers (their number is NaN). Columns without bad values are converted
+    in a single astype call.
+    """
+    column = np.array(values, dtype=object)
+    column[column == ""] = default
+    try:
+        return column.astype(float), np.zeros(len(column), dtype=bool)
+    except (ValueError, TypeError):
+        pass
+
+    # Only columns with bad values fall back to converting value by value
+    numbers = np.empty(len(column))
+    invalid = np.zeros(len(column), dtype=bool)
+    for i, value in enumerate(column):
+        try:
+            numbers[i] = float(value)
+        except (ValueError, TypeError):
+            numbers[i] = np.nan
+            invalid[i] = True
+    return numbers, invalid
+
+
+class ImportValidator:
+    """
+    Dry run of a purchase import: reports what importing a file would do
+    without writing to the database.
+
+    The file is checked in chunks of rows, one column at a time: numbers
+    are parsed and range checked with numpy, dates are parsed once per
+    distinct value, and order numbers, vendors and budget codes are
+    checked against sets fetched with one query each. The rules are the
+    importer's, so the summary predicts the import's outcome. Per-row
+    problems go to an error report CSV in the importer's format.
+    """
+
+    def __init__(self, db_manager, chunk_size=VALIDATION_CHUNK_SIZE, error_report_path=None):
+        self.db_manager = db_manager
+        self.chunk_size = chunk_size
+        self.error_report_path = error_report_path
+        self.summary = {}
+
+    def validate(self, file_path):
+        """Check a CSV or JSON Lines file. Returns (success, message)"""
+        file_format = detect_file_format(file_path)
+        base_path = os.path.splitext(file_path)[0]
+        report_path = self.error_report_path or f"{base_path}_dry_run_errors.csv"
+        report = ImportErrorReport(report_path)
+        self.summary = {
+            "rows": 0, "unreadable_rows": 0, "missing_fields": 0, "bad_dates": 0, "invalid_items": 0,
+            "invalid_amounts": 0, "unknown_budget_codes": 0, "vendor_conflicts": 0,
+            "orders": 0, "existing_orders": 0, "split_orders": 0, "line_items": 0, "allocations": 0,
+            "new_vendors": 0, "errors": 0, "warnings": 0,
+        }
+        self._orders = {} # order_number -> (vendor, date, skipped) of its first row
+        self._last_order = None
+        self._new_vendors = []
+        self._unknown_codes = {}
+
+        try:
+            headers, error = read_headers(file_path, file_format)
+            if error:
+                return False, error
+            self._columns = {name: i for i, name in enumerate(headers)}
+            self._date_parser = DateParser(sample_date_formats(file_path, file_format, headers))
+            self._today = datetime.now().strftime("%Y-%m-%d")
+
+            # One query per lookup instead of one per row
+            session = self.db_manager.Session()
+            try:
+                self._existing_orders = set(session.execute(select(Purchase.order_number)).scalars())
+                self._vendors = set(session.execute(select(Vendor.name)).scalars())
+                self._budget_codes = set(session.execute(select(Budget.code)).scalars())
+            finally:
+                session.close()
+
+            batch = []
+            for row_num, values, _ in read_records(file_path, file_format):
+                batch.append((row_num, values))
+                if len(batch) >= self.chunk_size:
+                    report.extend(self._check_chunk(batch))
+                    batch = []
+            if batch:
+                report.extend(self._check_chunk(batch))
+
+            self.summary["errors"] = report.errors
+            self.summary["warnings"] = report.warnings
+            self.summary["new_vendors"] = len(self._new_vendors)
+            self.summary["error_report"] = report_path if report.written else None
+            message = self._format_summary(file_path)
+
+            summary_path = f"{base_path}_dry_run.txt"
+            with open(summary_path, 'w', encoding='utf-8') as f:
+                f.write(message + "\n")
+            self.summary["summary_path"] = summary_path
+            return True, message
+
+        except FileNotFoundError:
+            return False, f"Validation failed: File not found at {file_path}"
+        except Exception as e:
+            print(f"Validation error: {str(e)}")
+            return False, f"Validation failed: {str(e)}"
+        finally:
+            report.close()
+
+    def _table(self, rows):
+        """Stack the rows' values into a 2-D array of stripped strings, one column per header"""
+        width = len(self._columns)
+        padded = [values if len(values) == width else (values + [""] * width)[:width] for _, values in rows]
+        return np.char.strip(np.array(padded, dtype=str).reshape(len(rows), width))
+
+    def _column(self, table, name):
+        index = self._columns.get(name)
+        if index is None:
+            return np.full(len(table), "", dtype=str)
+        return table[:, index]
+
+    def _check_chunk(self, batch):
+        """Validate a chunk of (row_num, values) records and return its issues in row order"""
+        summary = self.summary
+        summary["rows"] += len(batch)
+        issues = []
+
+        rows = [record for record in batch if record[1] is not None]
+        for row_num, values in batch:
+            if values is None:
+                issues.append((row_num, "", "error", "Record could not be read (not a JSON object)."))
+        summary["unreadable_rows"] += len(batch) - len(rows)
+
+        row_nums = np.array([row_num for row_num, _ in rows], dtype=np.int64)
+        table = self._table(rows)
+        orders = self._column(table, 'order number')
+        vendors = self._column(table, 'vendor')
+        dates = self._column(table, 'date')
+
+        # Rows without the required fields are dropped by the import
+        missing = (orders == "") | (vendors == "") | (dates == "")
+        summary["missing_fields"] += int(missing.sum())
+        for i in np.flatnonzero(missing):
+            issues.append((int(row_nums[i]), orders[i], "error",
+                           "Missing required fields (Order Number, Vendor, or Date)."))
+
+        keep = ~missing
+        row_nums, table = row_nums[keep], table[keep]
+        orders, vendors, dates = orders[keep], vendors[keep], dates[keep]
+        if not len(table):
+            return sorted(issues, key=lambda issue: issue[0])
+
+        # Dates: parse each distinct value once
+        distinct_dates, date_inverse = np.unique(dates, return_inverse=True)
+        parsed = np.array([self._date_parser.parse(d) for d in distinct_dates], dtype=object)
+        unparsed = np.array([value is None for value in parsed], dtype=bool)
+        parsed[unparsed] = self._today
+        parsed_dates = parsed[date_inverse]
+        bad_date = unparsed[date_inverse]
+        summary["bad_dates"] += int(bad_date.sum())
+        for i in np.flatnonzero(bad_date):
+            issues.append((int(row_nums[i]), orders[i], "warning",
+                           f"Could not parse date '{dates[i]}'. Using today's date."))
+
+        # Line items: quantity must be a positive whole number, unit price non-negative
+        has_item = self._column(table, 'description') != ""
+        quantities, bad_quantity = parse_numbers(self._column(table, 'quantity'), '1')
+        prices, bad_price = parse_numbers(self._column(table, 'unit price'), '0.0')
+        with np.errstate(invalid='ignore'):
+            bad_quantity |= ~np.isfinite(quantities) | (np.trunc(quantities) <= 0)
+            invalid_item = has_item & (bad_quantity | bad_price | (prices < 0))
+        summary["invalid_items"] += int(invalid_item.sum())
+        for i in np.flatnonzero(invalid_item):
+            issues.append((int(row_nums[i]), orders[i], "warning",
+                           "Invalid quantity or price. Using defaults (1, 0.0)."))
+
+        # Budget allocations: amount must be a positive number
+        codes = self._column(table, 'budget code')
+        amount_text = self._column(table, 'amount')
+        amounts, bad_amount = parse_numbers(amount_text, '0.0')
+        has_code = codes != ""
+        with np.errstate(invalid='ignore'):
+            not_number = has_code & bad_amount
+            not_positive = has_code & ~bad_amount & (amounts <= 0)
+        allocation = has_code & ~not_number & ~not_positive
+        summary["invalid_amounts"] += int(not_number.sum() + not_positive.sum())
+        for i in np.flatnonzero(not_number):
+            issues.append((int(row_nums[i]), orders[i], "warning",
+                           f"Invalid budget amount '{amount_text[i]}'. Skipping budget allocation."))
+        for i in np.flatnonzero(not_positive):
+            issues.append((int(row_nums[i]), orders[i], "warning",
+                           f"Budget amount '{amount_text[i]}' is invalid or zero. Skipping budget allocation."))
+
+        # Orders: rows with the same order number become one purchase, whose
+        # vendor and date come from its first row
+        distinct_orders, first_index, order_inverse = np.unique(orders, return_index=True, return_inverse=True)
+        seen = np.array([order_number in self._orders for order_number in distinct_orders.tolist()], dtype=bool)
+        first_vendor = vendors[first_index].astype(object)
+        first_date = parsed_dates[first_index]
+        skipped_order = np.array([order_number in self._existing_orders for order_number in distinct_orders.tolist()],
+                                 dtype=bool)
+        for k in np.flatnonzero(seen):
+            first_vendor[k], first_date[k], _ = self._orders[distinct_orders[k]]
+
+        new = ~seen
+        self._orders.update(zip(distinct_orders[new].tolist(),
+                                zip(first_vendor[new], first_date[new], skipped_order[new])))
+        summary["orders"] += int((new & ~skipped_order).sum())
+        summary["existing_orders"] += int((new & skipped_order).sum())
+        for k in np.flatnonzero(new & skipped_order):
+            issues.append((int(row_nums[first_index[k]]), distinct_orders[k], "skipped",
+                           f"Order Number '{distinct_orders[k]}' already exists."))
+
+        # New vendors, in the order their first purchase appears
+        for k in sorted(np.flatnonzero(new & ~skipped_order), key=lambda k: first_index[k]):
+            if first_vendor[k] not in self._vendors:
+                self._vendors.add(first_vendor[k])
+                self._new_vendors.append(first_vendor[k])
+
+        skipped = skipped_order[order_inverse]
+        imported = ~skipped
+
+        # Rows of an order must agree on vendor and date (the first row wins)
+        conflict = imported & ((vendors.astype(object) != first_vendor[order_inverse]) |
+                               (parsed_dates != first_date[order_inverse]))
+        summary["vendor_conflicts"] += int(conflict.sum())
+        for i in np.flatnonzero(conflict):
+            k = order_inverse[i]
+            issues.append((int(row_nums[i]), orders[i], "warning",
+                           f"Vendor or date differs from the order's first row. "
+                           f"Using '{first_vendor[k]}' and {first_date[k]}."))
+
+        # Order numbers that reappear after other orders (the import sorts the
+        # file first): a run of rows is split off when its order number was
+        # seen in an earlier chunk or starts an earlier run in this one
+        starts = np.flatnonzero(np.concatenate(([True], orders[1:] != orders[:-1])))
+        split = np.ones(len(starts), dtype=bool)
+        _, first_run = np.unique(orders[starts], return_index=True) # one per distinct order
+        split[first_run] = seen
+        if orders[0] == self._last_order:
+            split[0] = False # Continues the run that ended the previous chunk
+        self._last_order = orders[-1]
+        summary["split_orders"] += int(split.sum())
+        for i in starts[split]:
+            issues.append((int(row_nums[i]), orders[i], "notice",
+                           "Order Number also appears earlier in the file; its rows are merged into one purchase."))
+
+        # Budget codes: check each distinct code once
+        codes_to_check = allocation & imported
+        distinct_codes, code_inverse = np.unique(codes[codes_to_check], return_inverse=True)
+        known = np.array([code in self._budget_codes for code in distinct_codes.tolist()], dtype=bool)
+        unknown = np.zeros(len(table), dtype=bool)
+        unknown[codes_to_check] = ~known[code_inverse]
+        summary["unknown_budget_codes"] += int(unknown.sum())
+        for i in np.flatnonzero(unknown):
+            self._unknown_codes[codes[i]] = self._unknown_codes.get(codes[i], 0) + 1
+            issues.append((int(row_nums[i]), orders[i], "warning",
+                           f"Budget code '{codes[i]}' not found. Skipping budget allocation."))
+
+        summary["line_items"] += int((has_item & imported).sum())
+        summary["allocations"] += int((codes_to_check & ~unknown).sum())
+
+        # Stable sort keeps each row's issues in check order
+        return sorted(issues, key=lambda issue: issue[0])
+
+    def _format_summary(self, file_path):
+        s = self.summary
+        lines = [
+            f"Dry run of {os.path.basename(file_path)}: {s['rows']:,} rows checked. "
+            f"Nothing was written to the database.",
+            "",
+            f"Would import {s['orders']:,} purchases ({s['line_items']:,} line items, "
+            f"{s['allocations']:,} budget allocations).",
+        ]
+        if s["existing_orders"]:
+            lines.append(f"{s['existing_orders']:,} orders already exist and would be skipped.")
+        if s["new_vendors"]:
+            names = ", ".join(self._new_vendors[:SUMMARY_SAMPLE_SIZE])
+            more = f" and {s['new_vendors'] - SUMMARY_SAMPLE_SIZE:,} more" if s["new_vendors"] > SUMMARY_SAMPLE_SIZE else ""
+            lines.append(f"{s['new_vendors']:,} new vendors would be created: {names}{more}.")
+        if s["split_orders"]:
+            lines.append(f"{s['split_orders']:,} groups of rows reuse an order number from earlier in the file; "
+                         f"they would be merged into that order.")
+
+        problems = [
+            ("rows missing required fields", s["missing_fields"] + s["unreadable_rows"]),
+            ("unparseable dates (today's date would be used)", s["bad_dates"]),
+            ("invalid quantities or prices", s["invalid_items"]),
+            ("invalid budget amounts", s["invalid_amounts"]),
+            ("allocations with unknown budget codes", s["unknown_budget_codes"]),
+            ("rows whose vendor or date differs from their order", s["vendor_conflicts"]),
+        ]
+        problems = [(label, count) for label, count in problems if count]
+        if problems:
+            lines += ["", "Problems found:"]
+            lines += [f"  {count:,} {label}" for label, count in problems]
+            if self._unknown_codes:
+                codes = sorted(self._unknown_codes, key=lambda code: -self._unknown_codes[code])
+                lines.append(f"  Unknown budget codes: {', '.join(codes[:SUMMARY_SAMPLE_SIZE])}")
+        else:
+            lines += ["", "No problems found."]
+
+        if s.get("error_report"):
+            lines += ["", f"See {s['error_report']} for the row details."]
+        return "\n".join(lines)
@@ -1,130 +1,207 @@
 # utils/pdf_exporter.py
+import multiprocessing
+import os
+import queue
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.platypus import SimpleDocTemplate, Table, LongTable, TableStyle, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet
 from datetime import datetime
+from config.settings import PDF_PAGED_ROWS, PDF_PAGE_SUBTOTALS
+
+# Row heights of paged tables; fixed heights spare reportlab from measuring every cell
+PAGED_HEADER_HEIGHT = 20
+PAGED_ROW_HEIGHT = 16
+
+
+def _table_style(compact=False, total_rows=1):
+    """Report table style: grey header row, bold total row(s) at the bottom"""
+    header_size, header_padding = (10, 4) if compact else (12, 12)
+    body_size, body_padding = (9, 3) if compact else (10, 8)
+    commands = [
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), header_size),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), header_padding),
+        ('GRID', (0, 0), (-1, -1), 1 if not compact else 0.5, colors.black),
+        ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('FONTSIZE', (0, 1), (-1, -1), body_size),
+        ('BOTTOMPADDING', (0, 1), (-1, -1), body_padding),
+        ('TOPPADDING', (0, 1), (-1, -1), body_padding),
+    ]
+    if total_rows:
+        commands += [
+            ('BACKGROUND', (0, -total_rows), (-1, -1), colors.lightgrey),
+            ('FONTNAME', (0, -total_rows), (-1, -1), 'Helvetica-Bold'),
+        ]
+    return TableStyle(commands)
+
+
+# Built once and shared by every table
+TABLE_STYLE = _table_style()
+PAGED_STYLES = {total_rows: _table_style(compact=True, total_rows=total_rows) for total_rows in (0, 1, 2)}
+
+
+class _ProgressDocTemplate(SimpleDocTemplate):
+    """SimpleDocTemplate that reports each finished page"""
+
+    def __init__(self, *args, page_callback=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.page_callback = page_callback
+
+    def afterPage(self):
+        if self.page_callback:
+            self.page_callback(self.page)
 
 
 class PDFExporter:
     @staticmethod
-    def export_budget_report(budget_data, monthly_data, year, file_path):
-        """Export budget report to PDF file"""
-        try:
-            doc = SimpleDocTemplate(file_path, pagesize=letter)
-            styles = getSampleStyleSheet()
-            elements = []
+    def _report_header(elements, styles, title, heading):
+        """Title, generation date and section heading shared by the reports"""
+        elements.append(Paragraph(title, styles["Heading1"]))
+        elements.append(Spacer(1, 12))
 
-            # Title
-            title_style = styles["Heading1"]
-            elements.append(Paragraph(f"Budget Report - Fiscal Year {year}", title_style))
-            elements.append(Spacer(1, 12))
+        current_date = datetime.now().strftime("%B %d, %Y")
+        elements.append(Paragraph(f"Generated on: {current_date}", styles["Normal"]))
+        elements.append(Spacer(1, 24))
 
-            # Current date
-            date_style = styles["Normal"]
-            current_date = datetime.now().strftime("%B %d, %Y")
-            elements.append(Paragraph(f"Generated on: {current_date}", date_style))
-            elements.append(Spacer(1, 24))
+        elements.append(Paragraph(heading, styles["Heading2"]))
+        elements.append(Spacer(1, 12))
 
-            # Budget Summary
-            elements.append(Paragraph("Budget Summary", styles["Heading2"]))
-            elements.append(Spacer(1, 12))
+    @staticmethod
+    def _used_height(elements, doc):
+        """Height the flowables take up on the page"""
+        height = 0
+        for element in elements:
+            height += element.wrap(doc.width, doc.height)[1] + element.getSpaceBefore() + element.getSpaceAfter()
+        return height
+
+    @staticmethod
+    def _add_table(elements, doc, headers, records, format_row, total_row, col_widths, paged=None,
+                   subtotals=None):
+        """
+        Add a report table of records with a TOTAL row.
+
+        Small tables are one Table. Large ones (paged, by default when there
+        are more than PDF_PAGED_ROWS records) are cut into one LongTable per
+        page with fixed row heights, a repeated header and, with subtotals,
+        a "Page subtotal" row on every page, so reportlab never has to lay
+        out and re-split one huge table. Returns the number of pages the
+        table spans (1 for an unpaged table).
+        """
+        if paged is None:
+            paged = len(records) > PDF_PAGED_ROWS
+        if not paged:
+            table_data = [headers] + [format_row(record) for record in records] + [total_row(records, "TOTAL")]
+            table = Table(table_data, colWidths=col_widths)
+            table.setStyle(TABLE_STYLE)
+            elements.append(table)
+            return 1
+
+        if subtotals is None:
+            subtotals = PDF_PAGE_SUBTOTALS
+        # The frame is padded by 6pt on each side; keep a point spare for rounding
+        page_height = doc.height - 13
+        first_height = page_height - PDFExporter._used_height(elements, doc)
+        extra_rows = 1 if subtotals else 0
+
+        def rows_fitting(height):
+            return max(1, int((height - PAGED_HEADER_HEIGHT) // PAGED_ROW_HEIGHT) - extra_rows)
+
+        start = 0
+        size = rows_fitting(first_height)
+        pages = 0
+        while True:
+            if len(records) - start == size and size > 1:
+                # A full last page has no room for the TOTAL row; move a row to a page of its own
+                size -= 1
+            chunk = records[start:start + size]
+            start += size
+            last = start >= len(records)
+            table_data = [headers] + [format_row(record) for record in chunk]
+            if subtotals:
+                table_data.append(total_row(chunk, "Page subtotal"))
+            if last:
+                table_data.append(total_row(records, "TOTAL"))
+
+            table = LongTable(table_data, colWidths=col_widths, repeatRows=1,
+                              rowHeights=[PAGED_HEADER_HEIGHT] + [PAGED_ROW_HEIGHT] * (len(table_data) - 1))
+            table.setStyle(PAGED_STYLES[extra_rows + last])
+            elements.append(table)
+            pages += 1
+            if last:
+                return pages
+            size = rows_fitting(page_height)
+
+    @staticmethod
+    def _build(doc, elements, pages, progress_callback):
+        """Build the PDF, reporting progress against the expected number of pages"""
+        def page_done(page):
+            progress_callback(min(page / pages, 1.0), f"Rendered page {page:,} of about {pages:,}")
+
+        doc.page_callback = page_done if progress_callback else None
+        doc.build(elements)
 
-            # Prepare data for budget summary table
-            budget_table_data = [["Budget", "Amount", "Spent", "Remaining", "Percent Used"]]
+    @staticmethod
+    def export_budget_report(budget_data, monthly_data, year, file_path, paged=None, subtotals=None,
+                             progress_callback=None):
+        """
+        Export budget report to PDF file
 
-            total_budget = 0
-            total_spent = 0
+        progress_callback(fraction, message) is called after every page.
+        """
+        try:
+            doc = _ProgressDocTemplate(file_path, pagesize=letter)
+            styles = getSampleStyleSheet()
+            elements = []
+            PDFExporter._report_header(elements, styles, f"Budget Report - Fiscal Year {year}", "Budget Summary")
 
-            for data in budget_data:
-                budget_table_data.append([
+            def budget_row(data):
+                return [
                     data["name"],
                     f"${data['amount']:,.2f}",
                     f"${data['spent']:,.2f}",
                     f"${data['remaining']:,.2f}",
                     f"{data['percent']:.1f}%"
-                ])
-                total_budget += data["amount"]
-                total_spent += data["spent"]
-
-            # Add total row
-            total_remaining = total_budget - total_spent
-            total_percent = (total_spent / total_budget * 100) if total_budget > 0 else 0
-
-            budget_table_data.append([
-                "TOTAL",
-                f"${total_budget:,.2f}",
-                f"${total_spent:,.2f}",
-                f"${total_remaining:,.2f}",
-                f"{total_percent:.1f}%"
-            ])
-
-            # Create budget summary table
-            budget_table = Table(budget_table_data, colWidths=[200, 80, 80, 80, 80])
-            budget_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 12),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
-                ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('FONTSIZE', (0, 1), (-1, -1), 10),
-                ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
-                ('TOPPADDING', (0, 1), (-1, -1), 8),
-            ]))
-
-            elements.append(budget_table)
+                ]
+
+            def budget_total(rows, label):
+                total_budget = sum(data["amount"] for data in rows)
+                total_spent = sum(data["spent"] for data in rows)
+                total_remaining = total_budget - total_spent
+                total_percent = (total_spent / total_budget * 100) if total_budget > 0 else 0
+                return [
+                    label,
+                    f"${total_budget:,.2f}",
+                    f"${total_spent:,.2f}",
+                    f"${total_remaining:,.2f}",
+                    f"{total_percent:.1f}%"
+                ]
+
+            pages = PDFExporter._add_table(elements, doc, ["Budget", "Amount", "Spent", "Remaining", "Percent Used"],
+                                           budget_data, budget_row, budget_total, [200, 80, 80, 80, 80],
+                                           paged, subtotals)
             elements.append(Spacer(1, 24))
 
             # Monthly Breakdown
             elements.append(Paragraph("Monthly Spending Breakdown", styles["Heading2"]))
             elements.append(Spacer(1, 12))
 
-            # Prepare data for monthly table
-            monthly_table_data = [["Month", "Amount"]]
-            monthly_total = 0
-
-            for data in monthly_data:
-                monthly_table_data.append([
-                    data["month"],
-                    f"${data['amount']:,.2f}"
-                ])
-                monthly_total += data["amount"]
-
-            # Add total row
-            monthly_table_data.append([
-                "TOTAL",
-                f"${monthly_total:,.2f}"
-            ])
-
-            # Create monthly breakdown table
-            monthly_table = Table(monthly_table_data, colWidths=[200, 100])
-            monthly_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 12),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
-                ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('FONTSIZE', (0, 1), (-1, -1), 10),
-                ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
-                ('TOPPADDING', (0, 1), (-1, -1), 8),
-            ]))
-
-            elements.append(monthly_table)
+            def month_row(data):
+                return [data["month"], f"${data['amount']:,.2f}"]
+
+            def month_total(rows, label):
+                return [label, f"${sum(data['amount'] for data in rows):,.2f}"]
+
+            # Twelve months always fit on one page
+            PDFExporter._add_table(elements, doc, ["Month", "Amount"], monthly_data, month_row, month_total,
+                                   [200, 100], paged=False)
 
             # Build the PDF
-            doc.build(elements)
+            PDFExporter._build(doc, elements, pages + 1, progress_callback)
 
             return True, "Report exported successfully to PDF"
 
@@ -132,77 +209,96 @@ class PDFExporter:
             return False, f"Export failed: {str(e)}"
 
     @staticmethod
-    def export_vendor_report(vendor_data, year, file_path):
-        """Export vendor report to PDF file"""
+    def export_vendor_report(vendor_data, year, file_path, paged=None, subtotals=None, progress_callback=None):
+        """
+        Export vendor report to PDF file
+
+        progress_callback(fraction, message) is called after every page.
+        """
         try:
-            doc = SimpleDocTemplate(file_path, pagesize=letter)
+            doc = _ProgressDocTemplate(file_path, pagesize=letter)
             styles = getSampleStyleSheet()
             elements = []
+            PDFExporter._report_header(elements, styles, f"Vendor Spending Report - Year {year}",
+                                       "Vendor Spending Summary")
 
-            # Title
-            title_style = styles["Heading1"]
-            elements.append(Paragraph(f"Vendor Spending Report - Year {year}", title_style))
-            elements.append(Spacer(1, 12))
-
-            # Current date
-            date_style = styles["Normal"]
-            current_date = datetime.now().strftime("%B %d, %Y")
-            elements.append(Paragraph(f"Generated on: {current_date}", date_style))
-            elements.append(Spacer(1, 24))
-
-            # Vendor Spending
-            elements.append(Paragraph("Vendor Spending Summary", styles["Heading2"]))
-            elements.append(Spacer(1, 12))
-
-            # Prepare data for vendor table
-            vendor_table_data = [["Vendor", "Total Spent", "Number of Orders", "Avg Order Value"]]
-            total_spent = 0
-            total_orders = 0
-
-            for data in vendor_data:
-                vendor_table_data.append([
+            def vendor_row(data):
+                return [
                     data["name"],
                     f"${data['total_spent']:,.2f}",
                     str(data["purchase_count"]),
                     f"${data['avg_order']:,.2f}"
-                ])
-                total_spent += data["total_spent"]
-                total_orders += data["purchase_count"]
-
-            # Add total row
-            avg_order = total_spent / total_orders if total_orders > 0 else 0
-            vendor_table_data.append([
-                "TOTAL",
-                f"${total_spent:,.2f}",
-                str(total_orders),
-                f"${avg_order:,.2f}"
-            ])
-
-            # Create vendor table
-            vendor_table = Table(vendor_table_data, colWidths=[200, 100, 100, 100])
-            vendor_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 12),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
-                ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('FONTSIZE', (0, 1), (-1, -1), 10),
-                ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
-                ('TOPPADDING', (0, 1), (-1, -1), 8),
-            ]))
-
-            elements.append(vendor_table)
+                ]
+
+            def vendor_total(rows, label):
+                total_spent = sum(data["total_spent"] for data in rows)
+                total_orders = sum(data["purchase_count"] for data in rows)
+                avg_order = total_spent / total_orders if total_orders > 0 else 0
+                return [label, f"${total_spent:,.2f}", str(total_orders), f"${avg_order:,.2f}"]
+
+            pages = PDFExporter._add_table(elements, doc, ["Vendor", "Total Spent", "Number of Orders",
+                                                           "Avg Order Value"],
+                                           vendor_data, vendor_row, vendor_total, [200, 100, 100, 100],
+                                           paged, subtotals)
 
             # Build the PDF
-            doc.build(elements)
+            PDFExporter._build(doc, elements, pages, progress_callback)
 
             return True, "Vendor report exported successfully to PDF"
 
         except Exception as e:
-            return False, f"Export failed: {str(e)}"
\ No newline at end of file
+            return False, f"Export failed: {str(e)}"
+
+
+def _export_worker(method_name, args, kwargs, messages):
+    """Child process: run one PDFExporter export, sending progress and the result back"""
+    def progress(fraction, message):
+        messages.put(("progress", fraction, message))
+
+    try:
+        result = getattr(PDFExporter, method_name)(*args, progress_callback=progress, **kwargs)
+    except Exception as e:
+        result = (False, f"Export failed: {str(e)}")
+    messages.put(("done",) + tuple(result))
+
+
+def export_in_process(method_name, *args, file_path, progress_callback=None, cancel_event=None, poll_seconds=0.1,
+                      **kwargs):
+    """
+    Run PDFExporter.<method_name>(*args, file_path=file_path, **kwargs) in a
+    separate process and return its (success, message).
+
+    Laying out a large report is CPU bound; in its own process it neither
+    holds the GIL against the UI nor keeps reportlab's memory afterwards.
+    progress_callback(fraction, message) is called in this process as the
+    child reports pages. Setting cancel_event stops the child and removes
+    the partial file. Call this from a worker thread, not the Tk thread.
+    """
+    # Spawn rather than fork: the parent runs Tk and other threads
+    context = multiprocessing.get_context("spawn")
+    messages = context.Queue()
+    process = context.Process(target=_export_worker, daemon=True,
+                              args=(method_name, args, dict(kwargs, file_path=file_path), messages))
+    process.start()
+    try:
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                process.terminate()
+                process.join()
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+                return False, "Export cancelled."
+            try:
+                message = messages.get(timeout=poll_seconds)
+            except queue.Empty:
+                if not process.is_alive() and messages.empty():
+                    return False, f"Export failed: the report process stopped (exit code {process.exitcode})"
+                continue
+            if message[0] == "done":
+                return message[1], message[2]
+            if progress_callback:
+                progress_callback(message[1], message[2])
+    finally:
+        process.join(timeout=5)
+        if process.is_alive():
+            process.terminate()
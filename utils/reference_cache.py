@@ -0,0 +1,41 @@
+# utils/reference_cache.py
+import threading
+
+
+class ReferenceCache:
+    """
+    In-memory copy of a small lookup table (vendors, budgets) for forms and
+    name/code lookups.
+
+    load() builds the data from the database; it runs again only when the
+    version of the cache's scope has changed since (see
+    DatabaseManager.cache_version, which also counts commits by other
+    programs), so a warm cache answers without a query. Unlike ReportCache the data is shared, not copied: load() should
+    return tuples and dicts that callers treat as read-only.
+    """
+
+    def __init__(self, db_manager, scope, load):
+        self.db_manager = db_manager
+        self.scope = scope
+        self._load = load
+        self._version = None
+        self._data = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Return the data, reloading it if the scope changed since it was loaded"""
+        # Read the version first: a commit during load() leaves the entry stale for the next call
+        version = self.db_manager.cache_version(self.scope)
+        with self._lock:
+            if self._version == version:
+                return self._data
+
+        data = self._load()
+        with self._lock:
+            self._version, self._data = version, data
+        return data
+
+    def clear(self):
+        """Forget the data so the next get() reloads it"""
+        with self._lock:
+            self._version = self._data = None
@@ -0,0 +1,68 @@
+# utils/report_cache.py
+import copy
+import threading
+from collections import OrderedDict
+
+
+class ReportCache:
+    """
+    LRU cache for computed report data.
+
+    Entries are stored with the data version stamp they were computed
+    under (see DatabaseManager.get_data_version). A lookup only hits when
+    the stamp is unchanged, so any commit touching the report's year
+    invalidates it without clearing unrelated entries.
+    """
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(report_type, year=None, **params):
+        """Build a cache key from the report type, year and extra parameters"""
+        return (report_type, year, tuple(sorted(params.items())))
+
+    def get_or_compute(self, key, version, compute):
+        """
+        Return the cached result for key if it was computed under version,
+        otherwise call compute() and cache its result.
+
+        Callers get a copy, so mutating a result does not alter the cache.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(entry[1])
+            self.misses += 1
+
+        # Compute outside the lock so slow reports don't block other lookups
+        result = compute()
+
+        with self._lock:
+            self._entries[key] = (version, copy.deepcopy(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result
+
+    def clear(self):
+        """Drop all cached results"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        """Return cache statistics"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups * 100) if lookups else 0.0,
+            }
@@ -0,0 +1,379 @@
+# utils/snapshot.py
+import json
+import os
+from datetime import datetime
+import numpy as np
+from sqlalchemy import select
+from database.models import Purchase, LineItem, PurchaseBudget, Vendor, Budget, YearlyBudgetAmount
+
+# Rows fetched from the database and converted to arrays at a time
+SNAPSHOT_CHUNK_SIZE = 50000
+
+SNAPSHOT_VERSION = 1
+
+# Snapshot formats; parquet and arrow need pyarrow and write one file per table into a directory
+SNAPSHOT_FORMATS = ("npz", "parquet", "arrow")
+
+# Column kinds:
+#   str       UTF-8 text, stored as a byte buffer plus offsets (NULL becomes "")
+#   category  dictionary encoded text: int32 codes into a list of categories (NULL is -1)
+#   float     float64 (NULL is NaN)
+#   int       int64 (NULL is 0)
+#   bool      bool (NULL is False)
+#   date      datetime64[D] (NULL or unparseable is NaT)
+#   ref       int32 row number in another table of the snapshot (-1 if missing)
+# A table's "key" column (its id) is stored as str and used to resolve refs to it.
+SNAPSHOT_TABLES = [
+    ("vendors", "id", [
+        ("id", "str", Vendor.id),
+        ("name", "str", Vendor.name),
+        ("contact", "str", Vendor.contact),
+        ("phone", "str", Vendor.phone),
+        ("email", "str", Vendor.email),
+        ("address", "str", Vendor.address),
+    ]),
+    ("budgets", "id", [
+        ("id", "str", Budget.id),
+        ("code", "str", Budget.code),
+        ("name", "str", Budget.name),
+        ("description", "str", Budget.description),
+    ]),
+    ("budget_amounts", None, [
+        ("budget_row", ("ref", "budgets"), YearlyBudgetAmount.budget_id),
+        ("year", "category", YearlyBudgetAmount.year),
+        ("amount", "float", YearlyBudgetAmount.amount),
+    ]),
+    ("purchases", "id", [
+        ("id", "str", Purchase.id),
+        ("order_number", "str", Purchase.order_number),
+        ("invoice_number", "str", Purchase.invoice_number),
+        ("date", "date", Purchase.date),
+        ("vendor_row", ("ref", "vendors"), Purchase.vendor_id),
+        ("vendor_name", "category", Purchase.vendor_name),
+        ("status", "category", Purchase.status),
+        ("approver", "category", Purchase.approver),
+        ("approval_date", "date", Purchase.approval_date),
+        ("notes", "str", Purchase.notes),
+    ]),
+    ("line_items", None, [
+        ("purchase_row", ("ref", "purchases"), LineItem.purchase_id),
+        ("description", "category", LineItem.description),
+        ("quantity", "int", LineItem.quantity),
+        ("unit_price", "float", LineItem.unit_price),
+        ("amount", "float", LineItem.quantity * LineItem.unit_price),
+        ("received", "bool", LineItem.received),
+    ]),
+    ("allocations", None, [
+        ("purchase_row", ("ref", "purchases"), PurchaseBudget.purchase_id),
+        ("budget_row", ("ref", "budgets"), PurchaseBudget.budget_id),
+        ("amount", "float", PurchaseBudget.amount),
+    ]),
+]
+
+
+def detect_snapshot_format(path):
+    """Guess the snapshot format from a path: .parquet / .arrow directories, otherwise npz"""
+    extension = os.path.splitext(path.rstrip("/\\"))[1].lower()
+    return {".parquet": "parquet", ".arrow": "arrow"}.get(extension, "npz")
+
+
+def encode_strings(values):
+    """Encode a list of strings (None as "") to a UTF-8 byte buffer and per-value lengths"""
+    encoded = [value.encode("utf-8") if value is not None else b"" for value in values]
+    data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+    return data, lengths
+
+
+def decode_strings(data, offsets):
+    """Decode a byte buffer and offsets back to an object array of str"""
+    raw = data.tobytes()
+    text = raw.decode("utf-8")
+    starts, ends = offsets[:-1].tolist(), offsets[1:].tolist()
+    if len(text) != len(raw):
+        # Non-ASCII text: offsets are byte offsets, so decode value by value
+        values = [raw[start:end].decode("utf-8") for start, end in zip(starts, ends)]
+    else:
+        values = [text[start:end] for start, end in zip(starts, ends)]
+    result = np.empty(len(values), dtype=object)
+    result[:] = values
+    return result
+
+
+def parse_dates(values):
+    """Convert ISO date strings to datetime64[D], NaT for missing or unparseable dates"""
+    try:
+        return np.array(values, dtype="datetime64[D]")
+    except ValueError:
+        pass
+    dates = np.empty(len(values), dtype="datetime64[D]")
+    for i, value in enumerate(values):
+        try:
+            dates[i] = np.datetime64(value[:10] if value else None, "D")
+        except ValueError:
+            dates[i] = np.datetime64("NaT")
+    return dates
+
+
+class _ColumnBuilder:
+    """Collects one column chunk by chunk and produces its arrays"""
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.chunks = []
+        self.lengths = []
+        self.categories = {}
+
+    def add(self, values):
+        kind = self.kind
+        if kind == "str":
+            data, lengths = encode_strings(values)
+            self.chunks.append(data)
+            self.lengths.append(lengths)
+        elif kind == "category":
+            categories = self.categories
+            codes = [categories.setdefault(value, len(categories)) if value is not None else -1
+                     for value in values]
+            self.chunks.append(np.array(codes, dtype=np.int32))
+        elif kind == "float":
+            self.chunks.append(np.array(values, dtype=np.float64))
+        elif kind == "int":
+            self.chunks.append(np.array([value if value is not None else 0 for value in values], dtype=np.int64))
+        elif kind == "bool":
+            self.chunks.append(np.array([bool(value) for value in values], dtype=bool))
+        elif kind == "date":
+            self.chunks.append(parse_dates(values))
+        else:
+            # ref: keep the raw ids; they are resolved to row numbers at the end
+            self.chunks.append(np.array([(value or "").encode("utf-8") for value in values], dtype="S"))
+
+    def _joined(self, dtype, chunks=None):
+        chunks = self.chunks if chunks is None else chunks
+        return np.concatenate(chunks) if chunks else np.empty(0, dtype=dtype)
+
+    def arrays(self, keys=None):
+        """The column as a dict of named arrays ("" is the column itself)"""
+        if self.kind == "str":
+            lengths = self._joined(np.int64, self.lengths)
+            offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+            np.cumsum(lengths, out=offsets[1:])
+            return {"data": self._joined(np.uint8), "offsets": offsets}
+        if self.kind == "category":
+            data, lengths = encode_strings(list(self.categories))
+            offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+            np.cumsum(lengths, out=offsets[1:])
+            return {"codes": self._joined(np.int32), "categories.data": data, "categories.offsets": offsets}
+        if self.kind == "ref":
+            return {"": resolve_refs(self._joined("S1"), keys)}
+        dtype = {"float": np.float64, "int": np.int64, "bool": bool, "date": "datetime64[D]"}[self.kind]
+        return {"": self._joined(dtype)}
+
+
+def resolve_refs(ids, keys):
+    """Row numbers of ids in the key array keys, -1 where an id is not found"""
+    if keys is None or not len(keys) or not len(ids):
+        return np.full(len(ids), -1, dtype=np.int32)
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    positions = np.searchsorted(sorted_keys, ids).clip(max=len(keys) - 1)
+    found = sorted_keys[positions] == ids
+    return np.where(found, order[positions], -1).astype(np.int32)
+
+
+class SnapshotExporter:
+    """
+    Columnar snapshot of purchases, line items, budget allocations, vendors
+    and budgets for analysis.
+
+    Each table is read with one chunked query and stored column by column
+    as typed arrays: numeric amounts, datetime64 dates, dictionary encoded
+    vendor/status columns, and row numbers instead of foreign key ids. The
+    snapshot is a NumPy .npz file, or a directory of Parquet / Arrow IPC
+    files (one per table) when pyarrow is installed. load_snapshot()
+    reads either back.
+    """
+
+    def __init__(self, db_manager, chunk_size=SNAPSHOT_CHUNK_SIZE):
+        self.db_manager = db_manager
+        self.chunk_size = chunk_size
+
+    def export(self, path, file_format=None, progress_callback=None, cancel_event=None):
+        """
+        Write a snapshot to path.
+
+        progress_callback(table, rows) is called after each chunk; setting
+        cancel_event stops the export without writing anything.
+        Returns (success, message).
+        """
+        file_format = file_format or detect_snapshot_format(path)
+        if file_format not in SNAPSHOT_FORMATS:
+            return False, f"Unknown snapshot format: {file_format}"
+        if file_format != "npz":
+            try:
+                import pyarrow # noqa: F401
+            except ImportError:
+                return False, f"The {file_format} format needs pyarrow; export to .npz instead."
+
+        try:
+            tables = self._read_tables(progress_callback, cancel_event)
+            if tables is None:
+                return False, "Snapshot cancelled."
+
+            if file_format == "npz":
+                self._write_npz(path, tables)
+            else:
+                self._write_arrow(path, tables, file_format)
+
+            summary = ", ".join(f"{rows:,} {name.replace('_', ' ')}" for name, (rows, _) in tables.items())
+            return True, f"Snapshot written to {path} ({summary})"
+
+        except Exception as e:
+            return False, f"Snapshot failed: {str(e)}"
+
+    def _read_tables(self, progress_callback, cancel_event):
+        """Read every table into column arrays; None if cancelled"""
+        tables = {}
+        keys = {}
+        session = self.db_manager.Session()
+        try:
+            for name, key, spec in SNAPSHOT_TABLES:
+                builders = [_ColumnBuilder(kind if isinstance(kind, str) else kind[0]) for _, kind, _ in spec]
+                key_builder = _ColumnBuilder("ref") if key else None
+                key_index = [column for column, _, _ in spec].index(key) if key else None
+                query = select(*[expression for _, _, expression in spec])
+                result = session.execute(query, execution_options={"yield_per": self.chunk_size})
+
+                rows = 0
+                for chunk in result.partitions():
+                    for builder, values in zip(builders, zip(*chunk)):
+                        builder.add(values)
+                    if key_builder:
+                        key_builder.add([row[key_index] for row in chunk])
+                    rows += len(chunk)
+                    if progress_callback:
+                        progress_callback(name, rows)
+                    if cancel_event is not None and cancel_event.is_set():
+                        return None
+
+                if key_builder:
+                    keys[name] = key_builder._joined("S1")
+                columns = {}
+                for (column, kind, _), builder in zip(spec, builders):
+                    ref_keys = keys.get(kind[1]) if not isinstance(kind, str) else None
+                    kind_name = kind if isinstance(kind, str) else f"ref:{kind[1]}"
+                    columns[column] = (kind_name, builder.arrays(ref_keys))
+                tables[name] = (rows, columns)
+            return tables
+        finally:
+            session.close()
+
+    def _write_npz(self, path, tables):
+        schema = {
+            "version": SNAPSHOT_VERSION,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "tables": {name: {"rows": rows, "columns": [[column, kind] for column, (kind, _) in columns.items()]}
+                       for name, (rows, columns) in tables.items()},
+        }
+        arrays = {"__schema__": np.array(json.dumps(schema))}
+        for name, (_, columns) in tables.items():
+            for column, (_, parts) in columns.items():
+                for part, array in parts.items():
+                    arrays[".".join(filter(None, (name, column, part)))] = array
+        np.savez(path, **arrays)
+
+    def _write_arrow(self, path, tables, file_format):
+        import pyarrow as pa
+
+        os.makedirs(path, exist_ok=True)
+        for name, (_, columns) in tables.items():
+            fields = {}
+            for column, (kind, parts) in columns.items():
+                if kind == "str":
+                    fields[column] = pa.LargeStringArray.from_buffers(
+                        len(parts["offsets"]) - 1, pa.py_buffer(parts["offsets"]), pa.py_buffer(parts["data"]))
+                elif kind == "category":
+                    categories = pa.LargeStringArray.from_buffers(
+                        len(parts["categories.offsets"]) - 1, pa.py_buffer(parts["categories.offsets"]),
+                        pa.py_buffer(parts["categories.data"]))
+                    codes = parts["codes"]
+                    fields[column] = pa.DictionaryArray.from_arrays(pa.array(codes, mask=codes < 0), categories)
+                else:
+                    fields[column] = pa.array(parts[""])
+            table = pa.table(fields)
+
+            if file_format == "parquet":
+                import pyarrow.parquet as pq
+                pq.write_table(table, os.path.join(path, f"{name}.parquet"))
+            else:
+                with pa.OSFile(os.path.join(path, f"{name}.arrow"), "wb") as sink:
+                    with pa.ipc.new_file(sink, table.schema) as writer:
+                        writer.write_table(table)
+
+
+def load_snapshot(path, tables=None, decode_categories=True):
+    """
+    Load a snapshot written by SnapshotExporter.
+
+    Returns {table: {column: array}}. Text columns are object arrays of
+    str; category columns are decoded to object arrays too (None for
+    NULL), or returned as (codes, categories) pairs when
+    decode_categories is False. Each table dict can be passed straight
+    to pandas.DataFrame.
+    """
+    if os.path.isdir(path):
+        return _load_arrow(path, tables, decode_categories)
+
+    result = {}
+    with np.load(path, allow_pickle=False) as archive:
+        schema = json.loads(str(archive["__schema__"]))
+        for name, info in schema["tables"].items():
+            if tables is not None and name not in tables:
+                continue
+            columns = {}
+            for column, kind in info["columns"]:
+                prefix = f"{name}.{column}"
+                if kind == "str":
+                    columns[column] = decode_strings(archive[f"{prefix}.data"], archive[f"{prefix}.offsets"])
+                elif kind == "category":
+                    codes = archive[f"{prefix}.codes"]
+                    categories = decode_strings(archive[f"{prefix}.categories.data"],
+                                                archive[f"{prefix}.categories.offsets"])
+                    columns[column] = _decode_codes(codes, categories) if decode_categories else (codes, categories)
+                else:
+                    columns[column] = archive[prefix]
+            result[name] = columns
+    return result
+
+
+def _decode_codes(codes, categories):
+    # An extra None category at the end makes code -1 decode to None
+    return np.append(categories, None)[codes]
+
+
+def _load_arrow(path, tables, decode_categories):
+    import pyarrow as pa
+
+    result = {}
+    for file_name in sorted(os.listdir(path)):
+        name, extension = os.path.splitext(file_name)
+        if extension not in (".parquet", ".arrow") or (tables is not None and name not in tables):
+            continue
+        file_path = os.path.join(path, file_name)
+        if extension == ".parquet":
+            import pyarrow.parquet as pq
+            table = pq.read_table(file_path)
+        else:
+            with pa.memory_map(file_path) as source:
+                table = pa.ipc.open_file(source).read_all()
+
+        columns = {}
+        for column in table.column_names:
+            array = table.column(column).combine_chunks()
+            if pa.types.is_dictionary(array.type):
+                codes = array.indices.fill_null(-1).to_numpy(zero_copy_only=False).astype(np.int32)
+                categories = array.dictionary.to_numpy(zero_copy_only=False)
+                columns[column] = _decode_codes(codes, categories) if decode_categories else (codes, categories)
+            else:
+                columns[column] = array.to_numpy(zero_copy_only=False)
+        result[name] = columns
+    return result
@@ -0,0 +1,89 @@
+# utils/startup_profile.py
+import builtins
+import sys
+import threading
+import time
+
+
+class StartupProfiler:
+    """
+    Records a startup timeline (named marks) and the time spent importing
+    modules, relative to a common origin. Disabled profilers do nothing so
+    callers can mark unconditionally.
+    """
+
+    def __init__(self, enabled=False, origin=None, output_path="startup_profile.log", min_import_ms=1.0):
+        self.enabled = enabled
+        self.origin = origin if origin is not None else time.perf_counter()
+        self.output_path = output_path
+        self.min_import_ms = min_import_ms
+        self.marks = []
+        self.imports = []
+        self._original_import = None
+        self._local = threading.local()
+        self._finished = False
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.origin) * 1000
+
+    def mark(self, label):
+        """Record a named point on the timeline"""
+        if self.enabled:
+            self.marks.append((self.elapsed_ms(), label))
+
+    def start_import_tracking(self):
+        """Time top-level imports of modules that are not loaded yet"""
+        if not self.enabled or self._original_import is not None:
+            return
+        self._original_import = builtins.__import__
+        original_import = self._original_import
+        profiler = self
+
+        def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+            # Only time the outermost import of a module that is actually loaded
+            depth = getattr(profiler._local, "depth", 0)
+            if level != 0 or name in sys.modules or depth > 0:
+                return original_import(name, globals, locals, fromlist, level)
+
+            profiler._local.depth = depth + 1
+            start = time.perf_counter()
+            try:
+                return original_import(name, globals, locals, fromlist, level)
+            finally:
+                profiler._local.depth = depth
+                duration = (time.perf_counter() - start) * 1000
+                if duration >= profiler.min_import_ms:
+                    profiler.imports.append(((start - profiler.origin) * 1000, duration, name))
+
+        builtins.__import__ = timed_import
+
+    def stop_import_tracking(self):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def finish(self, label="startup complete"):
+        """Record the final mark and write the report"""
+        if not self.enabled or self._finished:
+            return
+        self._finished = True
+        self.mark(label)
+        self.stop_import_tracking()
+
+        report = self.format_report()
+        try:
+            with open(self.output_path, "w", encoding="utf-8") as f:
+                f.write(report)
+        except OSError as e:
+            print(f"Could not write startup profile: {e}")
+        print(report, file=sys.stderr)
+
+    def format_report(self):
+        lines = ["Startup timeline", "================"]
+        for elapsed, label in self.marks:
+            lines.append(f"{elapsed:9.1f} ms  {label}")
+
+        lines += ["", "Imports (start offset, duration, module)", "========================================"]
+        for start, duration, name in sorted(self.imports, key=lambda i: i[0]):
+            lines.append(f"{start:9.1f} ms  {duration:8.1f} ms  {name}")
+        return "\n".join(lines) + "\n"
@@ -17,6 +17,10 @@ class ApprovalDashboardView:
         # In a real system, this would come from user authentication
         self.current_approver = "System Admin"
 
+        # Search applied to the pending list
+        self.search_text = ""
+        self.search_field = "All Fields"
+
         self.frame = tk.Frame(parent)
         self.setup_ui()
 
@@ -39,9 +43,24 @@ class ApprovalDashboardView:
         pending_frame = tk.LabelFrame(self.frame, text="Purchases Pending Approval")
         pending_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
 
-        # Create treeview for pending approvals
+        # Search box for narrowing the pending list
+        search_frame = tk.Frame(pending_frame)
+        search_frame.pack(fill=tk.X, pady=5)
+        self.search_var = tk.StringVar()
+        search_entry = tk.Entry(search_frame, textvariable=self.search_var, width=25)
+        search_entry.pack(side=tk.LEFT, padx=5)
+        search_entry.bind("<Return>", lambda e: self.perform_search())
+        self.search_option_var = tk.StringVar(value=self.search_field)
+        ttk.Combobox(search_frame, textvariable=self.search_option_var, state="readonly",
+                     values=["Order #", "Vendor", "Date", "All Fields"], width=12).pack(side=tk.LEFT, padx=5)
+        tk.Button(search_frame, text="Search", command=self.perform_search).pack(side=tk.LEFT, padx=5)
+        tk.Button(search_frame, text="Clear", command=self.clear_search).pack(side=tk.LEFT, padx=5)
+        self.match_label = tk.Label(search_frame, text="")
+        self.match_label.pack(side=tk.RIGHT, padx=5)
+
+        # Create treeview for pending approvals; Ctrl/Shift-click selects several
         columns = ("ID", "Order #", "Vendor", "Date", "Total", "Submitter")
-        self.pending_tree = ttk.Treeview(pending_frame, columns=columns, show="headings", selectmode="browse") # browse selectmode
+        self.pending_tree = ttk.Treeview(pending_frame, columns=columns, show="headings", selectmode="extended")
         self.pending_tree = configure_treeview(self.pending_tree)
         # Set column headings
         for col in columns:
@@ -76,6 +95,8 @@ class ApprovalDashboardView:
                   command=self.approve_selected).pack(side=tk.LEFT, padx=5)
         tk.Button(button_frame, text="Reject Selected",
                   command=self.reject_selected).pack(side=tk.LEFT, padx=5)
+        tk.Button(button_frame, text="Approve All Matching",
+                  command=self.approve_all_matching).pack(side=tk.LEFT, padx=5)
         tk.Button(button_frame, text="Refresh List",
                   command=self.refresh_all_data).pack(side=tk.RIGHT, padx=5) # Changed target
 
@@ -89,10 +110,10 @@ class ApprovalDashboardView:
              return # Don't try to update if frame doesn't exist
 
          try:
-             purchases = self.controllers["purchase"].get_all_purchases()
-             pending_count = sum(1 for p in purchases if p.status == "Pending")
-             approved_count = sum(1 for p in purchases if p.status == "Approved")
-             rejected_count = sum(1 for p in purchases if p.status == "Rejected")
+             counts = self.controllers["purchase"].count_purchases_by_approval_status()
+             pending_count = counts.get("Pending", 0)
+             approved_count = counts.get("Approved", 0)
+             rejected_count = counts.get("Rejected", 0)
 
              status_data = [
                  ("Pending Approval", pending_count, "#ffcccb"),
@@ -127,8 +148,8 @@ class ApprovalDashboardView:
         self.pending_tree.delete(*self.pending_tree.get_children())
 
         try:
-            # Get pending purchases (should have relationships loaded by controller)
-            pending_purchases = self.controllers["purchase"].get_purchases_by_approval_status("Pending")
+            # Totals come from the database; line items are not loaded
+            pending_purchases = self.controllers["purchase"].get_purchase_listing(**self.list_criteria())
 
             for i, purchase in enumerate(pending_purchases):
                 # Add row tags for styling
@@ -136,23 +157,46 @@ class ApprovalDashboardView:
                 # Use pending tag for all pending items
                 status_tag = 'pending'
 
-                try:
-                     total = purchase.get_total()
-                except Exception as e:
-                     print(f"Error getting total for purchase {purchase.id}: {e}")
-                     total = 0.0
-
                 self.pending_tree.insert("", "end", values=(
                     purchase.id,
                     purchase.order_number or "N/A",
                     purchase.vendor_name or "N/A",
                     purchase.date or "N/A",
-                    f"${total:.2f}",
+                    f"${purchase.total:.2f}",
                     "User"  # Placeholder: In a real system, this would be the submitter's name
                 ), tags=(row_tag, status_tag))
+
+            if self.search_text:
+                self.match_label.config(text=f"{len(pending_purchases):,} matching purchases")
+            else:
+                self.match_label.config(text=f"{len(pending_purchases):,} pending purchases")
         except Exception as e:
              print(f"Error refreshing pending approval list: {e}")
 
+    def list_criteria(self):
+        """The pending list's filter and search, as controller arguments"""
+        return {
+            "approval_status": "Pending",
+            "search": self.search_text,
+            "search_field": self.search_field,
+        }
+
+    def perform_search(self):
+        """Narrow the pending list to purchases matching the search"""
+        self.search_text = self.search_var.get().strip()
+        self.search_field = self.search_option_var.get()
+        self.refresh_pending_list()
+
+    def clear_search(self):
+        """Show every pending purchase again"""
+        self.search_var.set("")
+        self.search_text = ""
+        self.refresh_pending_list()
+
+    def selected_purchase_ids(self):
+        """Ids of the purchases selected in the pending list"""
+        return [self.pending_tree.item(item, "values")[0] for item in self.pending_tree.selection()]
+
     def refresh_all_data(self):
          """Refreshes both the list and the status cards."""
          self.refresh_pending_list()
@@ -161,12 +205,12 @@ class ApprovalDashboardView:
 
     def view_purchase_details(self):
         """View details of selected purchase"""
-        selected_item = self.pending_tree.selection()
-        if not selected_item:
+        selected_ids = self.selected_purchase_ids()
+        if not selected_ids:
             messagebox.showerror("Error", "No purchase selected")
             return
 
-        purchase_id = self.pending_tree.item(selected_item, "values")[0]
+        purchase_id = selected_ids[0]
         # Fetch purchase with eagerly loaded relationships
         purchase = self.controllers["purchase"].get_purchase_by_id(purchase_id)
 
@@ -278,13 +322,13 @@ class ApprovalDashboardView:
         if purchase.status == "Pending":
             def approve_action():
                 """Action specific to the details window approval."""
-                if self._handle_approval_logic(purchase.id, details_window): # Use helper
+                if self._handle_approval_logic([purchase.id], details_window): # Use helper
                     details_window.destroy() # Close window on success
                     self.refresh_all_data() # Refresh list and cards
 
             def reject_action():
                  """Action specific to the details window rejection."""
-                 self._handle_rejection_dialog_logic(purchase.id, details_window) # Use helper
+                 self._handle_rejection_dialog_logic([purchase.id], details_window) # Use helper
 
 
             approve_btn = tk.Button(action_button_frame, text="Approve Purchase", command=approve_action)
@@ -297,11 +341,30 @@ class ApprovalDashboardView:
         tk.Button(main_frame, text="Close", command=details_window.destroy).pack(pady=10, anchor='se')
 
 
-    def _handle_approval_logic(self, purchase_id, parent_messagebox_owner):
+    @staticmethod
+    def _outcome_summary(outcomes, done):
+        """
+        Turn {purchase_id: (success, message)} into one (success, message):
+        the message itself for a single purchase, otherwise counts.
+        """
+        if len(outcomes) == 1:
+            return next(iter(outcomes.values()))
+        succeeded = sum(1 for success, _ in outcomes.values() if success)
+        problems = {}
+        for success, message in outcomes.values():
+            if not success:
+                problems[message] = problems.get(message, 0) + 1
+        lines = [f"{succeeded:,} of {len(outcomes):,} purchases {done}."]
+        lines += [f"{count:,} not changed: {message}" for message, count in problems.items()]
+        return succeeded > 0, "\n".join(lines)
+
+    def _handle_approval_logic(self, purchase_ids, parent_messagebox_owner):
         """Internal helper to call controller and show messages for approval. Returns True on success."""
-        if messagebox.askyesno("Confirm Approval", "Are you sure you want to approve this purchase?", parent=parent_messagebox_owner):
-            success, message = self.controllers["purchase"].approve_purchase(
-                purchase_id, self.current_approver)
+        question = ("Are you sure you want to approve this purchase?" if len(purchase_ids) == 1 else
+                    f"Are you sure you want to approve these {len(purchase_ids):,} purchases?")
+        if messagebox.askyesno("Confirm Approval", question, parent=parent_messagebox_owner):
+            outcomes = self.controllers["purchase"].approve_purchases(purchase_ids, self.current_approver)
+            success, message = self._outcome_summary(outcomes, "approved")
             if success:
                 messagebox.showinfo("Success", message, parent=parent_messagebox_owner)
                 return True
@@ -311,7 +374,7 @@ class ApprovalDashboardView:
         return False # Did not confirm
 
 
-    def _handle_rejection_dialog_logic(self, purchase_id, parent_window):
+    def _handle_rejection_dialog_logic(self, purchase_ids, parent_window):
          """Internal helper to show rejection notes dialog and call controller."""
          notes_window = tk.Toplevel(parent_window) # Child of calling window
          notes_window.title("Rejection Notes")
@@ -319,7 +382,9 @@ class ApprovalDashboardView:
          notes_window.transient(parent_window)
          notes_window.grab_set()
 
-         tk.Label(notes_window, text="Please provide reason for rejection:").pack(pady=10)
+         prompt = ("Please provide reason for rejection:" if len(purchase_ids) == 1 else
+                   f"Please provide reason for rejecting {len(purchase_ids):,} purchases:")
+         tk.Label(notes_window, text=prompt).pack(pady=10)
 
          notes_text = tk.Text(notes_window, height=8, width=45, wrap=tk.WORD)
          notes_text.pack(padx=10, pady=5, fill=tk.BOTH, expand=True)
@@ -331,8 +396,9 @@ class ApprovalDashboardView:
                  messagebox.showerror("Error", "Rejection notes cannot be empty.", parent=notes_window)
                  return
 
-             success, message = self.controllers["purchase"].reject_purchase(
-                 purchase_id, self.current_approver, notes)
+             outcomes = self.controllers["purchase"].reject_purchases(
+                 purchase_ids, self.current_approver, notes)
+             success, message = self._outcome_summary(outcomes, "rejected")
              if success:
                  messagebox.showinfo("Success", message, parent=notes_window)
                  notes_window.destroy() # Close notes window
@@ -348,28 +414,63 @@ class ApprovalDashboardView:
 
 
     def approve_selected(self):
-        """Approve selected purchase from the main list"""
-        selected_item = self.pending_tree.selection()
-        if not selected_item:
+        """Approve the purchases selected in the main list"""
+        purchase_ids = self.selected_purchase_ids()
+        if not purchase_ids:
             messagebox.showerror("Error", "No purchase selected")
             return
 
-        purchase_id = self.pending_tree.item(selected_item, "values")[0]
         # Call helper, refresh list/cards if successful
-        if self._handle_approval_logic(purchase_id, self.frame): # Pass main frame as parent for messagebox
+        if self._handle_approval_logic(purchase_ids, self.frame): # Pass main frame as parent for messagebox
              self.refresh_all_data()
 
 
     def reject_selected(self):
-        """Reject selected purchase from the main list"""
-        selected_item = self.pending_tree.selection()
-        if not selected_item:
+        """Reject the purchases selected in the main list"""
+        purchase_ids = self.selected_purchase_ids()
+        if not purchase_ids:
             messagebox.showerror("Error", "No purchase selected")
             return
 
-        purchase_id = self.pending_tree.item(selected_item, "values")[0]
         # Call helper to show dialog, it will refresh list/cards on success
-        self._handle_rejection_dialog_logic(purchase_id, self.frame) # Pass main frame as parent for dialog
+        self._handle_rejection_dialog_logic(purchase_ids, self.frame) # Pass main frame as parent for dialog
+
+
+    def approve_all_matching(self):
+        """Approve every pending purchase matching the current search, in the background"""
+        from views.widgets.progress_dialog import ProgressDialog
+        from utils.background import run_in_background
+
+        purchase_ids = self.controllers["purchase"].get_purchase_listing_ids(**self.list_criteria())
+        if not purchase_ids:
+            messagebox.showinfo("Approve All", "No pending purchases match the search.")
+            return
+        scope = f'matching "{self.search_text}"' if self.search_text else "pending"
+        if not messagebox.askyesno("Confirm Approval",
+                                   f"Approve all {len(purchase_ids):,} {scope} purchases?"):
+            return
+
+        dialog = ProgressDialog(self.frame, "Approving Purchases", f"Approving {len(purchase_ids):,} purchases...")
+
+        def progress(done, total):
+            dialog.report(done / total, f"{done:,} of {total:,} purchases processed")
+
+        def finished(outcomes):
+            dialog.close()
+            success, message = self._outcome_summary(outcomes, "approved")
+            if dialog.cancel_event.is_set():
+                message = f"Stopped after {len(outcomes):,} purchases.\n" + message
+            (messagebox.showinfo if success else messagebox.showerror)("Approve All", message)
+            self.refresh_all_data()
+
+        def failed(error):
+            dialog.close()
+            messagebox.showerror("Approve All", f"Approval failed: {error}")
+            self.refresh_all_data()
+
+        run_in_background(self.frame, self.controllers["purchase"].approve_purchases, finished,
+                          purchase_ids, self.current_approver, error_callback=failed,
+                          progress_callback=progress, cancel_event=dialog.cancel_event)
 
 
     def return_to_dashboard(self):
@@ -1,20 +1,24 @@
 # purchase_system/views/main_dashboard.py
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog # Added ttk
+import os
 from datetime import datetime
 # Removed direct StatsCard/ActionButton imports if not used in new design, or keep if adapted
 # from views.widgets.stats_card import StatsCard
 # from views.widgets.action_button import ActionButton
 from config.settings import UI_COLORS, UI_FONTS # Added UI_FONTS
 from views.view_factory import ViewFactory
-from utils.chart_utils import ChartGenerator # Import ChartGenerator
+from views.widgets.chart_panel import ChartPanel # Pre-rendered chart widget
 from utils.table_utils import configure_treeview # Import Treeview config
+from utils.background import run_in_background
 
 class MainDashboard:
-    def __init__(self, parent, controllers, show_view_callback):
+    def __init__(self, parent, controllers, show_view_callback, on_data_loaded=None):
         self.parent = parent
         self.controllers = controllers
         self.show_view = show_view_callback
+        self.on_data_loaded = on_data_loaded # Called (once per load) after data is applied
+        self._load_token = 0
         # Ensure purchase controller is set for budget controller if needed early
         self.controllers["budget"].set_purchase_controller(self.controllers["purchase"])
         # Ensure report controller has references if needed early
@@ -74,8 +78,7 @@ class MainDashboard:
         self.create_navigation_panel(right_column)
         self.create_budget_overview_chart(right_column)
 
-        # Initial data load
-        self.refresh_dashboard_data()
+        # Data is loaded in the background by show()
 
 
     def create_kpi_section(self, parent):
@@ -91,10 +94,10 @@ class MainDashboard:
         style.configure('KPI.TLabel', background='white', anchor='center', font=UI_FONTS.get("default"))
         style.configure('KPIValue.TLabel', background='white', anchor='center', font=UI_FONTS.get("large"))
 
-        # Placeholder labels - values updated in refresh_dashboard_data
-        self.pending_approval_kpi = ttk.Label(kpi_frame, text="0", style='KPIValue.TLabel')
-        self.pending_receipt_kpi = ttk.Label(kpi_frame, text="0", style='KPIValue.TLabel')
-        self.ytd_spending_kpi = ttk.Label(kpi_frame, text="$0.00", style='KPIValue.TLabel')
+        # Placeholder labels - values updated in apply_dashboard_data
+        self.pending_approval_kpi = ttk.Label(kpi_frame, text="…", style='KPIValue.TLabel')
+        self.pending_receipt_kpi = ttk.Label(kpi_frame, text="…", style='KPIValue.TLabel')
+        self.ytd_spending_kpi = ttk.Label(kpi_frame, text="…", style='KPIValue.TLabel')
 
         ttk.Label(kpi_frame, text="Pending Approvals", style='KPI.TLabel').grid(row=0, column=0, pady=(5,0))
         self.pending_approval_kpi.grid(row=1, column=0, pady=(0,5))
@@ -169,6 +172,9 @@ class MainDashboard:
             ("💰 Manage Budgets", self.manage_budgets),
             ("📊 Reports", self.show_reports_menu), # Changed to menu trigger
             ("📥 Import Purchases", self.import_data),
+            ("🔍 Check Import File", self.validate_import_file),
+            ("📦 Export Snapshot", self.export_snapshot),
+            ("🗂 Year-End Reports", self.export_year_end_reports),
             
             ("🚪 Exit System", self.exit_system),
         ]
@@ -188,110 +194,155 @@ class MainDashboard:
         self.budget_chart_frame.columnconfigure(0, weight=1)
         self.budget_chart_frame.rowconfigure(0, weight=1)
 
-        # Placeholder label, chart canvas added during refresh
+        # Chart is created on first refresh and updated in place afterwards
+        self.budget_chart = None
         self.budget_chart_canvas_widget = None # Initialize placeholder
+        self.budget_chart_message = None
 
 
     def refresh_dashboard_data(self):
-        """Fetches fresh data and updates all relevant dashboard widgets."""
-        # --- Refresh KPIs ---
+        """Loads dashboard data on a worker thread and applies it when ready."""
+        self._load_token += 1
+        token = self._load_token
+        run_in_background(self.frame, self.load_dashboard_data,
+                          lambda data: self._on_data_ready(token, data),
+                          error_callback=lambda e: self._on_data_ready(token, {"error": str(e)}))
+
+    def _on_data_ready(self, token, data):
+        if token != self._load_token: # A newer refresh has been started
+            return
+        self.apply_dashboard_data(data)
+        if self.on_data_loaded:
+            self.on_data_loaded()
+
+    def load_dashboard_data(self):
+        """
+        Query everything the dashboard shows and return it as plain values.
+        Runs on a worker thread, so it must not touch any widgets.
+        """
+        data = {}
+        today = datetime.now().date()
+        current_year = str(today.year)
+
+        # --- KPIs and lists, derived from a single purchase query ---
+        try:
+            all_purchases = self.controllers["purchase"].get_all_purchases()
+
+            pending_approvals = [p for p in all_purchases if p.status == "Pending"]
+            # Same rule as count_pending_orders: has items and not all of them received
+            pending_receipts = sum(1 for p in all_purchases
+                                   if p.line_items and not all(item.received for item in p.line_items))
+            ytd_spending = sum(p.get_total() for p in all_purchases
+                               if (p.date or "").startswith(current_year))
+            data["kpis"] = (len(pending_approvals), pending_receipts, ytd_spending)
+
+            data["pending_approvals"] = [
+                (p.order_number or "N/A", p.vendor_name or "N/A", p.get_total())
+                for p in pending_approvals[:5]
+            ]
+
+            pending_receipt_list = [
+                p for p in all_purchases if not p.is_received() and p.status != 'Rejected'
+            ]
+            pending_receipt_list.sort(key=lambda p: p.date or '0000-00-00') # Sort oldest first
+            receipts = []
+            for p in pending_receipt_list[:5]: # Slice top 5
+                days_out = "N/A"
+                try:
+                    p_date = datetime.strptime(p.date, "%Y-%m-%d").date()
+                    days_out = (today - p_date).days
+                except (TypeError, ValueError):
+                    pass
+                receipts.append((p.order_number or "N/A", p.vendor_name or "N/A", days_out))
+            data["pending_receipts"] = receipts
+        except Exception as e:
+            print(f"Error loading dashboard purchases: {e}")
+            data["purchases_error"] = str(e)
+
+        # --- Budget overview ---
         try:
-            pending_approvals = len(self.controllers["purchase"].get_purchases_by_approval_status("Pending"))
-            # Assuming count_pending_orders counts orders needing items received
-            pending_receipts = self.controllers["purchase"].count_pending_orders()
-            ytd_spending = self.controllers["purchase"].calculate_ytd_spending()
+            budget_usage = self.controllers["budget"].calculate_budget_usage() # Gets usage for current year by default
+            data["budget_totals"] = (sum(b['amount'] for b in budget_usage),
+                                     sum(b['spent'] for b in budget_usage))
+        except Exception as e:
+            print(f"Error loading budget overview: {e}")
+            data["budget_error"] = str(e)
+
+        return data
 
+    def apply_dashboard_data(self, data):
+        """Updates all dashboard widgets from the result of load_dashboard_data."""
+        if not self.frame.winfo_exists():
+            return
+
+        # --- Refresh KPIs ---
+        if "kpis" in data:
+            pending_approvals, pending_receipts, ytd_spending = data["kpis"]
             self.pending_approval_kpi.config(text=str(pending_approvals))
             self.pending_receipt_kpi.config(text=str(pending_receipts))
             self.ytd_spending_kpi.config(text=f"${ytd_spending:,.2f}")
-        except Exception as e:
-            print(f"Error refreshing KPIs: {e}")
+        else:
             self.pending_approval_kpi.config(text="Error")
             self.pending_receipt_kpi.config(text="Error")
             self.ytd_spending_kpi.config(text="Error")
 
         # --- Refresh Pending Approvals List ---
-        if hasattr(self, 'pending_approval_tree') and self.pending_approval_tree.winfo_exists():
-            self.pending_approval_tree.delete(*self.pending_approval_tree.get_children())
-            try:
-                # Fetch top 5 pending approvals (modify controller if needed)
-                pending_approvals_list = self.controllers["purchase"].get_purchases_by_approval_status("Pending")[:5]
-                for i, p in enumerate(pending_approvals_list):
-                    self.pending_approval_tree.insert("", "end", values=(
-                        p.order_number or "N/A",
-                        p.vendor_name or "N/A",
-                        f"${p.get_total():,.2f}"
-                    ), tags=('evenrow' if i % 2 == 0 else 'oddrow', 'pending'))
-            except Exception as e:
-                print(f"Error refreshing pending approvals list: {e}")
-                self.pending_approval_tree.insert("", "end", values=("Error loading data", "", ""))
+        self.pending_approval_tree.delete(*self.pending_approval_tree.get_children())
+        if "pending_approvals" in data:
+            for i, (order_number, vendor_name, total) in enumerate(data["pending_approvals"]):
+                self.pending_approval_tree.insert("", "end", values=(
+                    order_number, vendor_name, f"${total:,.2f}"
+                ), tags=('evenrow' if i % 2 == 0 else 'oddrow', 'pending'))
+        else:
+            self.pending_approval_tree.insert("", "end", values=("Error loading data", "", ""))
 
         # --- Refresh Pending Receipts List ---
-        if hasattr(self, 'pending_receipt_tree') and self.pending_receipt_tree.winfo_exists():
-            self.pending_receipt_tree.delete(*self.pending_receipt_tree.get_children())
-            try:
-                # Fetch top 5 pending receipts (needs controller logic or filter here)
-                all_purchases = self.controllers["purchase"].get_all_purchases()
-                pending_receipt_list = [
-                    p for p in all_purchases if not p.is_received() and p.status != 'Rejected'
-                ]
-                # Sort by date/days outstanding if needed before slicing
-                today = datetime.now().date()
-                pending_receipt_list.sort(key=lambda p: p.date or '0000-00-00') # Sort oldest first
-                for i, p in enumerate(pending_receipt_list[:5]): # Slice top 5
-                     days_out = "N/A"
-                     try:
-                         p_date = datetime.strptime(p.date, "%Y-%m-%d").date()
-                         days_out = (today - p_date).days
-                     except: pass
-                     self.pending_receipt_tree.insert("", "end", values=(
-                         p.order_number or "N/A",
-                         p.vendor_name or "N/A",
-                         days_out
-                     ), tags=('evenrow' if i % 2 == 0 else 'oddrow', 'partial' if days_out == "N/A" or days_out < 14 else 'pending'))
-            except Exception as e:
-                print(f"Error refreshing pending receipts list: {e}")
-                self.pending_receipt_tree.insert("", "end", values=("Error loading data", "", ""))
+        self.pending_receipt_tree.delete(*self.pending_receipt_tree.get_children())
+        if "pending_receipts" in data:
+            for i, (order_number, vendor_name, days_out) in enumerate(data["pending_receipts"]):
+                self.pending_receipt_tree.insert("", "end", values=(
+                    order_number, vendor_name, days_out
+                ), tags=('evenrow' if i % 2 == 0 else 'oddrow', 'partial' if days_out == "N/A" or days_out < 14 else 'pending'))
+        else:
+            self.pending_receipt_tree.insert("", "end", values=("Error loading data", "", ""))
 
         # --- Refresh Budget Overview Chart ---
-        if hasattr(self, 'budget_chart_frame') and self.budget_chart_frame.winfo_exists():
-            # Clear previous chart
-            if self.budget_chart_canvas_widget:
-                self.budget_chart_canvas_widget.destroy()
-                self.budget_chart_canvas_widget = None
-
-            try:
-                # Get overall budget summary (needs controller method)
-                # Example: Assuming controller returns {'total_budget': N, 'total_spent': M}
-                # For now, calculate manually from budget_usage
-                budget_usage = self.controllers["budget"].calculate_budget_usage() # Gets usage for current year by default
-                total_budget = sum(b['amount'] for b in budget_usage)
-                total_spent = sum(b['spent'] for b in budget_usage)
-
-                if total_budget > 0:
-                    remaining = total_budget - total_spent
-                    chart_data = [
-                        {'label': 'Spent', 'value': total_spent},
-                        {'label': 'Remaining', 'value': remaining if remaining > 0 else 0} # Don't show negative remaining
-                    ]
-                    chart_colors = [UI_COLORS.get("pending", "#ffcccb"), UI_COLORS.get("approved", "#ccffcc")]
-
-                    # Use ChartGenerator for pie/donut chart
-                    canvas = ChartGenerator.create_pie_chart(
-                        self.budget_chart_frame,
-                        chart_data,
-                        label_field='label',
-                        value_field='value',
-                        title=f"Total Budget: ${total_budget:,.0f}" # Add total to title
-                    )
-                    self.budget_chart_canvas_widget = canvas.get_tk_widget()
-                    self.budget_chart_canvas_widget.grid(row=0, column=0, sticky="nsew")
-                else:
-                    ttk.Label(self.budget_chart_frame, text="No budget data for current year.", anchor='center').grid(row=0, column=0, sticky="nsew")
-
-            except Exception as e:
-                print(f"Error refreshing budget chart: {e}")
-                ttk.Label(self.budget_chart_frame, text="Error loading chart.", anchor='center').grid(row=0, column=0, sticky="nsew")
+        if "budget_totals" not in data:
+            self.show_budget_chart_message("Error loading chart.")
+            return
+
+        total_budget, total_spent = data["budget_totals"]
+        if total_budget > 0:
+            remaining = total_budget - total_spent
+            chart_data = [
+                {'label': 'Spent', 'value': total_spent},
+                {'label': 'Remaining', 'value': remaining if remaining > 0 else 0} # Don't show negative remaining
+            ]
+
+            # Build the donut chart once, then update it in place
+            if self.budget_chart is None:
+                self.budget_chart = ChartPanel(self.budget_chart_frame, "pie", default_size=(300, 300),
+                                               label_field='label', value_field='value')
+                self.budget_chart_canvas_widget = self.budget_chart.frame
+            self.budget_chart.update(chart_data, title=f"Total Budget: ${total_budget:,.0f}") # Add total to title
+            self.show_budget_chart_message(None)
+            self.budget_chart_canvas_widget.grid(row=0, column=0, sticky="nsew")
+        else:
+            self.show_budget_chart_message("No budget data for current year.")
+
+    def show_budget_chart_message(self, text):
+        """Show a message in place of the budget chart, or hide it when text is None"""
+        if text is None:
+            if self.budget_chart_message is not None:
+                self.budget_chart_message.grid_remove()
+            return
+
+        if self.budget_chart_canvas_widget is not None:
+            self.budget_chart_canvas_widget.grid_remove()
+        if self.budget_chart_message is None:
+            self.budget_chart_message = ttk.Label(self.budget_chart_frame, anchor='center')
+        self.budget_chart_message.config(text=text)
+        self.budget_chart_message.grid(row=0, column=0, sticky="nsew")
 
 
     # --- Navigation Methods ---
@@ -364,21 +415,145 @@ class MainDashboard:
         self.show_view(approval_view)
 
     def import_data(self):
+        purchase_controller = self.controllers["purchase"]
+
+        # Offer to finish the most recent import that stopped part way
+        jobs = purchase_controller.get_resumable_import_jobs()
+        if jobs:
+            job = jobs[0]
+            answer = messagebox.askyesnocancel(
+                "Resume Import",
+                f"The import of {os.path.basename(job['file_path'])} stopped at row {job['row_number']:,} "
+                f"({job['imported']:,} purchases imported, status: {job['status']}).\n\n"
+                f"Resume it? Choose No to discard it and import a new file."
+            )
+            if answer is None:
+                return
+            if answer:
+                self._run_import(lambda importer: importer.resume_job(job["id"]))
+                return
+            for stale_job in jobs:
+                purchase_controller.cancel_import_job(stale_job["id"])
+
         file_path = filedialog.askopenfilename(
             defaultextension=".csv",
-            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
-            title="Import Purchases from CSV"
+            filetypes=[("Purchase files", "*.csv *.jsonl *.ndjson"), ("CSV files", "*.csv"),
+                       ("JSON Lines files", "*.jsonl *.ndjson"), ("All files", "*.*")],
+            title="Import Purchases"
         )
         if file_path:
-            if hasattr(self.controllers["purchase"], "import_purchases_from_csv"):
-                success, message = self.controllers["purchase"].import_purchases_from_csv(file_path)
-                if success:
-                    messagebox.showinfo("Import Successful", message)
-                    self.refresh_dashboard_data() # Refresh data after import
-                else:
-                    messagebox.showerror("Import Failed", message)
-            else: # Fallback/error if method doesn't exist
-                 messagebox.showerror("Import Error", "Import function not found in controller.")
+            self._run_import(lambda importer: importer.import_file(file_path))
+
+    def validate_import_file(self):
+        """Dry run an import file and offer to import it afterwards"""
+        file_path = filedialog.askopenfilename(
+            filetypes=[("Purchase files", "*.csv *.jsonl *.ndjson"), ("CSV files", "*.csv"),
+                       ("JSON Lines files", "*.jsonl *.ndjson"), ("All files", "*.*")],
+            title="Check Import File"
+        )
+        if not file_path:
+            return
+
+        self.frame.config(cursor="watch")
+
+        def checked(result):
+            self.frame.config(cursor="")
+            success, message = result
+            if not success:
+                messagebox.showerror("Check Failed", message)
+            elif messagebox.askyesno("Import Check", f"{message}\n\nImport this file now?"):
+                self._run_import(lambda importer: importer.import_file(file_path))
+
+        def failed(error):
+            self.frame.config(cursor="")
+            messagebox.showerror("Check Failed", f"Could not check the file: {error}")
+
+        run_in_background(self.frame, self.controllers["purchase"].validate_purchase_import, checked,
+                          file_path, error_callback=failed, poll_ms=100)
+
+    def export_snapshot(self):
+        """Export a columnar snapshot of all purchase data for analysis"""
+        from views.widgets.progress_dialog import ProgressDialog
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".npz",
+            filetypes=[("NumPy snapshot", "*.npz"), ("All files", "*.*")],
+            initialfile="purchase_snapshot.npz",
+            title="Export Snapshot"
+        )
+        if not file_path:
+            return
+
+        dialog = ProgressDialog(self.frame, "Exporting Snapshot", "Reading purchase data...")
+
+        def progress(table, rows):
+            dialog.report(None, f"Reading {table.replace('_', ' ')}: {rows:,} rows")
+
+        def finished(result):
+            dialog.close()
+            success, message = result
+            if success:
+                messagebox.showinfo("Snapshot Exported", message)
+            elif not dialog.cancel_event.is_set():
+                messagebox.showerror("Snapshot Failed", message)
+
+        def failed(error):
+            dialog.close()
+            messagebox.showerror("Snapshot Failed", f"Snapshot failed: {error}")
+
+        run_in_background(self.frame, self.controllers["purchase"].export_snapshot, finished, file_path,
+                          error_callback=failed, progress_callback=progress, cancel_event=dialog.cancel_event)
+
+    def export_year_end_reports(self):
+        """Write budget and vendor reports for every year, as CSV and PDF, into one zip archive"""
+        from views.widgets.progress_dialog import ProgressDialog
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".zip",
+            filetypes=[("Zip archives", "*.zip"), ("All files", "*.*")],
+            initialfile="year_end_reports.zip",
+            title="Export Year-End Reports"
+        )
+        if not file_path:
+            return
+
+        dialog = ProgressDialog(self.frame, "Year-End Reports", "Computing report data for all years...")
+
+        def finished(result):
+            dialog.close()
+            success, message = result
+            if success:
+                messagebox.showinfo("Reports Exported", message)
+            elif not dialog.cancel_event.is_set():
+                messagebox.showerror("Report Export Failed", message)
+
+        def failed(error):
+            dialog.close()
+            messagebox.showerror("Report Export Failed", f"Report export failed: {error}")
+
+        run_in_background(self.frame, self.controllers["report"].export_all_years, finished, file_path,
+                          error_callback=failed, progress_callback=dialog.report, cancel_event=dialog.cancel_event,
+                          poll_ms=100)
+
+    def _run_import(self, run):
+        """Run an import in the background behind a progress window"""
+        from views.widgets.import_progress import ImportProgressDialog
+
+        importer = self.controllers["purchase"].create_purchase_importer()
+        dialog = ImportProgressDialog(self.frame, importer)
+
+        def finished(result):
+            dialog.close()
+            success, message = result
+            if success:
+                messagebox.showinfo("Import Successful", message)
+            else:
+                messagebox.showerror("Import Failed", message)
+            self.refresh_dashboard_data() # Refresh data after import
+
+        def failed(error):
+            dialog.close()
+            messagebox.showerror("Import Failed", f"Import failed: {error}")
+
+        run_in_background(self.frame, run, finished, importer, error_callback=failed, poll_ms=100)
 
 
     def exit_system(self):
@@ -393,4 +568,12 @@ class MainDashboard:
     def hide(self):
         self.frame.pack_forget() # Use pack_forget if using pack
         # Or use grid_forget if using grid for self.frame
-        # self.frame.grid_forget()
\ No newline at end of file
+        # self.frame.grid_forget()
+
+    def destroy(self):
+        """Release the chart panel and destroy the dashboard"""
+        self._load_token += 1 # Drop any load still in flight
+        if self.budget_chart is not None:
+            self.budget_chart.destroy()
+            self.budget_chart = None
+        self.frame.destroy()
\ No newline at end of file
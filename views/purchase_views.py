@@ -3,7 +3,6 @@ from tkinter import ttk, messagebox, filedialog
 from datetime import datetime
 from database.models import Purchase, Vendor, LineItem, PurchaseBudget
 import uuid
-from utils.exporters import CSVExporter
 from utils.table_utils import configure_treeview
 # ***** Added import line below *****
 from views.view_factory import ViewFactory
@@ -19,6 +18,11 @@ class PurchaseListView:
         self.sort_column = None
         self.sort_reverse = False
 
+        # Filter and search state of the list on screen
+        self.status_filter = "All"
+        self.search_text = ""
+        self.search_field = "All Fields"
+
         self.frame = tk.Frame(parent)
         self.setup_ui()
 
@@ -80,8 +84,20 @@ class PurchaseListView:
         tk.Button(action_frame, text="Receive Items",
                   command=self.receive_items).pack(side=tk.LEFT, padx=5)
 
-        tk.Button(action_frame, text="Export to CSV",
-                  command=self.export_purchases).pack(side=tk.RIGHT, padx=5)
+        export_button = tk.Menubutton(action_frame, text="Export to CSV ▾", relief=tk.RAISED)
+        export_menu = tk.Menu(export_button, tearoff=0)
+        export_menu.add_command(label="Purchase Summary...", command=self.export_purchases)
+        export_menu.add_separator()
+        export_menu.add_command(label="Line Items...",
+                                command=lambda: self.export_purchases("line_items"))
+        export_menu.add_command(label="Line Items (All Columns)...",
+                                command=lambda: self.export_purchases("line_items", "full"))
+        export_menu.add_command(label="Budget Allocations...",
+                                command=lambda: self.export_purchases("allocations"))
+        export_menu.add_command(label="Budget Allocations (All Columns)...",
+                                command=lambda: self.export_purchases("allocations", "full"))
+        export_button.config(menu=export_menu)
+        export_button.pack(side=tk.RIGHT, padx=5)
 
         # Populate the list initially
         self.refresh_purchase_list()
@@ -152,197 +168,57 @@ class PurchaseListView:
         # Refresh the list with the new sort
         self.refresh_purchase_list()
 
+    def list_criteria(self):
+        """The filter, search and sort of the list on screen, as controller arguments"""
+        return {
+            "status": self.status_filter,
+            "search": self.search_text,
+            "search_field": self.search_field,
+            "sort_column": self.sort_column,
+            "sort_reverse": self.sort_reverse,
+        }
+
     def refresh_purchase_list(self):
         """Refresh the purchase list in the treeview"""
         self.purchase_tree.delete(*self.purchase_tree.get_children())
 
-        # Get purchases from controller
-        purchases = self.controllers["purchase"].get_all_purchases()
-
-        # Sort purchases if a sort column is selected
-        if self.sort_column:
-            # Handle potential None values or type mismatches during sort
-            try:
-                if self.sort_column == "Order #":
-                    purchases.sort(key=lambda x: x.order_number or '', reverse=self.sort_reverse)
-                elif self.sort_column == "Vendor":
-                    purchases.sort(key=lambda x: x.vendor_name or '', reverse=self.sort_reverse)
-                elif self.sort_column == "Date":
-                    purchases.sort(key=lambda x: x.date or '', reverse=self.sort_reverse)
-                elif self.sort_column == "Total":
-                    purchases.sort(key=lambda x: x.get_total() or 0.0, reverse=self.sort_reverse)
-                elif self.sort_column == "Status":
-                    purchases.sort(key=lambda x: x.get_status() or '', reverse=self.sort_reverse)
-            except Exception as e:
-                print(f"Error sorting purchases: {e}") # Log error, continue without sorting
-
+        # Totals, statuses, filtering and sorting are done by the database
+        try:
+            rows = self.controllers["purchase"].get_purchase_listing(**self.list_criteria())
+        except Exception as e:
+            print(f"Error loading purchases: {e}")
+            rows = []
 
         # Insert purchase data into treeview
-        for i, purchase in enumerate(purchases):
-            try:
-                total = purchase.get_total()
-                status = purchase.get_status()
-            except Exception as e:
-                print(f"Error processing purchase {purchase.id} for display: {e}")
-                total = 0.0 # Default values on error
-                status = "Error"
-
-
+        for i, row in enumerate(rows):
             row_tag = 'evenrow' if i % 2 == 0 else 'oddrow'
             # Add status tag
-            if status == "Pending":
+            if row.status == "Pending":
                 status_tag = 'pending'
-            elif status == "Partial":
+            elif row.status == "Partial":
                 status_tag = 'partial'
-            else: # Received or Error
+            else: # Received
                 status_tag = 'approved'
 
             self.purchase_tree.insert("", "end", values=(
-                purchase.id or "N/A",
-                purchase.order_number or "N/A",
-                purchase.vendor_name or "N/A",
-                purchase.date or "N/A",
-                f"${total:.2f}",
-                status
+                row.id or "N/A",
+                row.order_number or "N/A",
+                row.vendor_name or "N/A",
+                row.date or "N/A",
+                f"${row.total:.2f}",
+                row.status
             ), tags=(row_tag, status_tag))
 
     def filter_by_status(self, status_filter):
         """Filter purchases by status"""
-        self.purchase_tree.delete(*self.purchase_tree.get_children())
-
-        # Get all purchases
-        purchases = self.controllers["purchase"].get_all_purchases()
-        filtered = []
-
-        if status_filter == "All":
-            filtered = purchases
-        else:
-            for purchase in purchases:
-                try:
-                    purchase_status = purchase.get_status()
-                    if status_filter == purchase_status:
-                        filtered.append(purchase)
-                except Exception as e:
-                     print(f"Error getting status for purchase {purchase.id} during filter: {e}")
-
-        # Display filtered purchases
-        for i, purchase in enumerate(filtered):
-            try:
-                total = purchase.get_total()
-                status_text = purchase.get_status()
-            except Exception as e:
-                print(f"Error processing purchase {purchase.id} for display: {e}")
-                total = 0.0 # Default values on error
-                status_text = "Error"
-
-            row_tag = 'evenrow' if i % 2 == 0 else 'oddrow'
-            # Add status tag
-            if status_text == "Pending":
-                status_tag = 'pending'
-            elif status_text == "Partial":
-                status_tag = 'partial'
-            else: # Received or Error
-                status_tag = 'approved'
-
-            self.purchase_tree.insert("", "end", values=(
-                purchase.id or "N/A",
-                purchase.order_number or "N/A",
-                purchase.vendor_name or "N/A",
-                purchase.date or "N/A",
-                f"${total:.2f}",
-                status_text
-            ), tags=(row_tag, status_tag))
+        self.status_filter = status_filter
+        self.refresh_purchase_list()
 
     def perform_search(self):
         """Search purchases based on criteria"""
-        search_text = self.search_var.get().lower().strip()
-        search_field = self.search_option_var.get()
-
-        if not search_text:
-            self.refresh_purchase_list()
-            return
-
-        # Get all purchases
-        all_purchases = self.controllers["purchase"].get_all_purchases()
-        filtered_purchases = []
-
-        for purchase in all_purchases:
-            try:
-                match = False
-                order_num = (purchase.order_number or "").lower()
-                vendor_name = (purchase.vendor_name or "").lower()
-                date_str = (purchase.date or "").lower()
-                status_str = (purchase.get_status() or "").lower()
-
-                if search_field == "All Fields":
-                    # Search all relevant fields
-                    if (search_text in order_num or
-                        search_text in vendor_name or
-                        search_text in date_str or
-                        search_text in status_str):
-                         match = True
-                elif search_field == "Order #" and search_text in order_num:
-                    match = True
-                elif search_field == "Vendor" and search_text in vendor_name:
-                    match = True
-                elif search_field == "Date" and search_text in date_str:
-                     match = True
-                elif search_field == "Status" and search_text in status_str:
-                    match = True
-
-                if match:
-                    filtered_purchases.append(purchase)
-            except Exception as e:
-                print(f"Error during search processing for purchase {purchase.id}: {e}")
-
-
-        # Sort filtered purchases (reuse sorting logic from refresh_purchase_list)
-        if self.sort_column:
-             # Handle potential None values or type mismatches during sort
-            try:
-                if self.sort_column == "Order #":
-                    filtered_purchases.sort(key=lambda x: x.order_number or '', reverse=self.sort_reverse)
-                elif self.sort_column == "Vendor":
-                    filtered_purchases.sort(key=lambda x: x.vendor_name or '', reverse=self.sort_reverse)
-                elif self.sort_column == "Date":
-                    filtered_purchases.sort(key=lambda x: x.date or '', reverse=self.sort_reverse)
-                elif self.sort_column == "Total":
-                    filtered_purchases.sort(key=lambda x: x.get_total() or 0.0, reverse=self.sort_reverse)
-                elif self.sort_column == "Status":
-                    filtered_purchases.sort(key=lambda x: x.get_status() or '', reverse=self.sort_reverse)
-            except Exception as e:
-                print(f"Error sorting search results: {e}") # Log error, continue without sorting
-
-
-        # Display filtered results
-        self.purchase_tree.delete(*self.purchase_tree.get_children())
-
-        for i, purchase in enumerate(filtered_purchases):
-            try:
-                total = purchase.get_total()
-                status = purchase.get_status()
-            except Exception as e:
-                print(f"Error processing purchase {purchase.id} for display: {e}")
-                total = 0.0 # Default values on error
-                status = "Error"
-
-            row_tag = 'evenrow' if i % 2 == 0 else 'oddrow'
-            # Add status tag
-            if status == "Pending":
-                status_tag = 'pending'
-            elif status == "Partial":
-                status_tag = 'partial'
-            else: # Received or Error
-                status_tag = 'approved'
-
-            self.purchase_tree.insert("", "end", values=(
-                purchase.id or "N/A",
-                purchase.order_number or "N/A",
-                purchase.vendor_name or "N/A",
-                purchase.date or "N/A",
-                f"${total:.2f}",
-                status
-            ), tags=(row_tag, status_tag))
+        self.search_text = self.search_var.get().lower().strip()
+        self.search_field = self.search_option_var.get()
+        self.refresh_purchase_list()
 
     def view_purchase_details(self):
         """View details of selected purchase"""
@@ -606,9 +482,9 @@ class PurchaseListView:
                   messagebox.showerror("Error", "No item selected", parent=receive_window)
                   return
 
-             indices_to_update = [int(iid) for iid in selected_iids]
+             item_ids = [line_items_with_index[int(iid)][1].id for iid in selected_iids]
 
-             success = self.controllers["purchase"].receive_items(purchase.id, indices_to_update, receive_flag)
+             success, _, _ = self.controllers["purchase"].receive_line_items(item_ids, receive_flag)
 
              if success:
                   # Update display in the popup window
@@ -634,8 +510,8 @@ class PurchaseListView:
 
 
         def receive_all():
-             all_indices = list(range(len(purchase.line_items)))
-             success = self.controllers["purchase"].receive_items(purchase.id, all_indices, True)
+             all_item_ids = [item.id for _, item in line_items_with_index]
+             success, _, _ = self.controllers["purchase"].receive_line_items(all_item_ids, True)
 
              if success:
                  # Update display in the popup window
@@ -665,33 +541,59 @@ class PurchaseListView:
         tk.Button(button_frame, text="Close", command=receive_window.destroy).pack(side=tk.RIGHT, padx=5)
 
 
-    def export_purchases(self):
-        """Export purchases to CSV file"""
+    def export_purchases(self, detail=None, columns="standard"):
+        """
+        Export the purchases on screen (same filter, search and sort) to CSV:
+        one row per purchase, or per line item / budget allocation when
+        detail is "line_items" / "allocations"
+        """
+        from views.widgets.progress_dialog import ProgressDialog
+        from utils.background import run_in_background
+        title, noun, initial_file = {
+            None: ("Purchases", "purchases", "purchase_export.csv"),
+            "line_items": ("Line Items", "line items", "line_item_export.csv"),
+            "allocations": ("Budget Allocations", "allocations", "allocation_export.csv"),
+        }[detail]
         file_path = filedialog.asksaveasfilename(
             defaultextension=".csv",
-            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
-            initialfile="purchase_export.csv", # Suggest a filename
-            title="Export Purchases to CSV"
+            filetypes=[("CSV files", "*.csv"), ("Compressed CSV files", "*.csv.gz"), ("All files", "*.*")],
+            initialfile=initial_file, # Suggest a filename
+            title=f"Export {title} to CSV"
         )
 
         if not file_path:
             return
 
-        # Get purchases currently displayed (could be filtered/sorted)
-        # For simplicity, exporting all purchases for now.
-        # To export only displayed items:
-        # displayed_ids = [self.purchase_tree.item(item, "values")[0] for item in self.purchase_tree.get_children()]
-        # purchases_to_export = [p for p in self.controllers["purchase"].get_all_purchases() if p.id in displayed_ids]
-        purchases_to_export = self.controllers["purchase"].get_all_purchases()
+        dialog = ProgressDialog(self.frame, f"Exporting {title}", f"Counting {noun}...")
+
+        def progress(written, total):
+            if total:
+                dialog.report(written / total, f"{written:,} of {total:,} {noun} written")
+            else:
+                dialog.report(None, f"{written:,} {noun} written")
 
+        def finished(result):
+            dialog.close()
+            success, message = result
+            if success:
+                messagebox.showinfo("Export Successful", message)
+            elif not dialog.cancel_event.is_set():
+                messagebox.showerror("Export Failed", message)
 
-        # Export to CSV
-        success, message = CSVExporter.export_purchases(purchases_to_export, file_path)
+        def failed(error):
+            dialog.close()
+            messagebox.showerror("Export Failed", f"Export failed: {error}")
 
-        if success:
-            messagebox.showinfo("Export Successful", message)
+        controller = self.controllers["purchase"]
+        if detail is None:
+            export, args = controller.export_purchases_csv, (file_path,)
         else:
-            messagebox.showerror("Export Failed", message)
+            export, args = controller.export_purchase_details, (file_path, detail, columns)
+
+        # Export in the background, streaming rows straight from the database
+        run_in_background(self.frame, export, finished, *args, error_callback=failed,
+                          progress_callback=progress, cancel_event=dialog.cancel_event,
+                          **self.list_criteria())
 
     def return_to_dashboard(self):
         """Return to main dashboard using ViewFactory"""
@@ -998,7 +900,8 @@ class PurchaseFormView:
             "quantity_var": qty_var,
             "price_var": price_var,
             "total_var": total_var,
-            "received_var": rcvd_var # Keep track even if not displayed
+            "received_var": rcvd_var, # Keep track even if not displayed
+            "id": item_obj.id if item_obj else None # Lets the controller update the row in place
         }
 
         def remove_row():
@@ -1117,10 +1020,9 @@ class PurchaseFormView:
             vendor_name = self.vendor_var.get()
             if not vendor_name: raise ValueError("Vendor is required.")
 
-            # Correct way to get vendor_id
-            selected_vendor = next((v for v in self.controllers["vendor"].get_all_vendors() if v.name == vendor_name), None)
-            if not selected_vendor: raise ValueError(f"Selected vendor '{vendor_name}' not found.")
-            vendor_id = selected_vendor.id
+            # Resolve the vendor id from the cached name index
+            vendor_id = self.controllers["vendor"].get_vendor_id_by_name(vendor_name)
+            if not vendor_id: raise ValueError(f"Selected vendor '{vendor_name}' not found.")
 
 
             # --- Gather and Validate Line Items ---
@@ -1142,6 +1044,7 @@ class PurchaseFormView:
                       raise ValueError(f"Line Item #{i+1}: Unit Price must be a valid number.")
 
                  parsed_items.append({
+                      "id": item_dict["id"],
                       "description": desc,
                       "quantity": qty,
                       "unit_price": price,
@@ -1202,21 +1105,23 @@ class PurchaseFormView:
                  purchase_data["status"] = self.purchase.status
                  purchase_data["approver"] = self.purchase.approver
                  purchase_data["approval_date"] = self.purchase.approval_date
-                 success = self.controllers["purchase"].update_purchase(self.purchase.id, purchase_data)
-                 message = "Purchase updated successfully."
+                 # The message says which rows changed, or why the update failed
+                 success, message, _ = self.controllers["purchase"].update_purchase_diff(
+                     self.purchase.id, purchase_data)
+                 error = message
             else:
                  # New purchases default to Pending
                  purchase_data["status"] = "Pending"
                  success = self.controllers["purchase"].add_purchase(purchase_data)
                  message = "Purchase added successfully."
+                 error = "Failed to save purchase. Check console for details."
 
             # --- Handle Success or Failure ---
             if success:
                  messagebox.showinfo("Success", message)
                  self.return_to_purchase_list() # Go back to list view
             else:
-                 # The controller might return a more specific error message
-                 messagebox.showerror("Error", "Failed to save purchase. Check console for details.")
+                 messagebox.showerror("Error", error)
 
 
         except ValueError as ve:
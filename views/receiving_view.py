@@ -72,6 +72,8 @@ class ReceivingDashboardView:
         # CORRECTED: Button now calls self.open_receive_dialog
         tk.Button(button_frame, text="Receive Selected Items",
                   command=self.open_receive_dialog).pack(side=tk.LEFT, padx=5)
+        tk.Button(button_frame, text="Scan Mode",
+                  command=self.open_scan_session).pack(side=tk.LEFT, padx=5)
         # Renamed refresh button for clarity
         tk.Button(button_frame, text="Refresh List",
                   command=self.refresh_pending_list).pack(side=tk.LEFT, padx=5)
@@ -148,9 +150,7 @@ class ReceivingDashboardView:
                          item.description for item in purchase.line_items
                          if hasattr(item, 'received') and not item.received
                      ]
-                     pending_text = ", ".join(pending_items)
-                     if len(pending_text) > 50:
-                         pending_text = pending_text[:47] + "..."
+                     pending_text = self._pending_items_text(pending_items)
                 elif not purchase.line_items:
                      pending_text = "No items found"
 
@@ -159,7 +159,7 @@ class ReceivingDashboardView:
                 row_tag = 'evenrow' if i % 2 == 0 else 'oddrow'
                 status_tag = 'pending' if isinstance(days_outstanding, int) and days_outstanding > 14 else 'partial'
 
-                self.pending_tree.insert("", "end", values=(
+                self.pending_tree.insert("", "end", iid=purchase.id, values=(
                     purchase.id,
                     purchase.order_number or "N/A",
                     purchase.vendor_name or "N/A",
@@ -258,11 +258,11 @@ class ReceivingDashboardView:
                 messagebox.showerror("Error", "No items selected from the list.", parent=receive_window)
                 return
 
-            # Convert tree iids (strings) back to integer indices
-            indices_to_update = [int(iid) for iid in selected_iids]
+            # Tree iids are indices into line_items_with_index
+            item_ids = [line_items_with_index[int(iid)][1].id for iid in selected_iids]
 
             # Call controller method
-            success = self.controllers["purchase"].receive_items(purchase.id, indices_to_update, receive_flag)
+            success, _, _ = self.controllers["purchase"].receive_line_items(item_ids, receive_flag)
 
             if success:
                 # Update the display within the dialog's treeview
@@ -288,8 +288,8 @@ class ReceivingDashboardView:
 
         def receive_all_items():
             """Marks all items for this purchase as received."""
-            all_indices = list(range(len(purchase.line_items)))
-            success = self.controllers["purchase"].receive_items(purchase.id, all_indices, True)
+            all_item_ids = [item.id for _, item in line_items_with_index]
+            success, _, _ = self.controllers["purchase"].receive_line_items(all_item_ids, True)
 
             if success:
                  # Update the display of all items in the dialog's treeview
@@ -320,6 +320,131 @@ class ReceivingDashboardView:
         tk.Button(button_frame, text="Close", command=receive_window.destroy).pack(side=tk.RIGHT, padx=5)
 
 
+    @staticmethod
+    def _pending_items_text(descriptions):
+        """Items column text: the descriptions still to receive, shortened"""
+        pending_text = ", ".join(descriptions)
+        if len(pending_text) > 50:
+            pending_text = pending_text[:47] + "..."
+        return pending_text
+
+    def _update_pending_row(self, purchase_id, remaining_items):
+        """Show a purchase's remaining items without reloading the list; drop it when nothing is left"""
+        if not self.pending_tree.exists(purchase_id):
+            return
+        if not remaining_items:
+            self.pending_tree.delete(purchase_id)
+            return
+        values = list(self.pending_tree.item(purchase_id, "values"))
+        values[4] = self._pending_items_text(item["description"] for item in remaining_items.values())
+        self.pending_tree.item(purchase_id, values=values)
+
+    def open_scan_session(self):
+        """Opens a window for receiving items one scan at a time (order number and line)."""
+        from controllers.receiving_session import ReceivingSession
+
+        session = ReceivingSession(self.controllers["purchase"])
+        success, message = session.start()
+        if not success:
+            messagebox.showerror("Error", message)
+            return
+        if message != "No unsaved scans":
+            messagebox.showinfo("Receiving Session", message)
+            self.refresh_pending_list()
+
+        scan_window = tk.Toplevel(self.parent)
+        scan_window.title("Receiving Session")
+        scan_window.geometry("750x500")
+        scan_window.transient(self.parent)
+
+        main_frame = tk.Frame(scan_window)
+        main_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
+
+        tk.Label(main_frame, text="Scan <order number>/<line>",
+                 font=("Arial", 14, "bold")).pack(anchor="w", pady=(0, 10))
+
+        scan_var = tk.StringVar()
+        scan_entry = tk.Entry(main_frame, textvariable=scan_var, font=("Arial", 14))
+        scan_entry.pack(fill=tk.X)
+        scan_entry.focus_set()
+
+        feedback_label = tk.Label(main_frame, text="", anchor="w")
+        feedback_label.pack(fill=tk.X, pady=5)
+
+        # Latest scans first; iid is the scan's sequence number
+        columns = ("Time", "Order #", "Line", "Description", "Quantity", "State")
+        scans_tree = ttk.Treeview(main_frame, columns=columns, show="headings")
+        for col in columns:
+            scans_tree.heading(col, text=col)
+        scans_tree.column("Time", width=70)
+        scans_tree.column("Order #", width=100)
+        scans_tree.column("Line", width=50, anchor="center")
+        scans_tree.column("Description", width=280)
+        scans_tree.column("Quantity", width=70, anchor="e")
+        scans_tree.column("State", width=80, anchor="center")
+        scans_tree = configure_treeview(scans_tree)
+        scans_tree.pack(fill=tk.BOTH, expand=True, pady=5)
+
+        status_label = tk.Label(main_frame, text="0 queued, 0 saved", anchor="w")
+        status_label.pack(fill=tk.X)
+
+        unsaved = []  # Sequence numbers shown as Queued
+
+        def submit_scan(event=None):
+            text = scan_var.get()
+            scan_var.set("")
+            if not text.strip():
+                return
+            try:
+                order_number, line = ReceivingSession.parse_scan(text)
+                success, message, item = session.scan(order_number, line)
+            except ValueError as e:
+                success, message = False, str(e)
+            if not success:
+                feedback_label.config(text=message, fg="red")
+                scan_window.bell()
+                return
+
+            feedback_label.config(text=message, fg="dark green")
+            scans_tree.insert("", 0, iid=str(item["seq"]), values=(
+                datetime.now().strftime("%H:%M:%S"),
+                order_number,
+                line,
+                item["description"],
+                item["quantity"],
+                "Queued"
+            ), tags=('pending',))
+            unsaved.append(item["seq"])
+            self._update_pending_row(item["purchase_id"], session.remaining_items(order_number))
+
+        def poll():
+            if not scan_window.winfo_exists():
+                return
+            while unsaved and unsaved[0] <= session.saved_through:
+                seq = str(unsaved.pop(0))
+                scans_tree.item(seq, values=scans_tree.item(seq, "values")[:5] + ("Saved",), tags=('approved',))
+            for purchase_id, rollup in session.collect_results().items():
+                if rollup["status"] == "Received" and self.pending_tree.exists(purchase_id):
+                    self.pending_tree.delete(purchase_id)
+            queued, saved, error = session.status()
+            status_text = f"{queued} queued, {saved} saved"
+            if error:
+                status_text += f" - saving failed, will retry: {error}"
+            status_label.config(text=status_text, fg="red" if error else "black")
+            scan_window.after(250, poll)
+
+        def close_session():
+            success, message = session.close()
+            if not success:
+                messagebox.showerror("Receiving Session", message, parent=scan_window)
+            scan_window.destroy()
+
+        scan_entry.bind("<Return>", submit_scan)
+        scan_window.protocol("WM_DELETE_WINDOW", close_session)
+        tk.Button(main_frame, text="Finish", command=close_session).pack(anchor="e", pady=(10, 0))
+        poll()
+
+
     # Removed the old refresh_dashboard method, replaced by refresh_pending_list
     # def refresh_dashboard(self): ...
 
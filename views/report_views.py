@@ -1,10 +1,35 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 from datetime import datetime
-from utils.chart_utils import ChartGenerator
+from views.widgets.chart_panel import ChartPanel
 from utils.table_utils import configure_treeview
 from views.view_factory import ViewFactory
 
+def export_pdf_in_background(widget, method_name, file_path, *args):
+    """Render a PDFExporter report in a separate process behind a progress window"""
+    from utils.background import run_in_background
+    from utils.pdf_exporter import export_in_process
+    from views.widgets.progress_dialog import ProgressDialog
+
+    dialog = ProgressDialog(widget, "Exporting PDF", "Laying out the report...")
+
+    def finished(result):
+        dialog.close()
+        success, message = result
+        if success:
+            messagebox.showinfo("Export Successful", message)
+        elif not dialog.cancel_event.is_set():
+            messagebox.showerror("Export Failed", message)
+
+    def failed(error):
+        dialog.close()
+        messagebox.showerror("Export Failed", f"Export failed: {error}")
+
+    run_in_background(widget, export_in_process, finished, method_name, *args, file_path=file_path,
+                      error_callback=failed, progress_callback=dialog.report, cancel_event=dialog.cancel_event,
+                      poll_ms=100)
+
+
 class BudgetReportView:
     def __init__(self, parent, controllers, show_view_callback):
         self.parent = parent
@@ -13,6 +38,15 @@ class BudgetReportView:
 
         self.current_year = datetime.now().year
 
+        # Chart panels are created once and updated in place on year changes
+        self.vs_actual_frame = None
+        self.vs_actual_chart = None
+        self.monthly_frame = None
+        self.monthly_chart = None
+
+        # Tabs that need re-rendering
+        self.stale_tabs = set()
+
         self.frame = tk.Frame(parent)
         self.setup_ui()
 
@@ -54,6 +88,14 @@ class BudgetReportView:
         self.monthly_tab = tk.Frame(self.notebook)
         self.notebook.add(self.monthly_tab, text="Monthly Breakdown")
 
+        # Tabs are only rendered when they are visible
+        self.tab_renderers = {
+            str(self.summary_tab): self.update_summary_tab,
+            str(self.vs_actual_tab): self.update_vs_actual_tab,
+            str(self.monthly_tab): self.update_monthly_tab,
+        }
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+
         # Export button
         self.export_btn = tk.Button(self.frame, text="Export Report", command=self.export_report)
         self.export_btn.pack(pady=10)
@@ -62,20 +104,25 @@ class BudgetReportView:
         self.year_var.trace_add("write", self.update_reports)
 
     def update_reports(self, *args):
-        """Update all report tabs when year changes"""
-        self.update_summary_tab()
-        self.update_vs_actual_tab()
-        self.update_monthly_tab()
-
-    def update_summary_tab(self):
-        """Update budget summary tab"""
-        # Clear existing widgets
-        for widget in self.summary_tab.winfo_children():
-            widget.destroy()
-
-        # Get budget data
-        selected_year = int(self.year_var.get())
-
+        """Mark all report tabs stale when the year changes and render the visible one"""
+        self.stale_tabs = set(self.tab_renderers)
+        self.render_current_tab()
+
+    def on_tab_changed(self, event=None):
+        """Render the newly selected tab if its data is out of date"""
+        self.render_current_tab()
+
+    def render_current_tab(self):
+        tab = self.notebook.select()
+        if tab in self.stale_tabs:
+            self.stale_tabs.discard(tab)
+            self.tab_renderers[tab]()
+
+    def get_year_data(self, name, year):
+        """
+        Return report data for a year. The controllers cache it until the
+        year's data changes, so every tab and the export can ask again.
+        """
         # Make sure controllers are set correctly
         if self.controllers["budget"].purchase_controller is None:
             self.controllers["budget"].set_purchase_controller(self.controllers["purchase"])
@@ -87,7 +134,21 @@ class BudgetReportView:
                 self.controllers["vendor"]
             )
 
-        budget_data = self.controllers["report"].generate_budget_summary(selected_year)
+        if name == "budget_usage":
+            return self.controllers["report"].generate_budget_summary(year)
+        if name == "monthly_spending":
+            return self.controllers["report"].generate_monthly_spending(year)
+        raise ValueError(f"Unknown report dataset: {name}")
+
+    def update_summary_tab(self):
+        """Update budget summary tab"""
+        # Clear existing widgets
+        for widget in self.summary_tab.winfo_children():
+            widget.destroy()
+
+        # Get budget data
+        selected_year = int(self.year_var.get())
+        budget_data = self.get_year_data("budget_usage", selected_year)
 
         # Create summary frame
         summary_frame = tk.Frame(self.summary_tab)
@@ -141,73 +202,55 @@ class BudgetReportView:
 
     def update_vs_actual_tab(self):
         """Update budget vs. actual tab with chart"""
-        # Clear existing widgets
-        for widget in self.vs_actual_tab.winfo_children():
-            widget.destroy()
-
-        # Get budget data
+        # Get budget data (shared with the summary tab)
         selected_year = int(self.year_var.get())
+        budget_data = self.get_year_data("budget_usage", selected_year)
 
-        # Make sure controllers are set
-        if self.controllers["budget"].purchase_controller is None:
-            self.controllers["budget"].set_purchase_controller(self.controllers["purchase"])
-
-        budget_data = self.controllers["budget"].calculate_budget_usage(selected_year)
-
-        # Create chart frame
-        chart_frame = tk.Frame(self.vs_actual_tab)
-        chart_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        # Create chart frame and message label once, charts are updated in place
+        if self.vs_actual_frame is None:
+            self.vs_actual_frame = tk.Frame(self.vs_actual_tab)
+            self.vs_actual_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+            self.vs_actual_message = tk.Label(self.vs_actual_frame,
+                                              text="No budget data available for selected year")
 
         # Create chart only if we have data
         if budget_data:
-            # Create chart using ChartGenerator
-            canvas = ChartGenerator.create_budget_usage_chart(
-                chart_frame,
-                budget_data,
-                f'Budget vs. Actual Spending - {selected_year}'
-            )
-            # Display the chart
-            canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+            if self.vs_actual_chart is None:
+                self.vs_actual_chart = ChartPanel(self.vs_actual_frame, "budget_usage")
+            self.vs_actual_chart.update(budget_data, f'Budget vs. Actual Spending - {selected_year}')
+            self.vs_actual_message.pack_forget()
+            self.vs_actual_chart.frame.pack(fill=tk.BOTH, expand=True)
         else:
             # No data message
-            tk.Label(chart_frame, text="No budget data available for selected year").pack(pady=20)
+            if self.vs_actual_chart is not None:
+                self.vs_actual_chart.frame.pack_forget()
+            self.vs_actual_message.pack(pady=20)
 
     def update_monthly_tab(self):
         """Update monthly breakdown tab with chart"""
-        # Clear existing widgets
-        for widget in self.monthly_tab.winfo_children():
-            widget.destroy()
-
         # Get monthly data
         selected_year = int(self.year_var.get())
+        monthly_data = self.get_year_data("monthly_spending", selected_year)
 
-        # Make sure controllers are set
-        if self.controllers["report"].purchase_controller is None:
-            self.controllers["report"].set_controllers(
-                self.controllers["purchase"],
-                self.controllers["budget"],
-                self.controllers["vendor"]
-            )
-
-        monthly_data = self.controllers["report"].generate_monthly_spending(selected_year)
-
-        # Create chart frame
-        chart_frame = tk.Frame(self.monthly_tab)
-        chart_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        # Create chart frame and message label once, charts are updated in place
+        if self.monthly_frame is None:
+            self.monthly_frame = tk.Frame(self.monthly_tab)
+            self.monthly_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+            self.monthly_message = tk.Label(self.monthly_frame,
+                                            text="No spending data available for selected year")
 
         # Create chart only if we have data
         if monthly_data and sum(item["amount"] for item in monthly_data) > 0:
-            # Create chart using ChartGenerator
-            canvas = ChartGenerator.create_monthly_spending_chart(
-                chart_frame,
-                monthly_data,
-                f'Monthly Spending - {selected_year}'
-            )
-            # Display the chart
-            canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+            if self.monthly_chart is None:
+                self.monthly_chart = ChartPanel(self.monthly_frame, "monthly_spending")
+            self.monthly_chart.update(monthly_data, f'Monthly Spending - {selected_year}')
+            self.monthly_message.pack_forget()
+            self.monthly_chart.frame.pack(fill=tk.BOTH, expand=True)
         else:
             # No data message
-            tk.Label(chart_frame, text="No spending data available for selected year").pack(pady=20)
+            if self.monthly_chart is not None:
+                self.monthly_chart.frame.pack_forget()
+            self.monthly_message.pack(pady=20)
 
     def export_report(self):
         """Export budget report to CSV or PDF"""
@@ -228,32 +271,20 @@ class BudgetReportView:
 
             # Get report data
             selected_year = int(self.year_var.get())
-            budget_data = self.controllers["budget"].calculate_budget_usage(selected_year)
-            monthly_data = self.controllers["report"].generate_monthly_spending(selected_year)
-
-            # Import PDF exporter
-            from utils.pdf_exporter import PDFExporter
-            success, message = PDFExporter.export_budget_report(budget_data, monthly_data, selected_year, file_path)
+            budget_data = self.get_year_data("budget_usage", selected_year)
+            monthly_data = self.get_year_data("monthly_spending", selected_year)
 
-        else:
-            # CSV export
-            file_path = filedialog.asksaveasfilename(
-                defaultextension=".csv",
-                filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
-                title="Export Budget Report as CSV"
-            )
-
-            if not file_path:
-                return
-
-            # Export report
-            selected_year = int(self.year_var.get())
-            success, message = self.controllers["report"].export_budget_report(selected_year, file_path)
+            # Render in a separate process; large reports take a while
+            export_pdf_in_background(self.frame, "export_budget_report", file_path,
+                                     budget_data, monthly_data, selected_year)
+            return
 
-        if success:
-            messagebox.showinfo("Export Successful", message)
-        else:
-            messagebox.showerror("Export Failed", message)
+        # CSV export
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
+            title="Export Budget Report as CSV"
+        )
 
         if not file_path:
             return
@@ -275,13 +306,22 @@ class BudgetReportView:
 
     def show(self):
         """Show this view"""
-        self.update_reports()
+        self.update_reports() # Data may have changed while the view was hidden
         self.frame.pack(fill=tk.BOTH, expand=True)
 
     def hide(self):
         """Hide this view"""
         self.frame.pack_forget()
 
+    def destroy(self):
+        """Release chart panels and destroy this view"""
+        for chart in (self.vs_actual_chart, self.monthly_chart):
+            if chart is not None:
+                chart.destroy()
+        self.vs_actual_chart = None
+        self.monthly_chart = None
+        self.frame.destroy()
+
 
 class VendorReportView:
     def __init__(self, parent, controllers, show_view_callback):
@@ -291,6 +331,14 @@ class VendorReportView:
 
         self.current_year = datetime.now().year
 
+        # Spending table and chart are created once and updated in place
+        self.spending_tree = None
+        self.spending_chart_frame = None
+        self.spending_chart = None
+
+        # Tabs that need re-rendering
+        self.stale_tabs = set()
+
         self.frame = tk.Frame(parent)
         self.setup_ui()
 
@@ -328,6 +376,13 @@ class VendorReportView:
         self.performance_tab = tk.Frame(self.notebook)
         self.notebook.add(self.performance_tab, text="Vendor Performance")
 
+        # Tabs are only rendered when they are visible
+        self.tab_renderers = {
+            str(self.spending_tab): self.update_spending_tab,
+            str(self.performance_tab): self.update_performance_tab,
+        }
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+
         # Export button
         self.export_btn = tk.Button(self.frame, text="Export Report", command=self.export_report)
         self.export_btn.pack(pady=10)
@@ -336,19 +391,22 @@ class VendorReportView:
         self.year_var.trace_add("write", self.update_reports)
 
     def update_reports(self, *args):
-        """Update all report tabs when year changes"""
-        self.update_spending_tab()
-        self.update_performance_tab()
-
-    def update_spending_tab(self):
-        """Update vendor spending tab"""
-        # Clear existing widgets
-        for widget in self.spending_tab.winfo_children():
-            widget.destroy()
-
-        # Get vendor data
-        selected_year = int(self.year_var.get())
-
+        """Mark all report tabs stale when the year changes and render the visible one"""
+        self.stale_tabs = set(self.tab_renderers)
+        self.render_current_tab()
+
+    def on_tab_changed(self, event=None):
+        """Render the newly selected tab if its data is out of date"""
+        self.render_current_tab()
+
+    def render_current_tab(self):
+        tab = self.notebook.select()
+        if tab in self.stale_tabs:
+            self.stale_tabs.discard(tab)
+            self.tab_renderers[tab]()
+
+    def get_vendor_data(self, year):
+        """Return vendor spending for a year (cached by the controller until the year's data changes)"""
         # Make sure controllers are set
         if self.controllers["report"].purchase_controller is None:
             self.controllers["report"].set_controllers(
@@ -356,9 +414,43 @@ class VendorReportView:
                 self.controllers["budget"],
                 self.controllers["vendor"]
             )
+        return self.controllers["report"].generate_vendor_spending(year)
+
+    def update_spending_tab(self):
+        """Update vendor spending tab"""
+        # Get vendor data
+        selected_year = int(self.year_var.get())
+        vendor_data = self.get_vendor_data(selected_year)
+
+        # Build the table and chart frames once, later updates reuse them
+        if self.spending_tree is None:
+            self.setup_spending_tab()
 
-        vendor_data = self.controllers["report"].generate_vendor_spending(selected_year)
+        self.spending_tree.delete(*self.spending_tree.get_children())
 
+        for i, data in enumerate(vendor_data):
+            row_tag = 'evenrow' if i % 2 == 0 else 'oddrow'
+            
+            self.spending_tree.insert("", "end", values=(
+                data["name"],
+                f"${data['total_spent']:,.2f}",
+                data["purchase_count"],
+                f"${data['avg_order']:,.2f}"
+            ), tags=(row_tag,))
+
+        # Update pie chart of vendor spending
+        if vendor_data:
+            if self.spending_chart is None:
+                self.spending_chart = ChartPanel(self.spending_chart_frame, "pie",
+                                                 label_field="name", value_field="total_spent")
+                self.spending_chart.frame.pack(fill=tk.BOTH, expand=True)
+            self.spending_chart.update(vendor_data, f'Vendor Spending Distribution - {selected_year}')
+            self.spending_chart_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        else:
+            self.spending_chart_frame.pack_forget()
+
+    def setup_spending_tab(self):
+        """Create the vendor spending table and chart frame"""
         # Create spending frame
         spending_frame = tk.Frame(self.spending_tab)
         spending_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
@@ -381,31 +473,8 @@ class VendorReportView:
         scrollbar.pack(side="right", fill="y")
         spending_tree.pack(fill="both", expand=True)
 
-        for i, data in enumerate(vendor_data):
-            row_tag = 'evenrow' if i % 2 == 0 else 'oddrow'
-            
-            spending_tree.insert("", "end", values=(
-                data["name"],
-                f"${data['total_spent']:,.2f}",
-                data["purchase_count"],
-                f"${data['avg_order']:,.2f}"
-            ), tags=(row_tag,))
-
-        # Create pie chart of vendor spending
-        if vendor_data:
-            chart_frame = tk.Frame(self.spending_tab)
-            chart_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-
-            # Create chart using ChartGenerator
-            canvas = ChartGenerator.create_pie_chart(
-                chart_frame,
-                vendor_data,
-                "name",
-                "total_spent",
-                f'Vendor Spending Distribution - {selected_year}'
-            )
-            # Display the chart
-            canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        self.spending_tree = spending_tree
+        self.spending_chart_frame = tk.Frame(self.spending_tab)
 
     def update_performance_tab(self):
         """Update vendor performance tab"""
@@ -418,14 +487,7 @@ class VendorReportView:
 
         # Here we'd normally have more performance metrics
         # For now, we'll just show the same data in a different way
-        if self.controllers["report"].purchase_controller is None:
-            self.controllers["report"].set_controllers(
-                self.controllers["purchase"],
-                self.controllers["budget"],
-                self.controllers["vendor"]
-            )
-
-        vendor_data = self.controllers["report"].generate_vendor_spending(selected_year)
+        vendor_data = self.get_vendor_data(selected_year)
 
         # Sort by average order value to show which vendors get larger orders
         vendor_data_sorted = sorted(vendor_data, key=lambda x: x["avg_order"], reverse=True)
@@ -472,7 +534,7 @@ class VendorReportView:
             tk.Label(self.performance_tab, text="No vendor data available for selected year").pack(pady=20)
 
     def export_report(self):
-        """Export budget report to CSV or PDF"""
+        """Export vendor report to CSV or PDF"""
         # Ask for export format
         export_format = messagebox.askquestion("Export Format",
                                                "Do you want to export as PDF? (No will export as CSV)")
@@ -482,48 +544,37 @@ class VendorReportView:
             file_path = filedialog.asksaveasfilename(
                 defaultextension=".pdf",
                 filetypes=[("PDF files", "*.pdf"), ("All files", "*.*")],
-                title="Export Budget Report as PDF"
+                title="Export Vendor Report as PDF"
             )
 
             if not file_path:
                 return
 
-            # Get report data
+            # Render in a separate process; a report with thousands of vendors takes a while
             selected_year = int(self.year_var.get())
-            budget_data = self.controllers["budget"].calculate_budget_usage(selected_year)
-            monthly_data = self.controllers["report"].generate_monthly_spending(selected_year)
-
-            # Import PDF exporter
-            from utils.pdf_exporter import PDFExporter
-            success, message = PDFExporter.export_budget_report(budget_data, monthly_data, selected_year, file_path)
+            export_pdf_in_background(self.frame, "export_vendor_report", file_path,
+                                     self.get_vendor_data(selected_year), selected_year)
+            return
 
-        else:
-            # CSV export
-            file_path = filedialog.asksaveasfilename(
-                defaultextension=".csv",
-                filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
-                title="Export Budget Report as CSV"
-            )
+        # CSV export
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
+            title="Export Vendor Report as CSV"
+        )
 
-            if not file_path:
-                return
+        if not file_path:
+            return
 
-            # Export report
-            selected_year = int(self.year_var.get())
-            success, message = self.controllers["report"].export_budget_report(selected_year, file_path)
+        # Export report
+        selected_year = int(self.year_var.get())
+        success, message = self.controllers["report"].export_vendor_report(selected_year, file_path)
 
         if success:
             messagebox.showinfo("Export Successful", message)
         else:
             messagebox.showerror("Export Failed", message)
 
-        if not file_path:
-            return
-
-        # Here we would normally call a report controller method
-        # Just show a success message for now
-        messagebox.showinfo("Export Successful", f"Vendor report exported to {file_path}")
-
     def return_to_dashboard(self):
         """Return to main dashboard"""
         from views.main_dashboard import MainDashboard
@@ -532,9 +583,16 @@ class VendorReportView:
 
     def show(self):
         """Show this view"""
-        self.update_reports()
+        self.update_reports() # Data may have changed while the view was hidden
         self.frame.pack(fill=tk.BOTH, expand=True)
 
     def hide(self):
         """Hide this view"""
-        self.frame.pack_forget()
\ No newline at end of file
+        self.frame.pack_forget()
+
+    def destroy(self):
+        """Release chart panels and destroy this view"""
+        if self.spending_chart is not None:
+            self.spending_chart.destroy()
+            self.spending_chart = None
+        self.frame.destroy()
\ No newline at end of file
@@ -0,0 +1,160 @@
+# views/widgets/chart_panel.py
+import base64
+import tkinter as tk
+from utils.chart_renderer import ChartRenderer
+
+
+class ChartPanel:
+    def __init__(self, parent, chart_type, default_size=(640, 480), dpi=100, renderer=None, **chart_options):
+        """
+        Display a chart as a pre-rendered image, with an interactive fallback
+
+        Args:
+            parent: Parent widget
+            chart_type: Chart type known to ChartRenderer ("budget_usage", "monthly_spending", "pie")
+            default_size: Image size in pixels used until the panel has been laid out
+            dpi: Resolution used for rendering
+            renderer: ChartRenderer to use (shared default renderer if None)
+            **chart_options: Extra options passed to the chart class
+        """
+        self.chart_type = chart_type
+        self.default_size = default_size
+        self.dpi = dpi
+        self.renderer = renderer or ChartRenderer.get_default()
+        self.chart_options = chart_options
+
+        self.interactive = False
+        self.chart = None  # Interactive chart, only created when the user asks for it
+        self.photo = None
+        self.data = None
+        self.title = ""
+        self._token = 0
+        self._size = None
+        self._resize_job = None
+
+        # Fixed-size frame so the image does not drive the layout
+        self.frame = tk.Frame(parent, width=default_size[0], height=default_size[1])
+        self.frame.pack_propagate(False)
+
+        toolbar = tk.Frame(self.frame)
+        toolbar.pack(side=tk.TOP, fill=tk.X)
+        self.toggle_btn = tk.Button(toolbar, text="Interactive", relief=tk.FLAT,
+                                    command=self.toggle_interactive)
+        self.toggle_btn.pack(side=tk.RIGHT)
+
+        self.image_label = tk.Label(self.frame, text="Loading chart...", anchor="center",
+                                    bd=0, highlightthickness=0)
+        self.image_label.pack(fill=tk.BOTH, expand=True)
+        self.image_label.bind("<Double-1>", lambda e: self.set_interactive(True))
+        self.image_label.bind("<Configure>", self._on_configure)
+
+    def update(self, data, title=""):
+        """Show new chart data"""
+        self.data = data
+        self.title = title
+        if self.interactive:
+            self.chart.update(data, title)
+        else:
+            self._request_render()
+
+    def toggle_interactive(self):
+        """Switch between the static image and an interactive canvas"""
+        self.set_interactive(not self.interactive)
+
+    def set_interactive(self, interactive):
+        if interactive == self.interactive:
+            return
+        self.interactive = interactive
+
+        if interactive:
+            self._token += 1  # Ignore renders still in flight
+            chart_class = ChartRenderer.chart_types()[self.chart_type]
+            self.chart = chart_class(self.frame, **self.chart_options)
+            self.image_label.pack_forget()
+            self.chart.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+            if self.data is not None:
+                self.chart.update(self.data, self.title)
+            self.toggle_btn.config(text="Static")
+        else:
+            if self.chart is not None:
+                self.chart.destroy()
+                self.chart = None
+            self.image_label.pack(fill=tk.BOTH, expand=True)
+            self.toggle_btn.config(text="Interactive")
+            self._request_render()
+
+    def destroy(self):
+        """Release the interactive chart (if any) and destroy the panel"""
+        self._token += 1
+        if self.chart is not None:
+            self.chart.destroy()
+            self.chart = None
+        self.photo = None
+        self.frame.destroy()
+
+    def _current_size(self):
+        width = self.image_label.winfo_width()
+        height = self.image_label.winfo_height()
+        if width < 50 or height < 50:
+            return self.default_size
+        return width, height
+
+    def _request_render(self):
+        if self.data is None:
+            return
+        self._token += 1
+        token = self._token
+        self._size = self._current_size()
+
+        key, future = self.renderer.render_async(self.chart_type, self.data, self.title,
+                                                 self._size, self.dpi, self.chart_options)
+        if future.done():
+            self._apply(token, future)
+        else:
+            if self.photo is None:
+                self.image_label.config(text="Rendering chart...")
+            self.frame.after(30, self._poll, token, future)
+
+    def _poll(self, token, future):
+        if token != self._token or not self._exists():
+            return
+        if future.done():
+            self._apply(token, future)
+        else:
+            self.frame.after(30, self._poll, token, future)
+
+    def _apply(self, token, future):
+        if token != self._token or self.interactive:
+            return
+        try:
+            png = future.result()
+        except Exception as e:
+            print(f"Error rendering chart: {e}")
+            self.photo = None
+            self.image_label.config(image="", text="Error loading chart.")
+            return
+
+        # PhotoImage must be created on the Tk thread
+        self.photo = tk.PhotoImage(data=base64.b64encode(png))
+        self.image_label.config(image=self.photo, text="")
+
+    def _on_configure(self, event):
+        # Re-render at the new size once resizing settles
+        if self.interactive or self._size is None:
+            return
+        if abs(event.width - self._size[0]) < 10 and abs(event.height - self._size[1]) < 10:
+            return
+        if self._resize_job is not None:
+            self.frame.after_cancel(self._resize_job)
+        self._resize_job = self.frame.after(200, self._on_resize_done)
+
+    def _on_resize_done(self):
+        self._resize_job = None
+        if self._exists() and not self.interactive:
+            self._request_render()
+
+    def _exists(self):
+        try:
+            return bool(self.frame.winfo_exists())
+        except tk.TclError:
+            return False
@@ -0,0 +1,70 @@
+# views/widgets/import_progress.py
+import tkinter as tk
+from tkinter import messagebox
+
+from views.widgets.progress_dialog import ProgressDialog
+
+
+class ImportProgressDialog(ProgressDialog):
+    def __init__(self, parent, importer, title="Importing Purchases", poll_ms=100):
+        """
+        Progress window for a running import, with pause/resume and cancel
+
+        The importer reports progress dicts from its worker thread; they
+        are queued and drained here on the Tk thread, so the worker never
+        touches widgets.
+
+        Args:
+            parent: Parent widget
+            importer: PurchaseImporter that is about to run
+            title: Window title
+            poll_ms: How often the progress queue is checked
+        """
+        self.importer = importer
+        super().__init__(parent, title, "Preparing import...", poll_ms=poll_ms, size="420x200")
+        importer.progress_callback = self.queue.put
+
+        self.message_label.config(font=("Arial", 11, "bold"))
+        self.detail_label = tk.Label(self.content, text="", anchor="w", justify=tk.LEFT)
+        self.detail_label.pack(fill=tk.X)
+
+        self.pause_button = tk.Button(self.button_frame, text="Pause", width=10, command=self.toggle_pause)
+        self.pause_button.pack(side=tk.LEFT, padx=5, before=self.cancel_button)
+
+    def _show(self, progress):
+        """Update the window from an importer progress report"""
+        # None for sorted input: the position in the file says nothing about progress
+        fraction = progress.get("fraction")
+        self._set_fraction(fraction)
+
+        status = progress.get("status", "Running")
+        if status == "Paused":
+            text = "Paused"
+        elif fraction is not None:
+            text = f"{status}... {fraction * 100:.0f}%"
+        else:
+            text = f"{status}..."
+        if not self.cancel_event.is_set():
+            self.message_label.config(text=text)
+
+        detail = f"{progress['imported']:,} purchases ({progress['line_items']:,} line items) imported"
+        if progress.get("row"):
+            detail += f", row {progress['row']:,}"
+        detail += f"\n{progress['skipped']:,} skipped, {progress['errors']:,} errors, {progress['warnings']:,} warnings"
+        self.detail_label.config(text=detail)
+
+    def toggle_pause(self):
+        if self.importer.paused:
+            self.importer.resume()
+            self.pause_button.config(text="Pause")
+        else:
+            self.importer.pause()
+            self.pause_button.config(text="Resume")
+
+    def cancel(self):
+        if not messagebox.askyesno("Cancel Import",
+                                   "Stop the import? Purchases imported so far are kept.",
+                                   parent=self.window):
+            return
+        self.importer.cancel()
+        super().cancel()
@@ -0,0 +1,108 @@
+# views/widgets/progress_dialog.py
+import queue
+import threading
+import tkinter as tk
+from tkinter import ttk
+
+
+class ProgressDialog:
+    def __init__(self, parent, title, message="Working...", cancellable=True, poll_ms=100, size="400x150"):
+        """
+        Progress window for a background task
+
+        The task calls report() from its worker thread; reports are queued
+        and shown here on the Tk thread. Cancel sets cancel_event, which the
+        task is expected to check. Subclasses add widgets to content and
+        buttons to button_frame, and override _show() for richer reports.
+
+        Args:
+            parent: Parent widget
+            title: Window title
+            message: Initial status text
+            cancellable: Whether to show a Cancel button
+            poll_ms: How often the report queue is checked
+            size: Window geometry
+        """
+        self.poll_ms = poll_ms
+        self.queue = queue.Queue()
+        self.cancel_event = threading.Event()
+
+        self.window = tk.Toplevel(parent)
+        self.window.title(title)
+        self.window.geometry(size)
+        self.window.resizable(False, False)
+        self.window.transient(parent.winfo_toplevel())
+        self.window.grab_set()
+        self.window.protocol("WM_DELETE_WINDOW", self.cancel if cancellable else lambda: None)
+
+        self.content = tk.Frame(self.window, padx=20, pady=15)
+        self.content.pack(fill=tk.BOTH, expand=True)
+
+        self.message_label = tk.Label(self.content, text=message, anchor="w")
+        self.message_label.pack(fill=tk.X)
+
+        self.progress = ttk.Progressbar(self.content, mode="determinate", maximum=1.0)
+        self.progress.pack(fill=tk.X, pady=10)
+        self._indeterminate = False
+        self._set_fraction(None)
+
+        self.button_frame = tk.Frame(self.content)
+        self.button_frame.pack(side=tk.BOTTOM, pady=(10, 0))
+        self.cancel_button = None
+        if cancellable:
+            self.cancel_button = tk.Button(self.button_frame, text="Cancel", width=10, command=self.cancel)
+            self.cancel_button.pack(side=tk.LEFT, padx=5)
+
+        self.window.after(self.poll_ms, self._poll)
+
+    def report(self, fraction=None, message=None):
+        """Report progress from any thread; fraction is None while it is unknown"""
+        self.queue.put((fraction, message))
+
+    def _poll(self):
+        if not self.window.winfo_exists():
+            return
+        latest = None
+        try:
+            while True:
+                latest = self.queue.get_nowait()
+        except queue.Empty:
+            pass
+        if latest is not None:
+            self._show(latest)
+        self.window.after(self.poll_ms, self._poll)
+
+    def _show(self, update):
+        """Show the latest queued report (a (fraction, message) pair from report())"""
+        fraction, message = update
+        if fraction is not None:
+            self._set_fraction(fraction)
+        if message and not self.cancel_event.is_set():
+            self.message_label.config(text=message)
+
+    def _set_fraction(self, fraction):
+        """Show a fraction done, or a moving bar when fraction is None"""
+        if fraction is None:
+            if not self._indeterminate:
+                self.progress.config(mode="indeterminate")
+                self.progress.start(15)
+                self._indeterminate = True
+            return
+        if self._indeterminate:
+            self.progress.stop()
+            self.progress.config(mode="determinate")
+            self._indeterminate = False
+        self.progress["value"] = fraction
+
+    def cancel(self):
+        self.cancel_event.set()
+        self.message_label.config(text="Cancelling...")
+        for button in self.button_frame.winfo_children():
+            button.config(state=tk.DISABLED)
+
+    def close(self):
+        """Close the window once the task has finished"""
+        if self._indeterminate:
+            self.progress.stop()
+        self.window.grab_release()
+        self.window.destroy()